@@ -1,10 +1,22 @@
-from pabble_ocr.ui.app import run_app
+import multiprocessing
+import sys
 
 
 def main() -> int:
-    return run_app()
+    # PyInstaller 打包后，合并阶段的进程池子进程会重新执行入口；需先交给 multiprocessing 处理。
+    multiprocessing.freeze_support()
+
+    from pabble_ocr.utils.startup_profile import PROFILE_FLAG, StartupProfile, startup_profile_requested
+
+    # --profile-startup / PABBLE_OCR_PROFILE_STARTUP=1：统计界面启动前的模块导入耗时，窗口显示后写入日志
+    profile = StartupProfile().install() if startup_profile_requested() else None
+    if PROFILE_FLAG in sys.argv:
+        sys.argv.remove(PROFILE_FLAG)
+
+    from pabble_ocr.ui.app import run_app
+
+    return run_app(profile=profile)
 
 
 if __name__ == "__main__":
     raise SystemExit(main())
-
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import socket
+import threading
+from typing import Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import connection as _connection
+from urllib3 import connectionpool as _connectionpool
+
+from pabble_ocr.core.control import CanceledError, RunControl
+
+
+# 当前线程正在发送的请求（连接池在取得连接后把连接登记到这里，取消时据此关闭 socket）
+_local = threading.local()
+
+
+class _Inflight:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._conn: Any = None
+        self._aborted = False
+
+    @property
+    def aborted(self) -> bool:
+        return self._aborted
+
+    def attach(self, conn: Any) -> None:
+        with self._lock:
+            self._conn = conn
+            aborted = self._aborted
+        if aborted:
+            raise CanceledError()
+
+    def abort(self) -> None:
+        with self._lock:
+            self._aborted = True
+            conn = self._conn
+        if conn is not None:
+            _shutdown(conn)
+
+
+def _shutdown(conn: Any) -> None:
+    # shutdown 而非 close：阻塞在 recv 的线程会立即返回，连接随后被连接池丢弃
+    sock = getattr(conn, "sock", None)
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+def _current() -> Optional[_Inflight]:
+    return getattr(_local, "inflight", None)
+
+
+def _attach_current(conn: Any) -> None:
+    inflight = _current()
+    if inflight is not None:
+        inflight.attach(conn)
+
+
+def _check_connected(conn: Any) -> None:
+    # 取消发生在建立连接期间（此时还没有 socket 可关）：连上后立即关闭
+    inflight = _current()
+    if inflight is not None and inflight.aborted:
+        _shutdown(conn)
+
+
+# 类名与 urllib3 保持一致：错误信息里会带上连接/连接池的类名，界面上显示的报错与未挂载时相同
+class HTTPConnection(_connection.HTTPConnection):
+    def connect(self) -> None:
+        super().connect()
+        _check_connected(self)
+
+
+class HTTPSConnection(_connection.HTTPSConnection):
+    def connect(self) -> None:
+        super().connect()
+        _check_connected(self)
+
+
+class HTTPConnectionPool(_connectionpool.HTTPConnectionPool):
+    ConnectionCls = HTTPConnection
+
+    def _make_request(self, conn, *args, **kwargs):  # type: ignore[override]
+        _attach_current(conn)
+        return super()._make_request(conn, *args, **kwargs)
+
+
+class HTTPSConnectionPool(_connectionpool.HTTPSConnectionPool):
+    ConnectionCls = HTTPSConnection
+
+    def _make_request(self, conn, *args, **kwargs):  # type: ignore[override]
+        _attach_current(conn)
+        return super()._make_request(conn, *args, **kwargs)
+
+
+_POOL_CLASSES = {"http": HTTPConnectionPool, "https": HTTPSConnectionPool}
+
+
+class CancellableAdapter(HTTPAdapter):
+    """
+    可中断的 requests 传输层：RunControl 被取消时关闭在途请求的 socket，
+    阻塞在等待响应（READ_TIMEOUT_S 可达数百秒）或读取响应体的请求立即以 CanceledError 结束。
+    """
+
+    def __init__(self, control: RunControl, **kwargs: Any) -> None:
+        self._control = control
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = dict(_POOL_CLASSES)
+
+    def proxy_manager_for(self, proxy: str, **proxy_kwargs: Any):
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        manager.pool_classes_by_scheme = dict(_POOL_CLASSES)
+        return manager
+
+    def send(self, request, stream: bool = False, **kwargs: Any):  # type: ignore[override]
+        self._control.raise_if_canceled()
+        inflight = _Inflight()
+        remove = self._control.on_cancel(inflight.abort)
+        _local.inflight = inflight
+        try:
+            resp = super().send(request, stream=stream, **kwargs)
+            if not stream:
+                # 在可中断范围内读完响应体（requests 默认在 adapter 返回后才读取）
+                _ = resp.content
+        except Exception as e:
+            if self._control.is_canceled():
+                raise CanceledError() from e
+            raise
+        finally:
+            _local.inflight = None
+            remove()
+        self._control.raise_if_canceled()
+        return resp
+
+
+def mount_cancellable(session: requests.Session, control: Optional[RunControl]) -> None:
+    """为 session 挂载可中断传输层；control 为 None 时保持 requests 默认行为。"""
+    if control is None:
+        return
+    adapter = CancellableAdapter(control)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
@@ -4,12 +4,17 @@ import base64
 import logging
 import random
 import time
+from contextlib import nullcontext
 from dataclasses import dataclass
 from typing import Any, Optional
 
 import requests
 
+from pabble_ocr.adapters.cancellable_transport import mount_cancellable
 from pabble_ocr.config import AppConfig
+from pabble_ocr.core.concurrency import RunLimits
+from pabble_ocr.core.control import RunControl
+from pabble_ocr.core.metrics import MetricsBus, add_stage, stage, track_request
 
 
 logger = logging.getLogger(__name__)
@@ -139,11 +144,25 @@ def build_layout_parsing_options(config: AppConfig) -> dict[str, Any]:
 
 
 class LayoutParsingClient:
-    def __init__(self, config: AppConfig) -> None:
+    def __init__(
+        self,
+        config: AppConfig,
+        *,
+        limits: Optional[RunLimits] = None,
+        control: Optional[RunControl] = None,
+        metrics: Optional[MetricsBus] = None,
+    ) -> None:
         self._config = config
+        # 多文件并发时由 Runner 注入：全局在途请求上限 + 全局请求最小间隔
+        self._limits = limits
+        # 取消时中断在途请求与重试退避（None=不可中断，行为同 requests 默认）
+        self._control = control
+        # 吞吐/延迟/字节数上报（None=不统计）
+        self._metrics = metrics
         self._session = requests.Session()
         # 是否读取环境变量/系统代理配置（HTTP(S)_PROXY/NO_PROXY 等）
         self._session.trust_env = bool(getattr(config, "use_system_proxy", True))
+        mount_cancellable(self._session, control)
         self._last_request_at: Optional[float] = None
 
     def layout_parsing(self, *, file_path: str, file_type: int) -> LayoutParsingResult:
@@ -152,10 +171,11 @@ class LayoutParsingClient:
         if not self._config.token:
             raise NonRetryableError("未配置 TOKEN")
 
-        payload: dict[str, Any] = {
-            "file": _b64_file(file_path),
-            "fileType": int(file_type),
-        }
+        with stage(self._metrics, "prepare"):
+            payload: dict[str, Any] = {
+                "file": _b64_file(file_path),
+                "fileType": int(file_type),
+            }
         # 兼容：部分 Serving 使用 snake_case（file_type）。
         payload["file_type"] = int(file_type)
         payload.update(_build_payload_options(self._config))
@@ -168,14 +188,8 @@ class LayoutParsingClient:
         attempt = 0
         while True:
             attempt += 1
-            self._respect_min_interval()
             try:
-                resp = self._session.post(
-                    self._config.api_url,
-                    json=payload,
-                    headers=headers,
-                    timeout=(self._config.connect_timeout_s, self._config.read_timeout_s),
-                )
+                resp = self._post(self._config.api_url, payload, headers)
             except requests.RequestException as e:
                 # ReadTimeout 场景下，服务端可能已经接收并在后台处理（甚至计费），客户端重试可能造成重复请求/扣费。
                 if isinstance(e, requests.exceptions.ReadTimeout) and not bool(self._config.retry_on_read_timeout):
@@ -260,14 +274,8 @@ class LayoutParsingClient:
         attempt = 0
         while True:
             attempt += 1
-            self._respect_min_interval()
             try:
-                resp = self._session.post(
-                    url,
-                    json=body,
-                    headers=headers,
-                    timeout=(self._config.connect_timeout_s, self._config.read_timeout_s),
-                )
+                resp = self._post(url, body, headers)
             except requests.RequestException as e:
                 if isinstance(e, requests.exceptions.ReadTimeout) and not bool(self._config.retry_on_read_timeout):
                     raise RetryableError(
@@ -306,7 +314,28 @@ class LayoutParsingClient:
 
             return LayoutParsingResult(pages=_parse_pages(pages_raw))
 
+    def _post(self, url: str, body: dict[str, Any], headers: dict[str, str]) -> requests.Response:
+        waited = time.monotonic()
+        with self._request_slot():
+            self._respect_min_interval()
+            add_stage(self._metrics, "slot", time.monotonic() - waited)
+            with track_request(self._metrics) as rec:
+                resp = self._session.post(
+                    url,
+                    json=body,
+                    headers=headers,
+                    timeout=(self._config.connect_timeout_s, self._config.read_timeout_s),
+                )
+                rec.set_response(resp)
+        return resp
+
+    def _request_slot(self):
+        return self._limits.request_slot(self._control) if self._limits is not None else nullcontext()
+
     def _respect_min_interval(self) -> None:
+        if self._limits is not None:
+            self._limits.respect_min_interval()
+            return
         ms = int(self._config.request_min_interval_ms or 0)
         if ms <= 0:
             return
@@ -323,7 +352,11 @@ class LayoutParsingClient:
     def _sleep_backoff(self, attempt: int) -> None:
         base = 2 ** max(0, attempt - 1)
         jitter = random.uniform(0.0, 0.3)
-        time.sleep(min(30.0, base + jitter))
+        delay = min(30.0, base + jitter)
+        if self._control is not None:
+            self._control.sleep(delay)
+        else:
+            time.sleep(delay)
 
 
 def _derive_restructure_url(api_url: str) -> str:
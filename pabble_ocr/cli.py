@@ -0,0 +1,413 @@
+from __future__ import annotations
+
+import argparse
+import importlib.abc
+import json
+import multiprocessing
+import signal
+import sys
+import time
+from collections import deque
+from dataclasses import fields, replace
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Any, Optional, TextIO
+
+from pabble_ocr.config import AppConfig, load_config
+from pabble_ocr.core.leases import normalize_claim_mode
+from pabble_ocr.core.models import QueueItem
+from pabble_ocr.core.queue_manager import build_queue_items, collect_input_files, forget_unused_outputs
+from pabble_ocr.core.runner import Runner, RunnerCallbacks
+from pabble_ocr.core.watcher import FolderWatcher, finalize_input
+from pabble_ocr.utils.logging_utils import setup_logging
+from pabble_ocr.utils.paths import resolve_path_maybe_windows
+
+
+# 退出码：0=全部完成；1=有文件失败；2=参数/配置错误或没有可处理的文件；130=被中断（Ctrl+C / SIGTERM）
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+
+class _QtImportBlocker(importlib.abc.MetaPathFinder):
+    """
+    --no-qt：拦截 PySide6/shiboken6 导入。
+    各处 Qt 依赖都是函数内延迟导入并在失败时降级，拦截后等同于“未安装 Qt”，不会意外加载 Qt 运行库。
+    """
+
+    _BLOCKED = ("PySide6", "shiboken6")
+
+    def find_spec(self, fullname: str, path: Any = None, target: Any = None) -> None:
+        if fullname.split(".", 1)[0] in self._BLOCKED:
+            raise ModuleNotFoundError(f"Qt 已通过 --no-qt 禁用：{fullname}", name=fullname)
+        return None
+
+
+def _block_qt_imports() -> None:
+    if not any(isinstance(f, _QtImportBlocker) for f in sys.meta_path):
+        sys.meta_path.insert(0, _QtImportBlocker())
+
+
+def _without_qt_stages(config: AppConfig) -> AppConfig:
+    """关闭需要 QtPdf/QtGui 的阶段：碎片图本地合并、PDF 页渲染后图片模式重跑。"""
+    return replace(config, merge_image_fragments=False, pdf_image_ocr_pages="")
+
+
+def _coerce_value(type_name: str, raw: str) -> Any:
+    v = raw.strip()
+    optional = "Optional" in type_name or "None" in type_name
+    if optional and v.lower() in {"", "none", "null"}:
+        return None
+    if "bool" in type_name:
+        if v.lower() in {"1", "true", "yes", "on"}:
+            return True
+        if v.lower() in {"0", "false", "no", "off"}:
+            return False
+        raise ValueError(f"不是布尔值：{raw}")
+    if "int" in type_name:
+        return int(v)
+    if "float" in type_name:
+        return float(v)
+    return raw
+
+
+def _apply_overrides(config: AppConfig, pairs: list[str]) -> AppConfig:
+    """--set KEY=VALUE：按字段类型覆盖配置（KEY 不区分大小写，同 README 中的大写写法）。"""
+    types = {f.name: str(f.type) for f in fields(AppConfig)}
+    changes: dict[str, Any] = {}
+    for pair in pairs:
+        key, sep, value = pair.partition("=")
+        name = key.strip().lower()
+        if not sep or name not in types:
+            raise ValueError(f"无效的配置覆盖：{pair}")
+        changes[name] = _coerce_value(types[name], value)
+    return replace(config, **changes) if changes else config
+
+
+class _JsonLines:
+    """把运行事件逐行写成 JSON（stdout），多线程回调下保证行不交错。"""
+
+    def __init__(self, stream: TextIO, *, logs: bool = True) -> None:
+        self._stream = stream
+        self._logs = logs
+        self._lock = Lock()
+        self._started = time.monotonic()
+
+    def emit(self, event: str, **payload: Any) -> None:
+        row = {"event": event, "t": round(time.monotonic() - self._started, 3), **payload}
+        line = json.dumps(row, ensure_ascii=False, default=str)
+        with self._lock:
+            self._stream.write(line + "\n")
+            self._stream.flush()
+
+    def log(self, msg: str) -> None:
+        if self._logs:
+            self.emit("log", message=msg)
+
+    def item(self, item: QueueItem) -> None:
+        self.emit(
+            "item",
+            input=str(item.input_path),
+            output_dir=str(item.output_dir),
+            status=item.status,
+            progress=round(float(item.progress or 0.0), 4),
+            message=item.message,
+            error=item.error,
+            duplicate_of=item.duplicate_of,
+        )
+
+
+def _load_cli_config(args: argparse.Namespace) -> AppConfig:
+    config = load_config(resolve_path_maybe_windows(args.config) if args.config else None)
+    config = _apply_overrides(config, list(args.set or []))
+    if args.out:
+        config = replace(config, output_dir=str(resolve_path_maybe_windows(args.out)))
+    if args.workers is not None:
+        config = replace(config, max_concurrent_files=max(1, int(args.workers)))
+    if args.no_qt:
+        config = _without_qt_stages(config)
+    return config
+
+
+def _run_items(runner: Runner, items: list[QueueItem], out: _JsonLines) -> bool:
+    """在后台线程跑队列，主线程等待并响应 Ctrl+C/SIGTERM；被中断返回 True。"""
+    t = Thread(target=runner.run, args=(items,), name="pabble-cli-runner", daemon=True)
+    t.start()
+    interrupted = False
+    while t.is_alive():
+        try:
+            t.join(0.2)
+        except KeyboardInterrupt:
+            if interrupted:
+                # 第二次中断：不再等待收尾
+                out.emit("interrupted", force=True)
+                return True
+            interrupted = True
+            out.emit("interrupted", force=False)
+            runner.stop_all()
+            runner.cancel_current()
+    return interrupted
+
+
+def _raise_interrupt(signum: int, frame: Any) -> None:
+    raise KeyboardInterrupt()
+
+
+def _prepare(args: argparse.Namespace, out: _JsonLines) -> Optional[AppConfig]:
+    """run/watch 共用：加载配置、校验 API_URL、创建输出目录并初始化日志文件；失败时输出 error 事件并返回 None。"""
+    if args.no_qt:
+        _block_qt_imports()
+    try:
+        config = _load_cli_config(args)
+    except (OSError, ValueError, TypeError) as e:
+        out.emit("error", message=str(e))
+        return None
+    if not str(config.api_url or "").strip():
+        out.emit("error", message="未配置 API_URL（可用 --config 指定配置文件或 --set API_URL=...）")
+        return None
+    try:
+        config.ensure_dirs()
+    except OSError as e:
+        out.emit("error", message=f"无法创建输出目录：{e}")
+        return None
+    setup_logging(Path(config.output_dir) / "_logs", console=False)
+    return config
+
+
+def cmd_run(args: argparse.Namespace) -> int:
+    out = _JsonLines(sys.stdout, logs=not bool(args.quiet))
+    config = _prepare(args, out)
+    if config is None:
+        return EXIT_USAGE
+    output_root = Path(config.output_dir)
+
+    files = collect_input_files([resolve_path_maybe_windows(p) for p in args.paths])
+    cluster = normalize_claim_mode(config.cluster_claim) != "off"
+    result = build_queue_items(files, output_root, use_index=not cluster)
+    for p in result.skipped:
+        out.emit("skipped", input=str(p))
+    if not result.items:
+        out.emit("error", message="没有可处理的文件")
+        return EXIT_USAGE
+
+    out.emit(
+        "start",
+        items=len(result.items),
+        skipped=len(result.skipped),
+        output_dir=str(output_root),
+        workers=int(config.max_concurrent_files or 1),
+        qt_stages=not bool(args.no_qt),
+    )
+    runner = Runner(config, RunnerCallbacks(on_log=out.log, on_item_update=out.item))
+
+    prev_term = signal.signal(signal.SIGTERM, _raise_interrupt)
+    try:
+        interrupted = _run_items(runner, result.items, out)
+    finally:
+        signal.signal(signal.SIGTERM, prev_term)
+
+    counts: dict[str, int] = {}
+    for it in result.items:
+        counts[it.status] = counts.get(it.status, 0) + 1
+    if not cluster:
+        # 中断/停止时未开始处理的文件不再占用输出目录名
+        forget_unused_outputs(it.output_dir for it in result.items if it.status != "completed")
+    snap = runner.metrics.snapshot()
+    out.emit(
+        "summary",
+        completed=counts.get("completed", 0),
+        failed=counts.get("failed", 0),
+        canceled=counts.get("canceled", 0),
+        unfinished=sum(v for k, v in counts.items() if k not in {"completed", "failed", "canceled"}),
+        skipped=len(result.skipped),
+        pages=snap.pages_done,
+        requests=snap.requests,
+        bytes_sent=snap.bytes_sent,
+        elapsed_s=round(snap.elapsed_s, 1),
+        qt_loaded="PySide6" in sys.modules,
+    )
+    if interrupted:
+        return EXIT_INTERRUPTED
+    return EXIT_OK if counts.get("completed", 0) == len(result.items) else EXIT_FAILED
+
+
+def _is_within(path: Path, root: Optional[Path]) -> bool:
+    if root is None:
+        return False
+    try:
+        path.relative_to(root)
+        return True
+    except ValueError:
+        return False
+
+
+def cmd_watch(args: argparse.Namespace) -> int:
+    out = _JsonLines(sys.stdout, logs=not bool(args.quiet))
+    config = _prepare(args, out)
+    if config is None:
+        return EXIT_USAGE
+    output_root = Path(config.output_dir).resolve()
+
+    roots = [resolve_path_maybe_windows(p).resolve() for p in args.dirs]
+    missing = [str(r) for r in roots if not r.is_dir()]
+    if missing:
+        out.emit("error", message=f"监视目录不存在：{', '.join(missing)}")
+        return EXIT_USAGE
+    done_dir = resolve_path_maybe_windows(args.done_dir).resolve() if args.done_dir else None
+    failed_dir = resolve_path_maybe_windows(args.failed_dir).resolve() if args.failed_dir else None
+    # 输出目录、归档目录可能位于监视目录之内，必须排除，否则会把输出/已归档文件再次入队
+    excluded = [output_root, done_dir, failed_dir]
+
+    watcher = FolderWatcher(
+        roots,
+        recursive=not bool(args.no_recursive),
+        settle_s=float(args.settle),
+        poll_s=float(args.poll),
+        use_inotify=not bool(args.polling),
+        skip=lambda p: any(_is_within(p, ex) for ex in excluded),
+    )
+    # 回调在工作线程里触发；归档（移动/写标记）统一交给主线程做，避免与 watcher 并发
+    tracked: dict[int, QueueItem] = {}
+    finished: deque[QueueItem] = deque()
+
+    def _on_item(item: QueueItem) -> None:
+        out.item(item)
+        if item.status in {"completed", "failed"}:
+            finished.append(item)
+
+    def _archive_finished() -> None:
+        while finished:
+            item = finished.popleft()
+            if tracked.pop(id(item), None) is None:
+                continue
+            if not item.input_path.exists():
+                # 多节点监视同一目录时可能已被其它节点归档
+                watcher.forget(item.input_path)
+                continue
+            ok = item.status == "completed"
+            try:
+                dest = finalize_input(
+                    item.input_path,
+                    succeeded=ok,
+                    root=watcher.root_of(item.input_path),
+                    done_dir=done_dir,
+                    failed_dir=failed_dir,
+                )
+                out.emit("archived", input=str(item.input_path), status=item.status, to=str(dest))
+            except OSError as e:
+                out.emit("error", message=f"归档输入文件失败：{item.input_path}：{e}")
+            watcher.forget(item.input_path)
+
+    runner = Runner(config, RunnerCallbacks(on_log=out.log, on_item_update=_on_item))
+    cluster = normalize_claim_mode(config.cluster_claim) != "off"
+    stopping = Event()
+    t = Thread(
+        target=runner.run,
+        args=([],),
+        kwargs={"keep_alive": lambda: not stopping.is_set()},
+        name="pabble-cli-runner",
+        daemon=True,
+    )
+    t.start()
+    out.emit(
+        "watch",
+        dirs=[str(r) for r in roots],
+        backend=watcher.backend,
+        output_dir=str(output_root),
+        workers=int(config.max_concurrent_files or 1),
+        settle_s=float(args.settle),
+        qt_stages=not bool(args.no_qt),
+    )
+
+    unsubmitted: list[QueueItem] = []
+    prev_term = signal.signal(signal.SIGTERM, _raise_interrupt)
+    try:
+        while t.is_alive():
+            # 有处理中的文件时缩短等待，结束后尽快归档
+            for p in watcher.poll(0.5 if tracked else None):
+                # 逐个建队列项并立即创建输出目录：同名文件先后到达时不会分到同一个输出目录
+                result = build_queue_items([p], output_root, use_index=not cluster)
+                for sp in result.skipped:
+                    out.emit("skipped", input=str(sp))
+                for it in result.items:
+                    if not cluster:
+                        # 多节点认领时输出目录由 Runner 认领后再确定，这里不能预先占用
+                        it.output_dir.mkdir(parents=True, exist_ok=True)
+                    tracked[id(it)] = it
+                    unsubmitted.append(it)
+                    out.emit("enqueued", input=str(it.input_path), output_dir=str(it.output_dir))
+            # Runner 线程刚启动时可能尚未就绪，submit 失败的留到下一轮
+            unsubmitted = [it for it in unsubmitted if not runner.submit(it)]
+            _archive_finished()
+    except KeyboardInterrupt:
+        out.emit("interrupted", force=False)
+        stopping.set()
+        runner.stop_all()
+        runner.cancel_current()
+        try:
+            t.join()
+        except KeyboardInterrupt:
+            out.emit("interrupted", force=True)
+    finally:
+        signal.signal(signal.SIGTERM, prev_term)
+        watcher.close()
+    _archive_finished()
+    # 停止时未完成的文件保持原样（不移动、不写标记），下次启动会重新入队并断点续跑
+    out.emit("stopped", pending=len(tracked))
+    return EXIT_OK
+
+
+def _add_config_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--out", type=str, default="", help="输出根目录（默认：配置中的 OUTPUT_DIR）")
+    p.add_argument("--config", type=str, default="", help="配置文件路径（默认与界面共用同一份 config.json）")
+    p.add_argument(
+        "--set",
+        action="append",
+        metavar="KEY=VALUE",
+        help="覆盖单个配置项，可重复（如 --set MAX_CONCURRENT_FILES=4 --set MERGE_WORKERS=1）",
+    )
+    p.add_argument("--workers", type=int, default=None, help="同时处理的文件数（覆盖 MAX_CONCURRENT_FILES）")
+    p.add_argument(
+        "--no-qt",
+        action="store_true",
+        help="不加载 Qt：关闭碎片图本地合并与 PDF 页图片模式重跑（这两步依赖 QtPdf/QtGui）",
+    )
+    p.add_argument("--quiet", action="store_true", help="不输出 log 事件，只输出 item/summary 等事件")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m pabble_ocr.cli",
+        description="无界面批处理/常驻监视入口（不导入 Qt 界面；进度以 JSON 行输出到 stdout）",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="处理指定文件/目录，全部结束后退出")
+    p_run.add_argument("paths", nargs="+", help="输入文件或目录（目录递归收集）")
+    _add_config_args(p_run)
+    p_run.set_defaults(func=cmd_run)
+
+    p_watch = sub.add_parser("watch", help="常驻监视输入目录，新文件写入完成后自动处理")
+    p_watch.add_argument("dirs", nargs="+", help="监视的输入目录（可多个）")
+    _add_config_args(p_watch)
+    p_watch.add_argument("--settle", type=float, default=2.0, help="文件大小与修改时间持续不变多少秒后视为写入完成（默认 2）")
+    p_watch.add_argument("--poll", type=float, default=2.0, help="轮询/等待事件的间隔秒数（默认 2）")
+    p_watch.add_argument("--polling", action="store_true", help="不用 inotify，只定期扫描（部分网络共享目录收不到 inotify 事件）")
+    p_watch.add_argument("--no-recursive", action="store_true", help="只监视目录第一层，不进入子目录")
+    p_watch.add_argument("--done-dir", type=str, default="", help="处理成功的输入移动到此目录（默认：原地写 .pabble-done 标记）")
+    p_watch.add_argument("--failed-dir", type=str, default="", help="处理失败的输入移动到此目录（默认：原地写 .pabble-failed 标记）")
+    p_watch.set_defaults(func=cmd_watch)
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    return int(args.func(args))
+
+
+if __name__ == "__main__":
+    # 合并阶段会开进程池；与 __main__.py 一致，先交给 multiprocessing 处理冻结环境下的子进程入口
+    multiprocessing.freeze_support()
+    raise SystemExit(main())
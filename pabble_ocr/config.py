@@ -68,6 +68,39 @@ class AppConfig:
     # 观感优先：将同一张“大图”被切碎的多个图片块做本地合并，尽量还原原 PDF 观感。
     # 依赖服务端返回的 `prunedResult` 中的图片区域坐标；若缺失则自动跳过。
     merge_image_fragments: bool = True
+    # 合并阶段（碎片图合并 + 图片样式）按分段分发到进程池并行处理的进程数。
+    # 0=自动（CPU 核数，最多 4）；1=串行（与旧版本行为一致）。
+    # 每个进程各自加载 Qt/QtPdf 并缓存最多 3 张整页渲染（单张可达约 35MB），每个进程约需 100~150MB 内存。
+    merge_workers: int = 0
+    # 合并图输出编码：png（默认，与旧版本一致）/ png-opt（无损，更高压缩）/ jpeg / webp /
+    # auto（颜色少的线稿/图表用 PNG，照片类用有损格式）。
+    merged_image_format: str = "png"
+    # jpeg/webp（含 auto 选中有损格式时）的编码质量，1~100。
+    merged_image_quality: int = 85
+    # 队列并发：同时处理的文件数（1=逐个处理，与旧版本一致）。大量小文件（如单页图片）时调大可明显提升吞吐。
+    max_concurrent_files: int = 1
+    # 全局同时在途的 API 请求上限（跨所有并发文件；0=不额外限制，即最多等于并发文件数）。按服务端承载能力设置。
+    max_inflight_requests: int = 0
+    # 同时进行合并阶段（碎片图合并/图片落盘，CPU 密集）的文件数上限（0=不限制）。
+    max_concurrent_merges: int = 1
+    # 队列调度策略：fifo（按导入顺序，默认）/ sjf（预计耗时短的优先，按页数/文件大小/历史每页耗时估算）/
+    # priority（按队列项优先级）。
+    queue_policy: str = "fifo"
+    # 大 PDF 分段轮转：每轮最多处理的分段数，用完后放回队列让其它任务先跑（0=不轮转，一次处理完）。
+    segments_per_turn: int = 0
+    # 内容去重：队列中内容相同（大小 -> 首尾块哈希 -> 全量 SHA-256 逐级比对）的文件只识别第一份，
+    # 其余等第一份完成后以硬链接（不支持时复制）复用其输出，不再调用 API。
+    dedupe_inputs: bool = False
+    # 界面日志区最多保留的行数（更早的行从界面移除；完整日志始终写入 <OUTPUT_DIR>/_logs/）。
+    log_view_lines: int = 5000
+    # 多节点协作（多台机器共享同一输出根目录处理同一批输入）：off=单机（默认）；
+    # file=按文件认领（同一文件同一时刻只有一个节点处理）；segment=大 PDF 按分段认领（多节点可同时处理同一文件的不同分段）。
+    # 认领信息以租约文件保存在 <OUTPUT_DIR>/_leases/ 与各输出目录的 _leases/ 下；各节点需以相同路径挂载输入与输出目录。
+    cluster_claim: str = "off"
+    # 本节点标识（写入租约文件，便于排查）；留空=主机名-进程号。
+    cluster_node_id: str = ""
+    # 租约有效期（秒）：持有者每 1/3 有效期续约一次；超过有效期未续约视为节点失联，其它节点可接管。应明显大于节点间时钟偏差。
+    lease_ttl_s: int = 120
 
     # PDF 偶发漏字补救：对指定页本地渲染为图片后以“图片模式”重跑 OCR，并用重跑结果替换该页输出。
     # 页码格式示例：`15`、`15,18-20`；留空表示关闭。
@@ -85,8 +118,9 @@ class AppConfig:
         Path(self.output_dir).mkdir(parents=True, exist_ok=True)
 
 
-def load_config() -> AppConfig:
-    path = _config_path()
+def load_config(path: Optional[Path] = None) -> AppConfig:
+    """读取配置文件；path 为空时使用默认位置（与界面共用）。"""
+    path = path or _config_path()
     if not path.exists():
         return AppConfig()
     try:
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import ContextManager, Iterator, Optional
+
+from pabble_ocr.config import AppConfig
+from pabble_ocr.core.control import RunControl
+
+
+@contextmanager
+def _hold(sem: threading.BoundedSemaphore, control: Optional[RunControl] = None) -> Iterator[None]:
+    if control is None:
+        sem.acquire()
+    else:
+        # 排队等待请求名额期间也要响应取消
+        while not sem.acquire(timeout=0.2):
+            control.raise_if_canceled()
+    try:
+        yield
+    finally:
+        sem.release()
+
+
+@dataclass
+class RunLimits:
+    """
+    多文件并发时跨文件共享的资源上限：
+    - requests：同时在途的 API 请求数（layout-parsing / restructure-pages），None=不额外限制
+    - merges：同时进行的合并阶段数（碎片图合并/图片落盘是 CPU 密集的，且自身已按分段开进程池）
+    - 请求最小间隔（REQUEST_MIN_INTERVAL_MS）也在这里全局生效，而非每个文件各算各的
+    """
+
+    requests: Optional[threading.BoundedSemaphore] = None
+    merges: Optional[threading.BoundedSemaphore] = None
+    min_interval_ms: int = 0
+    _interval_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _last_request_at: Optional[float] = field(default=None, repr=False)
+
+    @classmethod
+    def from_config(cls, config: AppConfig) -> "RunLimits":
+        n_req = int(config.max_inflight_requests or 0)
+        n_merge = int(config.max_concurrent_merges or 0)
+        return cls(
+            requests=threading.BoundedSemaphore(n_req) if n_req > 0 else None,
+            merges=threading.BoundedSemaphore(n_merge) if n_merge > 0 else None,
+            min_interval_ms=int(config.request_min_interval_ms or 0),
+        )
+
+    def request_slot(self, control: Optional[RunControl] = None) -> ContextManager[None]:
+        return _hold(self.requests, control) if self.requests is not None else nullcontext()
+
+    def merge_slot(self) -> ContextManager[None]:
+        return _hold(self.merges) if self.merges is not None else nullcontext()
+
+    def respect_min_interval(self) -> None:
+        ms = int(self.min_interval_ms or 0)
+        if ms <= 0:
+            return
+        # 持锁 sleep：保证并发线程之间也按间隔依次放行
+        with self._interval_lock:
+            now = time.time()
+            if self._last_request_at is not None:
+                need = ms / 1000.0 - (now - self._last_request_at)
+                if need > 0:
+                    time.sleep(need)
+            self._last_request_at = time.time()
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import logging
+import time
+from threading import Condition
+from typing import Callable, Optional
+from weakref import WeakSet
+
+
+logger = logging.getLogger(__name__)
+
+
+class CanceledError(RuntimeError):
+    pass
+
+
+class RunControl:
+    """
+    暂停/取消信号（条件变量驱动，无轮询）：
+    - Runner 持有根节点（全局暂停 / 全部停止），每个运行中的队列项用 child() 派生子节点（单独取消）
+    - 子节点继承父节点的暂停与取消；整棵树共用一个 Condition，状态变化立即唤醒所有等待者
+    - on_cancel() 注册取消回调（例如中断在途 HTTP 请求的 socket），取消时在调用 cancel() 的线程里执行
+    """
+
+    def __init__(self, parent: Optional["RunControl"] = None) -> None:
+        self._parent = parent
+        self._cv: Condition = parent._cv if parent is not None else Condition()
+        self._paused = False
+        self._canceled = False
+        self._callbacks: dict[int, Callable[[], None]] = {}
+        self._next_token = 0
+        self._children: "WeakSet[RunControl]" = WeakSet()
+
+    def child(self) -> "RunControl":
+        ctl = RunControl(self)
+        with self._cv:
+            self._children.add(ctl)
+        return ctl
+
+    def is_paused(self) -> bool:
+        return self._paused or (self._parent is not None and self._parent.is_paused())
+
+    def is_canceled(self) -> bool:
+        return self._canceled or (self._parent is not None and self._parent.is_canceled())
+
+    def pause(self) -> None:
+        with self._cv:
+            self._paused = True
+            self._cv.notify_all()
+
+    def resume(self) -> None:
+        with self._cv:
+            self._paused = False
+            self._cv.notify_all()
+
+    def cancel(self) -> None:
+        """取消本节点及全部子节点，并执行它们已注册的取消回调。"""
+        with self._cv:
+            pending: list[Callable[[], None]] = []
+            stack = [self]
+            while stack:
+                ctl = stack.pop()
+                if not ctl._canceled:
+                    ctl._canceled = True
+                    pending.extend(ctl._callbacks.values())
+                stack.extend(ctl._children)
+            self._cv.notify_all()
+        for fn in pending:
+            try:
+                fn()
+            except Exception:
+                logger.debug("取消回调执行失败", exc_info=True)
+
+    def on_cancel(self, fn: Callable[[], None]) -> Callable[[], None]:
+        """注册取消回调，返回注销函数；已处于取消状态时立即执行。"""
+        with self._cv:
+            canceled = self.is_canceled()
+            if not canceled:
+                token = self._next_token
+                self._next_token += 1
+                self._callbacks[token] = fn
+        if canceled:
+            fn()
+            return lambda: None
+
+        def _remove() -> None:
+            with self._cv:
+                self._callbacks.pop(token, None)
+
+        return _remove
+
+    def raise_if_canceled(self) -> None:
+        if self.is_canceled():
+            raise CanceledError()
+
+    def wait_if_paused(self) -> None:
+        """暂停期间阻塞到继续或取消；已取消时抛出 CanceledError。"""
+        with self._cv:
+            while self.is_paused() and not self.is_canceled():
+                self._cv.wait()
+        self.raise_if_canceled()
+
+    def sleep(self, seconds: float) -> None:
+        """可被取消打断的 sleep（用于重试退避）；取消时抛出 CanceledError。"""
+        deadline = time.monotonic() + max(0.0, float(seconds))
+        with self._cv:
+            while not self.is_canceled():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cv.wait(remaining)
+        self.raise_if_canceled()
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+
+from pabble_ocr.core.leases import LEASES_DIRNAME
+from pabble_ocr.core.models import QueueItem
+from pabble_ocr.core.state_store import STATE_FILENAME, load_state, save_state
+from pabble_ocr.utils.io import atomic_write_json
+
+
+logger = logging.getLogger(__name__)
+
+# 重复输入的输出目录中记录“复用自哪个任务”
+DUPLICATE_FILENAME = "duplicate_of.json"
+
+_EDGE_BYTES = 64 * 1024
+_CHUNK_BYTES = 1024 * 1024
+
+
+def quick_digest(path: Path, size: int) -> str:
+    """预筛指纹：大小 + 首尾各 64KB 的哈希；不同则内容必然不同，相同再算全量哈希。"""
+    h = hashlib.sha256()
+    h.update(str(int(size)).encode("ascii"))
+    with open(path, "rb") as f:
+        h.update(f.read(_EDGE_BYTES))
+        if size > _EDGE_BYTES:
+            f.seek(max(_EDGE_BYTES, size - _EDGE_BYTES))
+            h.update(f.read(_EDGE_BYTES))
+    return h.hexdigest()
+
+
+def full_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(_CHUNK_BYTES)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class _Entry:
+    __slots__ = ("item", "seq", "size", "quick", "full", "root", "settled", "lock", "future")
+
+    def __init__(self, item: QueueItem, seq: int, size: int) -> None:
+        self.item = item
+        self.seq = seq
+        self.size = size
+        self.quick: Optional[str] = None
+        self.full: Optional[str] = None
+        # 内容相同的更早队列项（原件）；None 表示本项自己就是原件
+        self.root: Optional["_Entry"] = None
+        # 本次运行中已处理结束（完成/失败/取消）；此前的状态可能是上次运行遗留的
+        self.settled = False
+        self.lock = Lock()
+        self.future: Optional[Future] = None
+
+
+class DedupeTracker:
+    """
+    按内容识别重复输入（DEDUPE_INPUTS）：同一内容以最先加入的队列项为“原件”，后来者复用原件的输出，不再调用 API。
+    - add() 只做一次 stat，哈希在后台线程池里算；大小唯一的文件无需读内容
+    - 逐级比较：大小 -> 首尾块哈希 -> 全量 SHA-256，只有前一级相同才算下一级
+    - 原件失败/取消时，由同内容的下一个队列项自己处理并接替为原件
+    """
+
+    def __init__(self, workers: int = 0) -> None:
+        n = int(workers or 0) or min(4, os.cpu_count() or 1)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, n), thread_name_prefix="pabble-dedupe")
+        self._lock = Lock()
+        self._entries: dict[int, _Entry] = {}
+        self._by_size: dict[int, list[_Entry]] = {}
+        # 失败的原件 -> 接替它的队列项
+        self._replaced: dict[int, _Entry] = {}
+        self._seq = 0
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def add(self, item: QueueItem) -> None:
+        with self._lock:
+            if id(item) in self._entries:
+                return
+            try:
+                size = int(item.input_path.stat().st_size)
+            except OSError:
+                return
+            self._seq += 1
+            entry = _Entry(item, self._seq, size)
+            self._entries[id(item)] = entry
+            peers = self._by_size.setdefault(size, [])
+            peers.append(entry)
+            if len(peers) > 1:
+                # 只有遇到同大小的更早文件才需要读内容比较
+                entry.future = self._pool.submit(self._classify, entry)
+
+    def canonical_of(self, item: QueueItem) -> Optional[QueueItem]:
+        """返回 item 的原件（内容相同、更早加入的队列项）；不是重复项时返回 None。必要时等待后台哈希完成。"""
+        with self._lock:
+            entry = self._entries.get(id(item))
+            future = entry.future if entry is not None else None
+        if entry is None or future is None:
+            return None
+        try:
+            future.result()
+        except Exception:
+            logger.warning("计算内容哈希失败，按非重复处理：%s", item.input_path, exc_info=True)
+            return None
+        with self._lock:
+            root = self._resolve(entry.root)
+            if root is None or root is entry:
+                return None
+            return root.item
+
+    def _resolve(self, root: Optional[_Entry]) -> Optional[_Entry]:
+        # 沿“原件的原件 / 接替者”找到当前真正的原件（调用方持有 _lock）
+        while root is not None:
+            if id(root) in self._replaced:
+                root = self._replaced[id(root)]
+            elif root.root is not None:
+                root = root.root
+            else:
+                break
+        return root
+
+    def settle(self, item: QueueItem) -> None:
+        """Runner 处理完 item（任何结果）后调用；等待它的重复项据此决定复用还是自己处理。"""
+        with self._lock:
+            entry = self._entries.get(id(item))
+            if entry is not None:
+                entry.settled = True
+
+    def is_settled(self, item: QueueItem) -> bool:
+        with self._lock:
+            entry = self._entries.get(id(item))
+            return entry is None or entry.settled
+
+    def digest_of(self, item: QueueItem) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(id(item))
+        return entry.full if entry is not None else None
+
+    def promote(self, item: QueueItem) -> None:
+        """原件失败/取消后，让 item 自己处理并接替为该内容的原件（后续同内容的队列项改为复用 item 的输出）。"""
+        with self._lock:
+            entry = self._entries.get(id(item))
+            if entry is None or entry.root is None:
+                return
+            root = self._resolve(entry.root)
+            entry.root = None
+            if root is not None and root is not entry:
+                self._replaced[id(root)] = entry
+
+    def _classify(self, entry: _Entry) -> None:
+        with self._lock:
+            earlier = [e for e in self._by_size.get(entry.size, []) if e.seq < entry.seq]
+        quick = self._quick(entry)
+        candidates = sorted((e for e in earlier if self._quick(e) == quick), key=lambda e: e.seq)
+        if not candidates:
+            return
+        full = self._full(entry)
+        for e in candidates:
+            if self._full(e) == full:
+                with self._lock:
+                    entry.root = e
+                return
+
+    def _quick(self, entry: _Entry) -> str:
+        with entry.lock:
+            if entry.quick is None:
+                entry.quick = quick_digest(entry.item.input_path, entry.size)
+            return entry.quick
+
+    def _full(self, entry: _Entry) -> str:
+        with entry.lock:
+            if entry.full is None:
+                entry.full = full_digest(entry.item.input_path)
+            return entry.full
+
+
+def materialize_duplicate(canonical: QueueItem, item: QueueItem, *, digest: Optional[str] = None) -> int:
+    """
+    用原件的输出生成重复项的输出目录：逐个文件硬链接（跨盘/不支持时复制），
+    task_state.json 改写为本输入的路径（之后重新入队可直接续跑为已完成），并写入 duplicate_of.json。
+    返回链接/复制的文件数。
+    """
+    src_root = canonical.output_dir
+    dst_root = item.output_dir
+    state = load_state(src_root)
+    if state is None or not state.merged_md_done:
+        raise RuntimeError(f"原件尚未完成输出：{src_root}")
+    dst_root.mkdir(parents=True, exist_ok=True)
+    count = 0
+    for dirpath, dirnames, filenames in os.walk(src_root):
+        dirnames[:] = [d for d in dirnames if d != LEASES_DIRNAME]
+        rel = Path(dirpath).relative_to(src_root)
+        for name in filenames:
+            if rel == Path(".") and name in (STATE_FILENAME, DUPLICATE_FILENAME):
+                continue
+            src = Path(dirpath) / name
+            dst = dst_root / rel / name
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                if dst.exists():
+                    dst.unlink()
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)
+            count += 1
+
+    # 分段路径若是原件输出目录内的绝对路径，改指向本目录；图片输入的分段路径就是输入文件本身
+    for seg in state.segments:
+        p = Path(seg.part_path)
+        if str(p) == str(canonical.input_path):
+            seg.part_path = str(item.input_path)
+        elif p.is_absolute():
+            try:
+                seg.part_path = str(dst_root / p.relative_to(src_root))
+            except ValueError:
+                pass
+    state.input_path = str(item.input_path)
+    state.output_dir = str(dst_root)
+    save_state(dst_root, state)
+    atomic_write_json(
+        dst_root / DUPLICATE_FILENAME,
+        {
+            "canonical_input": str(canonical.input_path),
+            "canonical_output_dir": str(src_root),
+            "sha256": digest,
+            "linked_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+    )
+    return count
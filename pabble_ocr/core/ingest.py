@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from pabble_ocr.core.file_types import detect_file_type
+from pabble_ocr.core.queue_manager import QueueBuildResult, build_queue_items
+
+
+def iter_input_files(
+    paths: list[Path],
+    *,
+    is_canceled: Optional[Callable[[], bool]] = None,
+    on_skipped: Optional[Callable[[Path], None]] = None,
+) -> Iterator[Path]:
+    """
+    流式展开输入路径（os.scandir 深度优先，边遍历边产出）：
+    - 只产出 PDF/图片；其它文件交给 on_skipped，隐藏文件与隐藏目录直接忽略
+    - 每个目录内按名称排序，先产出该目录的文件再进入子目录；不需要先遍历、排序整棵树
+    """
+    canceled = is_canceled or (lambda: False)
+    for root in paths:
+        if canceled():
+            return
+        if root.is_file():
+            if detect_file_type(root) != "unknown":
+                yield root
+            elif on_skipped is not None:
+                on_skipped(root)
+            continue
+        if not root.is_dir():
+            if on_skipped is not None:
+                on_skipped(root)
+            continue
+        stack: list[Path] = [root]
+        while stack:
+            if canceled():
+                return
+            d = stack.pop()
+            try:
+                with os.scandir(d) as it:
+                    entries = sorted(it, key=lambda e: e.name.lower())
+            except OSError:
+                continue
+            subdirs: list[Path] = []
+            for e in entries:
+                if e.name.startswith("."):
+                    continue
+                try:
+                    if e.is_dir(follow_symlinks=False):
+                        subdirs.append(Path(e.path))
+                        continue
+                    if not e.is_file():
+                        continue
+                except OSError:
+                    continue
+                p = Path(e.path)
+                if detect_file_type(p) != "unknown":
+                    yield p
+                elif on_skipped is not None:
+                    on_skipped(p)
+            # 逆序压栈：子目录按名称顺序出栈
+            stack.extend(reversed(subdirs))
+
+
+def iter_queue_batches(
+    paths: list[Path],
+    output_root: Path,
+    *,
+    batch_size: int = 200,
+    max_delay_s: float = 0.3,
+    use_index: bool = True,
+    is_canceled: Optional[Callable[[], bool]] = None,
+) -> Iterator[QueueBuildResult]:
+    """
+    边遍历边建队列项：凑够 batch_size 个文件或距上一批超过 max_delay_s 秒即产出一批，
+    目录很大或遍历很慢（网络盘）时首批也能很快开始处理。
+    """
+    pending: list[Path] = []
+    skipped: list[Path] = []
+    size = max(1, int(batch_size))
+    last = time.monotonic()
+
+    def _flush() -> QueueBuildResult:
+        result = build_queue_items(pending, output_root, use_index=use_index)
+        batch = QueueBuildResult(items=result.items, skipped=skipped + result.skipped)
+        pending.clear()
+        skipped.clear()
+        return batch
+
+    for p in iter_input_files(paths, is_canceled=is_canceled, on_skipped=skipped.append):
+        pending.append(p)
+        if len(pending) >= size or time.monotonic() - last >= max_delay_s:
+            yield _flush()
+            last = time.monotonic()
+    if pending or skipped:
+        yield _flush()
@@ -0,0 +1,468 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from pabble_ocr.config import AppConfig
+from pabble_ocr.core.models import FileTaskState, QueueItem, SegmentState
+from pabble_ocr.core.queue_manager import claim_output_dir
+from pabble_ocr.core.state_store import STATE_FILENAME, load_state, save_state
+
+
+# 租约目录：输出根目录下（按输入文件认领）与每个输出目录内 task_state.json 旁（按分段认领/合并/写状态）
+LEASES_DIRNAME = "_leases"
+# 多节点认领模式：off=单机（默认）；file=按文件认领；segment=大 PDF 按分段认领
+CLAIM_MODES = ("off", "file", "segment")
+
+_STATE_LOCK_NAME = "state.lock"
+_MERGE_LEASE_NAME = "merge.lease"
+# 写 task_state.json 的互斥锁只在“读-合并-写”期间持有，有效期短于普通租约
+_STATE_LOCK_TTL_S = 30.0
+
+
+_LEASE_NAME_UNSAFE_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def _lease_name(value: str, *, max_len: int = 60) -> str:
+    return _LEASE_NAME_UNSAFE_RE.sub("_", value)[:max_len] or "lease"
+
+
+def normalize_claim_mode(value: object) -> str:
+    v = str(value or "").strip().lower()
+    return v if v in CLAIM_MODES else "off"
+
+
+def default_node_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeaseHeldError(RuntimeError):
+    """租约被其它节点持有（且未过期）。"""
+
+
+@dataclass
+class Lease:
+    path: Path
+    token: str
+    node_id: str
+    ttl_s: float
+    on_lost: Optional[Callable[[], None]] = field(default=None, repr=False)
+    lost: bool = False
+
+
+class LeaseManager:
+    """
+    基于共享文件系统的租约（无中心协调者）：
+    - 获取：先写临时文件，再 os.link 到租约路径；link 在目标已存在时失败，NFS/SMB 上同样是原子的
+    - 续约：后台心跳线程每 ttl/3 秒更新一次租约文件 mtime；发现租约文件已被替换/删除时标记 lost 并回调 on_lost
+    - 过期接管：租约文件 mtime 超过持有者声明的 ttl 未更新，视为节点失联；通过 rename 把旧租约挪走（只有一个节点能成功）后重新获取
+    注意：过期判断依赖各节点时钟，TTL 应明显大于节点间时钟偏差。
+    """
+
+    def __init__(self, node_id: str, ttl_s: float = 120.0) -> None:
+        self.node_id = node_id or default_node_id()
+        self.ttl_s = max(5.0, float(ttl_s))
+        self._lock = threading.Lock()
+        self._held: dict[str, Lease] = {}
+        self._heartbeat: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+
+    # --- 基本操作 ---
+
+    def try_acquire(
+        self,
+        path: Path,
+        *,
+        ttl_s: Optional[float] = None,
+        info: Optional[dict[str, Any]] = None,
+        on_lost: Optional[Callable[[], None]] = None,
+    ) -> Optional[Lease]:
+        """尝试获取租约；被其它节点有效持有时返回 None。"""
+        ttl = float(ttl_s or self.ttl_s)
+        token = uuid.uuid4().hex
+        payload = {
+            "node": self.node_id,
+            "token": token,
+            "ttl_s": ttl,
+            "pid": os.getpid(),
+            "acquired_at": time.time(),
+            **(info or {}),
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{token}.tmp")
+        tmp.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        try:
+            for _ in range(2):
+                if self._link(tmp, path):
+                    lease = Lease(path=path, token=token, node_id=self.node_id, ttl_s=ttl, on_lost=on_lost)
+                    self._track(lease)
+                    return lease
+                if not self._break_if_expired(path):
+                    return None
+            return None
+        finally:
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+
+    def acquire(self, path: Path, *, timeout_s: float, ttl_s: Optional[float] = None) -> Lease:
+        """阻塞获取（短期互斥用）；超时抛 LeaseHeldError。"""
+        deadline = time.monotonic() + max(0.0, timeout_s)
+        delay = 0.02
+        while True:
+            lease = self.try_acquire(path, ttl_s=ttl_s)
+            if lease is not None:
+                return lease
+            if time.monotonic() >= deadline:
+                holder = read_lease(path) or {}
+                raise LeaseHeldError(f"租约被占用：{path}（{holder.get('node') or '未知节点'}）")
+            time.sleep(delay)
+            delay = min(0.5, delay * 2)
+
+    def renew(self, lease: Lease) -> bool:
+        if lease.lost:
+            return False
+        current = read_lease(lease.path)
+        if current is None or current.get("token") != lease.token:
+            self._mark_lost(lease)
+            return False
+        try:
+            os.utime(lease.path)
+        except OSError:
+            self._mark_lost(lease)
+            return False
+        return True
+
+    def release(self, lease: Optional[Lease]) -> None:
+        if lease is None:
+            return
+        with self._lock:
+            self._held.pop(str(lease.path), None)
+        if lease.lost:
+            return
+        current = read_lease(lease.path)
+        if current is not None and current.get("token") == lease.token:
+            try:
+                lease.path.unlink()
+            except OSError:
+                pass
+
+    def holder(self, path: Path) -> Optional[dict[str, Any]]:
+        """返回当前有效持有者信息（已过期/不存在返回 None）。"""
+        info = read_lease(path)
+        if info is None or _is_expired(path, info, self.ttl_s):
+            return None
+        return info
+
+    # --- 内部 ---
+
+    @staticmethod
+    def _link(src: Path, dst: Path) -> bool:
+        try:
+            os.link(src, dst)
+            return True
+        except FileExistsError:
+            return False
+        except OSError:
+            # 不支持硬链接的文件系统：退回 O_EXCL 创建（本地盘/SMB 上同样原子）
+            try:
+                fd = os.open(dst, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                return False
+            with os.fdopen(fd, "wb") as f:
+                f.write(src.read_bytes())
+            return True
+
+    def _break_if_expired(self, path: Path) -> bool:
+        """租约已过期则挪走；返回是否可以重试获取。"""
+        info = read_lease(path)
+        if info is None:
+            # 刚被释放，或对方还没写完（O_EXCL 退路下）：按文件 mtime 判断
+            if path.exists() and not _is_expired(path, {}, self.ttl_s):
+                return False
+            if not path.exists():
+                return True
+        elif not _is_expired(path, info, self.ttl_s):
+            return False
+        stale = path.with_name(f"{path.name}.stale-{uuid.uuid4().hex}")
+        try:
+            os.replace(path, stale)
+        except FileNotFoundError:
+            return True
+        except OSError:
+            return False
+        try:
+            # rename 与过期判断之间原持有者可能刚好续约：此时把租约还回去（对方下次续约会核对 token）
+            if not _is_expired(stale, read_lease(stale) or {}, self.ttl_s):
+                if self._link(stale, path):
+                    return False
+        finally:
+            try:
+                stale.unlink()
+            except OSError:
+                pass
+        return True
+
+    def _track(self, lease: Lease) -> None:
+        with self._lock:
+            self._held[str(lease.path)] = lease
+            if self._heartbeat is None or not self._heartbeat.is_alive():
+                self._heartbeat = threading.Thread(target=self._beat, name="pabble-lease-heartbeat", daemon=True)
+                self._heartbeat.start()
+
+    def _mark_lost(self, lease: Lease) -> None:
+        if lease.lost:
+            return
+        lease.lost = True
+        with self._lock:
+            self._held.pop(str(lease.path), None)
+        if lease.on_lost is not None:
+            try:
+                lease.on_lost()
+            except Exception:
+                pass
+
+    def _beat(self) -> None:
+        while True:
+            with self._lock:
+                leases = list(self._held.values())
+                if not leases:
+                    self._heartbeat = None
+                    return
+            interval = max(1.0, min(lease.ttl_s for lease in leases) / 3.0)
+            self._wake.wait(interval)
+            for lease in leases:
+                with self._lock:
+                    still_held = self._held.get(str(lease.path)) is lease
+                if still_held:
+                    self.renew(lease)
+
+
+def read_lease(path: Path) -> Optional[dict[str, Any]]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _is_expired(path: Path, info: dict[str, Any], default_ttl_s: float) -> bool:
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        return True
+    try:
+        ttl = float(info.get("ttl_s") or default_ttl_s)
+    except (TypeError, ValueError):
+        ttl = default_ttl_s
+    return time.time() - mtime > ttl
+
+
+def _adopt_peer_progress(state: FileTaskState, disk: FileTaskState, *, mine: set[str]) -> int:
+    """把磁盘上其它节点完成的分段合入内存 state（自己正在处理的分段以内存为准）；返回合入数。"""
+    if [s.segment_id for s in disk.segments] != [s.segment_id for s in state.segments]:
+        return 0
+    adopted = 0
+    for mem, other in zip(state.segments, disk.segments):
+        if mem.segment_id in mine or mem.done or not other.done:
+            continue
+        _copy_segment(mem, other)
+        adopted += 1
+    state.images_downloaded = sorted(set(state.images_downloaded or []) | set(disk.images_downloaded or []))
+    if disk.merged_md_done and all(s.done for s in state.segments):
+        state.merged_md_done = True
+    return adopted
+
+
+def _copy_segment(dst: SegmentState, src: SegmentState) -> None:
+    dst.done = src.done
+    dst.attempts = max(dst.attempts, src.attempts)
+    dst.elapsed_s = src.elapsed_s
+    dst.last_http_status = src.last_http_status
+    dst.last_error = src.last_error
+    dst.ocr_options_hash = src.ocr_options_hash
+
+
+class SegmentClaims:
+    """
+    segment 模式下一个队列项的认领上下文（传给 process_queue_item）：
+    - 分段租约：<output_dir>/_leases/<segment_id>.lease，同一分段同一时刻只有一个节点调用 API
+    - 写 task_state.json 前持短期锁并合入其它节点已完成的分段，避免互相覆盖进度
+    - 合并输出前获取 merge 租约，只由一个节点执行合并
+    - 切分 PDF 期间持有的文件租约在 setup_done() 时释放，其它节点随即可以加入处理同一文件
+    """
+
+    def __init__(
+        self,
+        manager: LeaseManager,
+        output_dir: Path,
+        *,
+        setup_lease: Optional[Lease] = None,
+        on_lost: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self._manager = manager
+        self._output_dir = output_dir
+        self._setup_lease = setup_lease
+        self._on_lost = on_lost
+        self._segments: dict[str, Lease] = {}
+        self._merge: Optional[Lease] = None
+        self._lock = threading.Lock()
+        # process_queue_item 因等待其它节点（分段处理中/正在合并）而返回 False 时置位，Runner 据此延迟重试
+        self.waiting = False
+
+    def _lease_path(self, name: str) -> Path:
+        return self._output_dir / LEASES_DIRNAME / name
+
+    def setup_done(self) -> None:
+        lease, self._setup_lease = self._setup_lease, None
+        self._manager.release(lease)
+
+    def claim_segment(self, seg: SegmentState, state: FileTaskState) -> str:
+        """
+        认领分段：返回 "claimed"（由本节点处理）/ "held"（其它节点处理中）/ "done"（其它节点已完成，已合入 state）。
+        """
+        lease = self._manager.try_acquire(
+            self._lease_path(f"{_lease_name(seg.segment_id)}.lease"),
+            info={"segment_id": seg.segment_id, "output_dir": str(self._output_dir)},
+            on_lost=self._on_lost,
+        )
+        if lease is None:
+            return "held"
+        # 拿到租约后再看一眼磁盘：可能是其它节点刚完成并释放
+        disk = load_state(self._output_dir)
+        if disk is not None:
+            for other in disk.segments:
+                if other.segment_id == seg.segment_id and other.done and not seg.done:
+                    _copy_segment(seg, other)
+                    self._manager.release(lease)
+                    return "done"
+        with self._lock:
+            self._segments[seg.segment_id] = lease
+        return "claimed"
+
+    def release_segment(self, seg: SegmentState) -> None:
+        with self._lock:
+            lease = self._segments.pop(seg.segment_id, None)
+        self._manager.release(lease)
+
+    def held_by_peer(self, seg: SegmentState) -> bool:
+        path = self._lease_path(f"{_lease_name(seg.segment_id)}.lease")
+        info = self._manager.holder(path)
+        return info is not None and info.get("node") != self._manager.node_id
+
+    def claim_merge(self) -> bool:
+        if self._merge is None:
+            self._merge = self._manager.try_acquire(
+                self._lease_path(_MERGE_LEASE_NAME), info={"output_dir": str(self._output_dir)}, on_lost=self._on_lost
+            )
+        return self._merge is not None
+
+    def sync(self, state: FileTaskState) -> int:
+        """从磁盘合入其它节点的进度（不写盘）。"""
+        disk = load_state(self._output_dir)
+        if disk is None:
+            return 0
+        with self._lock:
+            mine = set(self._segments)
+        return _adopt_peer_progress(state, disk, mine=mine)
+
+    def save_state(self, output_dir: Path, state: FileTaskState) -> Path:
+        lock = self._manager.acquire(
+            self._lease_path(_STATE_LOCK_NAME), timeout_s=_STATE_LOCK_TTL_S, ttl_s=_STATE_LOCK_TTL_S
+        )
+        try:
+            self.sync(state)
+            return save_state(output_dir, state)
+        finally:
+            self._manager.release(lock)
+
+    def release_all(self) -> None:
+        self.setup_done()
+        with self._lock:
+            leases = list(self._segments.values())
+            self._segments.clear()
+        for lease in leases:
+            self._manager.release(lease)
+        merge, self._merge = self._merge, None
+        self._manager.release(merge)
+
+
+@dataclass
+class ItemClaim:
+    """Runner 对一个队列项的认领结果。"""
+
+    lease: Optional[Lease]
+    output_dir: Path
+    segments: Optional[SegmentClaims] = None
+
+    def release(self, manager: LeaseManager) -> None:
+        if self.segments is not None:
+            self.segments.release_all()
+        manager.release(self.lease)
+
+
+class ClusterClaims:
+    """
+    多节点共享同一输出根目录时的队列项认领：
+    - 输入文件租约：<output_root>/_leases/<输入路径 hash>.lease（各节点需以相同路径挂载输入目录）
+    - 持有租约后再确定输出目录（claim_output_dir 以 mkdir 的原子性避免两个节点选中同一目录）
+    """
+
+    def __init__(self, manager: LeaseManager, *, mode: str, output_root: Path) -> None:
+        self.manager = manager
+        self.mode = mode
+        self._output_root = output_root
+
+    @classmethod
+    def from_config(cls, config: AppConfig) -> Optional["ClusterClaims"]:
+        mode = normalize_claim_mode(config.cluster_claim)
+        if mode == "off":
+            return None
+        manager = LeaseManager(
+            str(config.cluster_node_id or "").strip() or default_node_id(),
+            float(config.lease_ttl_s or 120),
+        )
+        return cls(manager, mode=mode, output_root=Path(config.output_dir))
+
+    def input_lease_path(self, item: QueueItem) -> Path:
+        key = hashlib.sha1(str(item.input_path).encode("utf-8")).hexdigest()[:16]
+        return self._output_root / LEASES_DIRNAME / f"{_lease_name(item.input_path.stem, max_len=40)}-{key}.lease"
+
+    def claim(self, item: QueueItem, *, on_lost: Callable[[], None]) -> tuple[Optional[ItemClaim], str]:
+        """
+        认领队列项；返回 (认领结果, 说明)。认领结果为 None 时说明为其它节点的持有信息。
+        """
+        path = self.input_lease_path(item)
+        lease = self.manager.try_acquire(path, info={"input_path": str(item.input_path)}, on_lost=on_lost)
+        if lease is None:
+            holder = self.manager.holder(path) or read_lease(path) or {}
+            return None, f"其它节点处理中（{holder.get('node') or '未知节点'}）"
+        try:
+            output_dir = claim_output_dir(item.input_path, self._output_root)
+        except Exception:
+            self.manager.release(lease)
+            raise
+        claim = ItemClaim(lease=lease, output_dir=output_dir)
+        if self.mode == "segment":
+            # 文件租约交给 SegmentClaims：切分完成后释放，其它节点即可按分段加入
+            claim.segments = SegmentClaims(self.manager, output_dir, setup_lease=lease, on_lost=on_lost)
+            claim.lease = None
+        return claim, ""
+
+
+def is_state_complete(output_dir: Path) -> bool:
+    """输出目录内 task_state.json 显示已全部完成并合并输出。"""
+    if not (output_dir / STATE_FILENAME).exists():
+        return False
+    state = load_state(output_dir)
+    return bool(state and state.segments and state.merged_md_done and all(s.done for s in state.segments))
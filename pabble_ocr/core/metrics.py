@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Any, ContextManager, Iterable, Iterator, Optional
+
+from pabble_ocr.core.models import QueueItem
+
+
+# 流水线各阶段（按处理顺序）；耗时按线程累计，并发时总和可超过墙钟时间，只看占比
+STAGES = ("prepare", "slot", "api", "download", "merge")
+STAGE_LABELS = {
+    "prepare": "编码上传数据",
+    "slot": "等待请求名额",
+    "api": "API 请求",
+    "download": "下载图片",
+    "merge": "合并与落盘",
+}
+
+# 滚动窗口（秒）：吞吐、延迟分位数、阶段占比都只看最近这段时间
+_WINDOW_S = 300.0
+# 计算速率的最短时间跨度：刚开始运行时避免几秒内的数据算出离谱的速率
+_MIN_SPAN_S = 5.0
+
+
+@dataclass
+class RequestRecord:
+    """一次 API 请求的统计；track_request() 内由调用方填入响应。"""
+
+    sent: int = 0
+    received: int = 0
+    ok: bool = False
+
+    def set_response(self, resp: Any) -> None:
+        body = getattr(getattr(resp, "request", None), "body", None)
+        self.sent = len(body) if isinstance(body, (bytes, str)) else 0
+        try:
+            self.received = len(resp.content or b"")
+        except Exception:
+            self.received = 0
+        self.ok = int(getattr(resp, "status_code", 0) or 0) < 400
+
+
+@dataclass
+class MetricsSnapshot:
+    elapsed_s: float = 0.0
+    pages_done: int = 0
+    pages_per_min: float = 0.0
+    items_done: int = 0
+    items_failed: int = 0
+    inflight: int = 0
+    requests: int = 0
+    requests_failed: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    upload_bps: float = 0.0
+    latency_p50: Optional[float] = None
+    latency_p90: Optional[float] = None
+    latency_p99: Optional[float] = None
+    # 窗口内各阶段累计耗时（秒）
+    stage_seconds: dict[str, float] = field(default_factory=dict)
+    remaining_pages: int = 0
+    # 仍有队列项的页数在后台统计中（ETA 偏小）
+    counting: bool = False
+    seconds_per_page: Optional[float] = None
+    eta_s: Optional[float] = None
+
+    def stage_shares(self) -> dict[str, float]:
+        total = sum(self.stage_seconds.values())
+        if total <= 0:
+            return {}
+        return {k: v / total for k, v in self.stage_seconds.items()}
+
+    def bottleneck(self) -> str:
+        """按窗口内的阶段占比粗略判断瓶颈在哪一侧。"""
+        shares = self.stage_shares()
+        if not shares:
+            return ""
+        if shares.get("slot", 0.0) >= 0.3:
+            return "请求名额：大量时间在排队等待（可调大 MAX_INFLIGHT_REQUESTS / 调小 REQUEST_MIN_INTERVAL_MS）"
+        if shares.get("api", 0.0) >= 0.6:
+            return "服务端：大部分时间在等待 API 响应"
+        if shares.get("prepare", 0.0) + shares.get("download", 0.0) + shares.get("merge", 0.0) >= 0.5:
+            return "本地：编码/下载/合并占用了大部分时间"
+        return "较均衡"
+
+
+def _percentile(sorted_values: list[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+class MetricsBus:
+    """
+    处理流水线的指标汇总（线程安全）：API 客户端、图片下载、合并与 Runner 各自上报，界面按需取快照。
+    - 吞吐/延迟/阶段占比按最近 5 分钟滚动统计；字节数与完成数为本次运行累计
+    - ETA = 剩余页数 × 近期实测的每页墙钟耗时（已含并发效果）；剩余页数由 Runner 在后台逐项统计
+    """
+
+    def __init__(self, window_s: float = _WINDOW_S) -> None:
+        self._lock = threading.Lock()
+        self._window_s = float(window_s)
+        self._started = time.monotonic()
+        self._pages: deque[tuple[float, int]] = deque()
+        self._sent: deque[tuple[float, int]] = deque()
+        self._latencies: deque[tuple[float, float]] = deque()
+        self._stages: deque[tuple[float, str, float]] = deque()
+        self._pages_done = 0
+        self._items_done = 0
+        self._items_failed = 0
+        self._inflight = 0
+        self._requests = 0
+        self._requests_failed = 0
+        self._bytes_sent = 0
+        self._bytes_received = 0
+        # id(队列项) -> [统计到的剩余页数（None=统计中）, 本次运行已完成页数]
+        self._items: dict[int, list[Optional[int]]] = {}
+        self._remaining = 0
+        self._uncounted = 0
+
+    # ---- 上报 ----
+
+    @contextmanager
+    def track_request(self) -> Iterator[RequestRecord]:
+        rec = RequestRecord()
+        started = time.monotonic()
+        with self._lock:
+            self._inflight += 1
+        try:
+            yield rec
+        finally:
+            now = time.monotonic()
+            latency = now - started
+            with self._lock:
+                self._inflight -= 1
+                self._requests += 1
+                if not rec.ok:
+                    self._requests_failed += 1
+                self._bytes_sent += rec.sent
+                self._bytes_received += rec.received
+                self._sent.append((now, rec.sent))
+                self._latencies.append((now, latency))
+                self._stages.append((now, "api", latency))
+                self._prune(now)
+
+    def add_stage(self, stage: str, seconds: float) -> None:
+        if seconds <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._stages.append((now, stage, float(seconds)))
+            self._prune(now)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.monotonic() - started)
+
+    def add_received(self, n: int) -> None:
+        with self._lock:
+            self._bytes_received += int(n)
+
+    def expect(self, items: Iterable[QueueItem]) -> None:
+        """登记待统计页数的队列项（统计完成前 ETA 标记为“统计中”）。"""
+        with self._lock:
+            for it in items:
+                if id(it) not in self._items:
+                    self._items[id(it)] = [None, 0]
+                    self._uncounted += 1
+
+    def add_pending(self, item: QueueItem, pages: int) -> None:
+        with self._lock:
+            entry = self._items.get(id(item))
+            if entry is None or entry[0] is not None:
+                # 已结束（item_finished 已移除）或已统计过
+                return
+            entry[0] = max(0, int(pages))
+            self._uncounted -= 1
+            self._remaining += max(0, entry[0] - int(entry[1] or 0))
+
+    def pages_done(self, item: QueueItem, pages: int) -> None:
+        pages = max(0, int(pages))
+        if pages <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._pages_done += pages
+            self._pages.append((now, pages))
+            entry = self._items.get(id(item))
+            if entry is not None:
+                counted, done = entry[0], int(entry[1] or 0)
+                entry[1] = done + pages
+                if counted is not None:
+                    self._remaining -= min(pages, max(0, counted - done))
+            self._prune(now)
+
+    def item_finished(self, item: QueueItem, *, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self._items_done += 1
+            else:
+                self._items_failed += 1
+            entry = self._items.pop(id(item), None)
+            if entry is None:
+                return
+            counted, done = entry[0], int(entry[1] or 0)
+            if counted is None:
+                self._uncounted -= 1
+            else:
+                # 失败/取消/复用重复输入：剩余页数不再计入 ETA
+                self._remaining -= max(0, counted - done)
+
+    # ---- 读取 ----
+
+    def snapshot(self) -> MetricsSnapshot:
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            span = max(_MIN_SPAN_S, min(self._window_s, now - self._started))
+            pages_recent = sum(n for _, n in self._pages)
+            latencies = sorted(v for _, v in self._latencies)
+            stage_seconds = {s: 0.0 for s in STAGES}
+            for _, s, v in self._stages:
+                stage_seconds[s] = stage_seconds.get(s, 0.0) + v
+            snap = MetricsSnapshot(
+                elapsed_s=now - self._started,
+                pages_done=self._pages_done,
+                pages_per_min=pages_recent * 60.0 / span,
+                items_done=self._items_done,
+                items_failed=self._items_failed,
+                inflight=self._inflight,
+                requests=self._requests,
+                requests_failed=self._requests_failed,
+                bytes_sent=self._bytes_sent,
+                bytes_received=self._bytes_received,
+                upload_bps=sum(n for _, n in self._sent) / span,
+                latency_p50=_percentile(latencies, 0.5),
+                latency_p90=_percentile(latencies, 0.9),
+                latency_p99=_percentile(latencies, 0.99),
+                stage_seconds=stage_seconds,
+                remaining_pages=max(0, self._remaining),
+                counting=self._uncounted > 0,
+            )
+        if pages_recent > 0:
+            snap.seconds_per_page = span / pages_recent
+            snap.eta_s = snap.remaining_pages * snap.seconds_per_page
+        return snap
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self._window_s
+        for q in (self._pages, self._sent, self._latencies, self._stages):
+            while q and q[0][0] < cutoff:
+                q.popleft()
+
+
+# 以下辅助函数接受 None（未启用指标时调用方不必判断）
+
+
+def track_request(metrics: Optional[MetricsBus]) -> ContextManager[RequestRecord]:
+    return metrics.track_request() if metrics is not None else nullcontext(RequestRecord())
+
+
+def stage(metrics: Optional[MetricsBus], name: str) -> ContextManager[None]:
+    return metrics.stage(name) if metrics is not None else nullcontext()
+
+
+def add_stage(metrics: Optional[MetricsBus], name: str, seconds: float) -> None:
+    if metrics is not None:
+        metrics.add_stage(name, seconds)
@@ -16,6 +16,12 @@ class QueueItem:
     progress: float = 0.0
     message: str = ""
     error: Optional[str] = None
+    # 调度优先级（QUEUE_POLICY=priority 时生效；越大越先处理）
+    priority: int = 0
+    # 队列库（queue.db）中的行号；尚未持久化时为 None
+    item_id: Optional[int] = None
+    # 内容去重（DEDUPE_INPUTS）时复用了哪个输入的输出；None 表示本项自己处理
+    duplicate_of: Optional[str] = None
 
 
 @dataclass
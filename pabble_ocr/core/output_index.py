@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import logging
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+from pabble_ocr.core.state_store import STATE_FILENAME, load_state, save_state
+from pabble_ocr.utils.paths import safe_stem
+
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIRNAME = "_index"
+INDEX_FILENAME = "outputs.db"
+
+_SUFFIX_RE = re.compile(r"^(?P<stem>.+)_(?P<n>\d{3})$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outputs (
+    dir_key TEXT PRIMARY KEY,
+    dir_name TEXT NOT NULL,
+    input_path TEXT,
+    fingerprint TEXT,
+    created_at REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_outputs_input ON outputs(input_path);
+CREATE INDEX IF NOT EXISTS idx_outputs_fingerprint ON outputs(fingerprint);
+CREATE TABLE IF NOT EXISTS stems (
+    stem_key TEXT PRIMARY KEY,
+    next_suffix INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _key(name: str) -> str:
+    # Windows 文件系统大小写不敏感：目录名/输入路径按小写比较
+    return name.lower() if os.name == "nt" else name
+
+
+def input_fingerprint(path: Path, st: Optional[os.stat_result] = None) -> str:
+    """输入文件的廉价指纹（大小 + mtime），只依赖一次 stat，不读文件内容。"""
+    st = st if st is not None else path.stat()
+    return f"{int(st.st_size)}:{int(st.st_mtime_ns)}"
+
+
+class OutputIndex:
+    """
+    输出根目录的索引（<OUTPUT_DIR>/_index/outputs.db，SQLite）：
+    - outputs：输出子目录 -> 输入路径 + 指纹；同一输入再次导入时直接查到原目录（断点续跑），不再解析 task_state.json；
+      输入被移动/改名（原路径已不存在、指纹相同）时沿用原目录，并把 task_state.json 指向新路径
+    - stems：同名 stem 的下一个可用序号；重名时直接给出 stem_NNN，不再从 _001 开始逐个 exists() 探测
+    - 首次打开时扫描一次已有输出子目录建立索引；之后新建队列项时即登记（同一批里的同名文件也不会分到同一目录）；
+      队列项移除时 forget_unused() 删掉从未开始处理的登记，目录名可再次分配
+    - 索引只是加速：分配前仍对候选目录做一次 exists()，被外部占用（手工创建/其它程序）时顺延
+    """
+
+    def __init__(self, output_root: Path) -> None:
+        self.output_root = Path(output_root)
+        self.path = self.output_root / INDEX_DIRNAME / INDEX_FILENAME
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+        if self._meta("bootstrapped") is None:
+            self._bootstrap()
+
+    def __enter__(self) -> "OutputIndex":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self._conn.commit()
+        else:
+            self._conn.rollback()
+        self.close()
+
+    def close(self) -> None:
+        try:
+            self._conn.close()
+        except sqlite3.Error:
+            pass
+
+    def commit(self) -> None:
+        self._conn.commit()
+
+    def lookup(self, input_path: Path) -> Optional[Path]:
+        row = self._conn.execute(
+            "SELECT dir_name FROM outputs WHERE input_path = ? LIMIT 1", (_key(str(input_path)),)
+        ).fetchone()
+        return self.output_root / row[0] if row else None
+
+    def lookup_fingerprint(self, fingerprint: str) -> list[tuple[Path, str]]:
+        """按指纹查已登记的输出目录，返回 [(输出目录, 当时的输入路径)]。"""
+        rows = self._conn.execute(
+            "SELECT dir_name, input_path FROM outputs WHERE fingerprint = ?", (fingerprint,)
+        ).fetchall()
+        return [(self.output_root / r[0], str(r[1] or "")) for r in rows]
+
+    def assign(self, input_path: Path, *, fingerprint: Optional[str] = None) -> Path:
+        """
+        为输入确定输出目录并登记：已登记过的输入沿用原目录，否则分配 stem / stem_NNN 中第一个空闲的名字。
+        不提交事务；批量调用后由 commit() / with 语句统一提交。
+        """
+        known = self.lookup(input_path)
+        if known is None and fingerprint:
+            known = self._adopt_moved(input_path, fingerprint)
+        if known is not None:
+            if fingerprint:
+                self._conn.execute(
+                    "UPDATE outputs SET fingerprint = ? WHERE dir_key = ?", (fingerprint, _key(known.name))
+                )
+            return known
+
+        base = safe_stem(input_path.stem)
+        name = base
+        if not self._is_free(name, input_path):
+            row = self._conn.execute("SELECT next_suffix FROM stems WHERE stem_key = ?", (_key(base),)).fetchone()
+            n = int(row[0]) if row else 1
+            while True:
+                name = f"{base}_{n:03d}"
+                n += 1
+                if self._is_free(name, input_path):
+                    break
+            self._conn.execute(
+                "INSERT INTO stems (stem_key, next_suffix) VALUES (?, ?)"
+                " ON CONFLICT(stem_key) DO UPDATE SET next_suffix = MAX(next_suffix, excluded.next_suffix)",
+                (_key(base), n),
+            )
+        self._record(name, str(input_path), fingerprint)
+        return self.output_root / name
+
+    def forget_unused(self, dir_names: Iterable[str]) -> int:
+        """删除从未开始处理（目录内没有 task_state.json）的登记；已有进度/输出的目录保留。返回删除条数。"""
+        stale = [
+            (_key(name),)
+            for name in dict.fromkeys(dir_names)
+            if not (self.output_root / name / STATE_FILENAME).exists()
+        ]
+        if stale:
+            self._conn.executemany("DELETE FROM outputs WHERE dir_key = ?", stale)
+            # 让出的 stem_NNN 可被下一个同名文件重新使用
+            for (key,) in stale:
+                m = _SUFFIX_RE.match(key)
+                if m:
+                    self._conn.execute(
+                        "UPDATE stems SET next_suffix = MIN(next_suffix, ?) WHERE stem_key = ?",
+                        (int(m.group("n")), m.group("stem")),
+                    )
+        return len(stale)
+
+    def _adopt_moved(self, input_path: Path, fingerprint: str) -> Optional[Path]:
+        # 指纹（大小 + mtime）相同且原输入已不存在：视为同一文件被移动/改名；原输入仍在时是副本，不共用目录
+        for out_dir, old_input in self.lookup_fingerprint(fingerprint):
+            if not old_input or os.path.exists(old_input):
+                continue
+            state = load_state(out_dir)
+            if state is not None:
+                state.input_path = str(input_path)
+                save_state(out_dir, state)
+            self._record(out_dir.name, str(input_path), fingerprint)
+            logger.info("输入已移动/改名，沿用原输出目录：%s -> %s", old_input, out_dir)
+            return out_dir
+        return None
+
+    def _is_free(self, name: str, input_path: Path) -> bool:
+        row = self._conn.execute("SELECT input_path FROM outputs WHERE dir_key = ?", (_key(name),)).fetchone()
+        if row is not None:
+            return False
+        cand = self.output_root / name
+        if not cand.exists():
+            return True
+        # 未登记但已存在的目录（索引建立后由外部创建）：若正是这个输入的旧输出则沿用，否则登记为已占用
+        state = load_state(cand)
+        owner = state.input_path if state else ""
+        self._record(name, owner or None, None)
+        return bool(owner) and _key(owner) == _key(str(input_path))
+
+    def _record(self, name: str, input_path: Optional[str], fingerprint: Optional[str]) -> None:
+        self._conn.execute(
+            "INSERT INTO outputs (dir_key, dir_name, input_path, fingerprint, created_at) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT(dir_key) DO UPDATE SET input_path = excluded.input_path,"
+            " fingerprint = COALESCE(excluded.fingerprint, outputs.fingerprint)",
+            (_key(name), name, _key(input_path) if input_path else None, fingerprint, time.time()),
+        )
+        m = _SUFFIX_RE.match(name)
+        if m:
+            self._conn.execute(
+                "INSERT INTO stems (stem_key, next_suffix) VALUES (?, ?)"
+                " ON CONFLICT(stem_key) DO UPDATE SET next_suffix = MAX(next_suffix, excluded.next_suffix)",
+                (_key(m.group("stem")), int(m.group("n")) + 1),
+            )
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return str(row[0]) if row else None
+
+    def _bootstrap(self) -> None:
+        """首次使用：登记输出根目录下已有的子目录（每个只解析一次 task_state.json）。"""
+        started = time.monotonic()
+        count = 0
+        try:
+            entries = list(os.scandir(self.output_root))
+        except OSError:
+            entries = []
+        with self._conn:
+            for e in entries:
+                if e.name.startswith((".", "_")):
+                    continue
+                try:
+                    if not e.is_dir():
+                        continue
+                except OSError:
+                    continue
+                owner: Optional[str] = None
+                if os.path.exists(os.path.join(e.path, STATE_FILENAME)):
+                    state = load_state(Path(e.path))
+                    owner = state.input_path if state and state.input_path else None
+                self._record(e.name, owner, None)
+                count += 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('bootstrapped', ?)", (str(time.time()),)
+            )
+        if count:
+            logger.info("输出目录索引已建立：%d 个子目录（%.1fs）", count, time.monotonic() - started)
@@ -1,21 +1,55 @@
 from __future__ import annotations
 
+import logging
+import stat
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Iterable
 
 from pabble_ocr.core.file_types import detect_file_type
 from pabble_ocr.core.models import QueueItem
+from pabble_ocr.core.output_index import INDEX_DIRNAME, INDEX_FILENAME, OutputIndex, input_fingerprint
 from pabble_ocr.core.state_store import load_state
 from pabble_ocr.utils.paths import safe_stem, unique_dir
 
 
+logger = logging.getLogger(__name__)
+
+
 @dataclass
 class QueueBuildResult:
     items: list[QueueItem]
     skipped: list[Path]
 
 
-def build_queue_items(input_paths: list[Path], output_root: Path) -> QueueBuildResult:
+def collect_input_files(paths: list[Path]) -> list[Path]:
+    """展开输入路径：目录递归收集其中全部文件（按路径排序），文件原样保留。"""
+    out: list[Path] = []
+    for p in paths:
+        if p.is_dir():
+            for child in sorted(p.rglob("*"), key=lambda x: str(x).lower()):
+                if child.is_file():
+                    out.append(child)
+        elif p.is_file():
+            out.append(p)
+    return out
+
+
+def build_queue_items(input_paths: list[Path], output_root: Path, *, use_index: bool = True) -> QueueBuildResult:
+    """
+    为输入文件建立队列项并确定输出目录。
+    use_index：通过输出根目录索引（core/output_index.py）分配目录，每个文件常数次查询；
+    False 时按旧方式逐个解析 task_state.json / 探测重名目录（多节点共享输出根目录时使用，避免在网络盘上写 SQLite）。
+    """
+    if use_index:
+        try:
+            index = OutputIndex(output_root)
+        except Exception:
+            logger.warning("输出目录索引不可用，改为逐个探测：%s", output_root, exc_info=True)
+        else:
+            with index:
+                return _build_with_index(input_paths, index)
+
     items: list[QueueItem] = []
     skipped: list[Path] = []
 
@@ -41,3 +75,58 @@ def build_queue_items(input_paths: list[Path], output_root: Path) -> QueueBuildR
         items.append(QueueItem(input_path=p, output_dir=out_dir))
 
     return QueueBuildResult(items=items, skipped=skipped)
+
+
+def _build_with_index(input_paths: list[Path], index: OutputIndex) -> QueueBuildResult:
+    items: list[QueueItem] = []
+    skipped: list[Path] = []
+    for p in input_paths:
+        try:
+            st = p.stat()
+        except OSError:
+            skipped.append(p)
+            continue
+        if not stat.S_ISREG(st.st_mode) or detect_file_type(p) == "unknown":
+            skipped.append(p)
+            continue
+        out_dir = index.assign(p, fingerprint=input_fingerprint(p, st))
+        items.append(QueueItem(input_path=p, output_dir=out_dir))
+    return QueueBuildResult(items=items, skipped=skipped)
+
+
+def forget_unused_outputs(output_dirs: Iterable[Path]) -> None:
+    """
+    队列项被移除后调用：从所在输出根目录的索引中删掉从未开始处理的目录登记，
+    避免名字一直被占用（后续同名文件被分到 _NNN）。没有索引（多节点模式 / 未建立）时不做任何事。
+    """
+    by_root: dict[Path, list[str]] = {}
+    for d in output_dirs:
+        by_root.setdefault(d.parent, []).append(d.name)
+    for root, names in by_root.items():
+        if not (root / INDEX_DIRNAME / INDEX_FILENAME).exists():
+            continue
+        try:
+            with OutputIndex(root) as index:
+                index.forget_unused(names)
+        except Exception:
+            logger.warning("更新输出目录索引失败：%s", root, exc_info=True)
+
+
+def claim_output_dir(input_path: Path, output_root: Path) -> Path:
+    """
+    多节点共享输出根目录时确定输出目录：沿用记录了同一输入的目录，否则用 mkdir 原子地占用一个新目录
+    （preferred / preferred_001 ...）。其它节点刚创建、尚未写入 task_state.json 的目录视为已被占用。
+    调用方需已持有该输入文件的租约。
+    """
+    preferred = output_root / safe_stem(input_path.stem)
+    cand = preferred
+    for i in range(1, 10000):
+        state = load_state(cand)
+        if state and state.input_path == str(input_path):
+            return cand
+        try:
+            cand.mkdir(parents=True)
+            return cand
+        except FileExistsError:
+            cand = preferred.with_name(f"{preferred.name}_{i:03d}")
+    raise RuntimeError(f"无法为输入分配输出目录：{input_path}")
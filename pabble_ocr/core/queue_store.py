@@ -1,48 +1,226 @@
 from __future__ import annotations
 
 import json
+import logging
 import os
+import sqlite3
+import time
 from pathlib import Path
-from typing import Any
+from threading import Lock
+from typing import Iterable, Optional
 
 from pabble_ocr.core.models import QueueItem
-from pabble_ocr.utils.io import atomic_write_json
 
 
-def _queue_path() -> Path:
+logger = logging.getLogger(__name__)
+
+_SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    position INTEGER NOT NULL,
+    input_path TEXT NOT NULL,
+    output_dir TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    priority INTEGER NOT NULL DEFAULT 0,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT NOT NULL DEFAULT '',
+    error TEXT,
+    duplicate_of TEXT,
+    updated_at REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_queue_items_status ON queue_items(status);
+CREATE INDEX IF NOT EXISTS idx_queue_items_position ON queue_items(position);
+"""
+
+
+def _config_dir() -> Path:
     if os.name == "nt":
         base = os.environ.get("APPDATA") or str(Path.home() / "AppData" / "Roaming")
-        return Path(base) / "PabbleOCR" / "queue.json"
-    return Path.home() / ".config" / "pabble-ocr" / "queue.json"
-
-
-def save_queue(items: list[QueueItem]) -> Path:
-    path = _queue_path()
-    payload: list[dict[str, Any]] = [
-        {
-            "input_path": str(it.input_path),
-            "output_dir": str(it.output_dir),
-            "status": it.status,
-        }
-        for it in items
-    ]
-    atomic_write_json(path, payload)
-    return path
-
-
-def load_queue() -> list[QueueItem]:
-    path = _queue_path()
-    if not path.exists():
-        return []
-    try:
-        raw = json.loads(path.read_text(encoding="utf-8"))
+        return Path(base) / "PabbleOCR"
+    return Path.home() / ".config" / "pabble-ocr"
+
+
+def _queue_path() -> Path:
+    # 旧版整表 JSON；仅用于首次启动时迁移
+    return _config_dir() / "queue.json"
+
+
+def _db_path() -> Path:
+    return _config_dir() / "queue.db"
+
+
+class QueueStore:
+    """
+    队列持久化（SQLite，WAL 模式）：每个队列项一行，状态/进度变化只更新该行，代价与队列长度无关。
+    - 队列项的 item_id 即行号；add() 时分配，之后 update()/remove() 按 item_id 定位
+    - load() 不检查输入文件是否存在（大队列启动时不逐个 stat），缺失的文件在开始处理时才判为失败
+    - 首次打开时若存在旧版 queue.json，自动导入并改名为 queue.json.migrated
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = Path(path) if path is not None else _db_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 界面线程与 worker 线程都可能写入：共用一个连接，由锁串行化
+        self._lock = Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=10.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL 下 NORMAL 只在 checkpoint 时 fsync；断电最多丢最近几次进度更新，不会损坏数据库
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+            version = int(self._conn.execute("PRAGMA user_version").fetchone()[0])
+            if 0 < version < 2:
+                # v2：新增 duplicate_of（内容去重时复用的原件路径）
+                self._conn.execute("ALTER TABLE queue_items ADD COLUMN duplicate_of TEXT")
+            if version < _SCHEMA_VERSION:
+                self._conn.execute(f"PRAGMA user_version={_SCHEMA_VERSION}")
+        if path is None:
+            self._migrate_json(_queue_path())
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+
+    def load(self, statuses: Optional[Iterable[str]] = None) -> list[QueueItem]:
+        """按导入顺序读出队列项；statuses 非空时只读这些状态（走 status 索引）。"""
+        return [self.item_from_record(r) for r in self.load_records(statuses)]
+
+    def load_records(self, statuses: Optional[Iterable[str]] = None) -> list[tuple]:
+        """
+        同 load()，但返回原始行（不构造 QueueItem/Path）；大队列启动时界面先按原始行显示，
+        用到某一项时再经 item_from_record() 构造。
+        """
+        sql = (
+            "SELECT id, input_path, output_dir, status, priority, progress, message, error, duplicate_of"
+            " FROM queue_items"
+        )
+        args: list[str] = []
+        if statuses is not None:
+            args = list(statuses)
+            if not args:
+                return []
+            sql += f" WHERE status IN ({','.join('?' * len(args))})"
+        sql += " ORDER BY position, id"
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    @staticmethod
+    def item_from_record(r: tuple) -> QueueItem:
+        return QueueItem(
+            input_path=Path(r[1]),
+            output_dir=Path(r[2]),
+            status=r[3] or "queued",
+            priority=int(r[4] or 0),
+            progress=float(r[5] or 0.0),
+            message=r[6] or "",
+            error=r[7],
+            item_id=int(r[0]),
+            duplicate_of=r[8],
+        )
+
+    def count_by_status(self) -> dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM queue_items GROUP BY status").fetchall()
+        return {str(s): int(n) for s, n in rows}
+
+    def ids_with_status(self, status: str) -> list[int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM queue_items WHERE status = ? ORDER BY position, id", (status,)
+            ).fetchall()
+        return [int(r[0]) for r in rows]
+
+    def add(self, items: list[QueueItem]) -> None:
+        """追加到队尾，并为每项写回 item_id。"""
+        if not items:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            pos = int(self._conn.execute("SELECT COALESCE(MAX(position), -1) FROM queue_items").fetchone()[0])
+            for it in items:
+                pos += 1
+                cur = self._conn.execute(
+                    "INSERT INTO queue_items (position, input_path, output_dir, status, priority, progress, message, error,"
+                    " duplicate_of, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (pos, str(it.input_path), str(it.output_dir), *self._row_values(it), now),
+                )
+                it.item_id = int(cur.lastrowid)
+
+    def update(self, item: QueueItem) -> None:
+        """持久化单个队列项的状态/进度；尚未入库（item_id 为空）的项会被追加。"""
+        self.update_many([item])
+
+    def update_many(self, items: Iterable[QueueItem]) -> None:
+        items = list(items)
+        fresh = [it for it in items if it.item_id is None]
+        known = [it for it in items if it.item_id is not None]
+        if known:
+            now = time.time()
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "UPDATE queue_items SET output_dir = ?, status = ?, priority = ?, progress = ?, message = ?,"
+                    " error = ?, duplicate_of = ?, updated_at = ? WHERE id = ?",
+                    [(str(it.output_dir), *self._row_values(it), now, it.item_id) for it in known],
+                )
+        if fresh:
+            self.add(fresh)
+
+    def remove(self, items: Iterable[QueueItem]) -> None:
+        ids = [(it.item_id,) for it in items if it.item_id is not None]
+        if not ids:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM queue_items WHERE id = ?", ids)
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM queue_items")
+
+    @staticmethod
+    def _row_values(it: QueueItem) -> tuple:
+        return (
+            it.status,
+            int(it.priority or 0),
+            float(it.progress or 0.0),
+            it.message or "",
+            it.error,
+            it.duplicate_of,
+        )
+
+    def _migrate_json(self, legacy: Path) -> None:
+        if not legacy.exists():
+            return
+        with self._lock:
+            has_rows = self._conn.execute("SELECT 1 FROM queue_items LIMIT 1").fetchone() is not None
+        if has_rows:
+            return
+        try:
+            raw = json.loads(legacy.read_text(encoding="utf-8"))
+        except Exception:
+            logger.warning("旧版队列文件无法解析，跳过迁移：%s", legacy)
+            return
         items: list[QueueItem] = []
         for r in raw or []:
-            p = Path(r.get("input_path", ""))
-            out = Path(r.get("output_dir", ""))
-            if not p.exists():
-                continue
-            items.append(QueueItem(input_path=p, output_dir=out, status=r.get("status", "queued")))
-        return items
-    except Exception:
-        return []
+            try:
+                priority = int(r.get("priority") or 0)
+            except Exception:
+                priority = 0
+            items.append(
+                QueueItem(
+                    input_path=Path(r.get("input_path", "")),
+                    output_dir=Path(r.get("output_dir", "")),
+                    status=r.get("status", "queued"),
+                    priority=priority,
+                )
+            )
+        self.add(items)
+        try:
+            legacy.replace(legacy.with_name(legacy.name + ".migrated"))
+        except OSError:
+            pass
+        logger.info("已从 %s 迁移 %d 个队列项", legacy, len(items))
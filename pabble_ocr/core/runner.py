@@ -1,21 +1,31 @@
 from __future__ import annotations
 
 import logging
-import time
+import os
+from collections import deque
 from dataclasses import dataclass
 from pathlib import Path
-from threading import Event
-from typing import Callable
+from threading import Condition, Event, Lock, Thread
+from typing import Callable, Optional
 
 from pabble_ocr.config import AppConfig
+from pabble_ocr.core.concurrency import RunLimits
+from pabble_ocr.core.control import RunControl
+from pabble_ocr.core.dedupe import DedupeTracker, materialize_duplicate
 from pabble_ocr.core.file_types import detect_file_type
+from pabble_ocr.core.leases import ClusterClaims, ItemClaim, is_state_complete
+from pabble_ocr.core.metrics import MetricsBus
 from pabble_ocr.core.models import QueueItem
+from pabble_ocr.core.scheduler import CostEstimator, Scheduler
 from pabble_ocr.core.state_store import init_or_load_state, save_state
 from pabble_ocr.processing.process_file import CanceledError, ensure_output_dir, process_queue_item
 
 
 logger = logging.getLogger(__name__)
 
+# 常驻模式下队列为空时复查 keep_alive() 的间隔（秒）
+_KEEP_ALIVE_POLL_S = 0.5
+
 
 @dataclass
 class RunnerCallbacks:
@@ -27,49 +37,320 @@ class Runner:
     def __init__(self, config: AppConfig, callbacks: RunnerCallbacks) -> None:
         self._config = config
         self._callbacks = callbacks
-        self._pause = Event()
-        self._cancel_current = Event()
+        # 全局暂停/停止信号；每个运行中的队列项派生一个子节点（可单独取消，并继承全局暂停/停止）
+        self._control = RunControl()
         self._stop_all = Event()
+        # 运行中的队列项 -> 该项的取消信号（并发时每个文件独立取消）
+        self._running: dict[int, tuple[QueueItem, RunControl]] = {}
+        self._running_lock = Lock()
+        # 同一输出目录同一时刻只允许一个队列项处理（避免重复导入的同一文件并发写 task_state.json）
+        self._dir_locks: dict[str, Lock] = {}
+        self._limits = RunLimits.from_config(config)
+        self._estimator = CostEstimator()
+        # 多节点认领（CLUSTER_CLAIM）；off 时为 None，行为与单机一致
+        self._cluster = ClusterClaims.from_config(config)
+        # 内容去重（DEDUPE_INPUTS）；关闭时为 None
+        self._dedupe = DedupeTracker() if bool(config.dedupe_inputs) else None
+        # 因分段轮转而放回队列、尚未完成的队列项（id(item)）
+        self._yielded: set[int] = set()
+        # 运行中的调度队列（submit() 追加到这里）；空闲的工作线程在 _work_cv 上等待新任务
+        self._scheduler: Optional[Scheduler] = None
+        self._work_cv = Condition()
+        # 吞吐/延迟/ETA 等运行指标（界面面板读取快照）
+        self._metrics = MetricsBus()
+        # 待统计剩余页数的队列项（ETA 用）；由后台线程逐个读取 PDF 页数，不阻塞调度
+        self._uncounted: deque[QueueItem] = deque()
+        self._count_thread: Optional[Thread] = None
+        self._count_lock = Lock()
+
+    @property
+    def metrics(self) -> MetricsBus:
+        return self._metrics
 
     def pause(self) -> None:
-        self._pause.set()
+        self._control.pause()
 
     def resume(self) -> None:
-        self._pause.clear()
+        self._control.resume()
 
     def cancel_current(self) -> None:
-        self._cancel_current.set()
+        """取消当前正在处理的所有队列项（串行时即“当前这一个”）。"""
+        with self._running_lock:
+            controls = [ctl for _item, ctl in self._running.values()]
+        for ctl in controls:
+            ctl.cancel()
+
+    def cancel_item(self, item: QueueItem) -> bool:
+        """取消指定的运行中队列项；该项不在运行中时返回 False。"""
+        with self._running_lock:
+            entry = self._running.get(id(item))
+        if entry is None:
+            return False
+        entry[1].cancel()
+        return True
 
     def stop_all(self) -> None:
         self._stop_all.set()
+        # 级联取消所有运行中的队列项：在途请求随之中断
+        self._control.cancel()
+        with self._work_cv:
+            self._work_cv.notify_all()
+
+    def submit(self, item: QueueItem) -> bool:
+        """向正在运行的队列追加一项（常驻模式下用于持续接收新文件）；未在运行时返回 False。"""
+        with self._work_cv:
+            scheduler = self._scheduler
+            if scheduler is None:
+                return False
+            scheduler.push(item)
+            self._work_cv.notify()
+        if self._dedupe is not None:
+            self._dedupe.add(item)
+        self._count_pages([item])
+        return True
+
+    def _file_workers(self, n_items: Optional[int]) -> int:
+        n = int(self._config.max_concurrent_files or 1)
+        return max(1, n if n_items is None else min(n, n_items))
+
+    def run(self, items: list[QueueItem], *, keep_alive: Optional[Callable[[], bool]] = None) -> None:
+        """
+        处理队列直到取空后返回。
+        keep_alive：常驻模式；队列取空时只要 keep_alive() 为真就等待 submit() 追加的新任务，返回假（或 stop_all）后退出。
+        """
+        scheduler = Scheduler.from_config(self._config, self._estimator)
+        scheduler.extend(items)
+        if self._dedupe is not None:
+            for it in items:
+                self._dedupe.add(it)
+        self._count_pages(items)
+        if scheduler.policy != "fifo" or self._segments_per_turn() > 0:
+            turn = self._segments_per_turn()
+            self._callbacks.on_log(
+                f"队列调度：{scheduler.policy}，大 PDF 每轮 {turn if turn > 0 else '不限'} 个分段"
+            )
+        with self._work_cv:
+            self._scheduler = scheduler
+        try:
+            self._run_scheduler(scheduler, n_items=len(items) if keep_alive is None else None, keep_alive=keep_alive)
+        finally:
+            with self._work_cv:
+                self._scheduler = None
+                # 停止后工作线程不再出队：仍在队列中的项（含延迟等待的）统一标记为已取消
+                left = scheduler.drain()
+            for it in left:
+                self._cancel_stopped(it)
+            if self._dedupe is not None:
+                self._dedupe.close()
 
-    def run(self, items: list[QueueItem]) -> None:
-        for item in items:
+    def _count_pages(self, items: list[QueueItem]) -> None:
+        pending = [it for it in items if it.status != "completed"]
+        if not pending:
+            return
+        self._metrics.expect(pending)
+        with self._count_lock:
+            self._uncounted.extend(pending)
+            if self._count_thread is None:
+                self._count_thread = Thread(target=self._count_loop, name="pabble-metrics-pages", daemon=True)
+                self._count_thread.start()
+
+    def _count_loop(self) -> None:
+        while True:
+            with self._count_lock:
+                if not self._uncounted or self._stop_all.is_set():
+                    self._uncounted.clear()
+                    self._count_thread = None
+                    return
+                item = self._uncounted.popleft()
+            try:
+                pages = self._estimator.remaining_pages(item)
+            except Exception:
+                pages = 1
+            self._metrics.add_pending(item, pages)
+
+    def _run_scheduler(
+        self,
+        scheduler: Scheduler,
+        *,
+        n_items: Optional[int],
+        keep_alive: Optional[Callable[[], bool]],
+    ) -> None:
+        def _loop() -> None:
+            # 轮转回队的队列项由放回它的线程自己再次取走，因此某线程取空退出不会漏项
+            while True:
+                item = self._next_item(scheduler, keep_alive)
+                if item is None:
+                    return
+                self._run_guarded(item, scheduler)
+
+        workers = self._file_workers(n_items)
+        if workers <= 1:
+            _loop()
+            return
+
+        n_req = int(self._config.max_inflight_requests or 0)
+        self._callbacks.on_log(
+            f"并发处理：最多 {workers} 个文件同时进行，在途 API 请求上限 {n_req if n_req > 0 else '不限'}"
+        )
+        threads = [Thread(target=_loop, name=f"pabble-runner-{i + 1}", daemon=True) for i in range(workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def _next_item(self, scheduler: Scheduler, keep_alive: Optional[Callable[[], bool]]) -> Optional[QueueItem]:
+        while True:
             if self._stop_all.is_set():
-                item.status = "canceled"
-                item.message = "队列已停止"
+                return None
+            item = scheduler.pop()
+            if item is not None:
+                return item
+            wait_s = scheduler.next_ready_in()
+            if wait_s is None:
+                if keep_alive is None or not keep_alive():
+                    return None
+                # 常驻模式：submit()/stop_all() 会唤醒；keep_alive 的变化没有通知，按固定间隔复查
+                wait_s = _KEEP_ALIVE_POLL_S
+            with self._work_cv:
+                if not self._stop_all.is_set():
+                    # 只有延迟中的项时睡到最早一项到期（submit()/stop_all() 会提前唤醒）
+                    self._work_cv.wait(max(0.01, wait_s))
+
+    def _segments_per_turn(self) -> int:
+        return max(0, int(self._config.segments_per_turn or 0))
+
+    def _dir_lock(self, output_dir: Path) -> Lock:
+        key = str(output_dir).lower() if os.name == "nt" else str(output_dir)
+        with self._running_lock:
+            lock = self._dir_locks.get(key)
+            if lock is None:
+                lock = self._dir_locks[key] = Lock()
+            return lock
+
+    def _run_guarded(self, item: QueueItem, scheduler: Scheduler) -> None:
+        if self._stop_all.is_set():
+            self._cancel_stopped(item)
+            return
+
+        if self._dedupe is not None and self._reuse_duplicate(item, scheduler):
+            return
+
+        cancel = self._control.child()
+        claim: Optional[ItemClaim] = None
+        if self._cluster is not None:
+            try:
+                claim, note = self._cluster.claim(item, on_lost=lambda: self._on_lease_lost(item, cancel))
+            except Exception as e:
+                logger.exception("认领失败：%s", item.input_path)
+                item.status = "failed"
+                item.error = item.message = f"认领失败：{e}"
                 self._callbacks.on_item_update(item)
-                continue
+                self._settle(item)
+                return
+            if claim is None:
+                item.message = note
+                self._callbacks.on_item_update(item)
+                scheduler.requeue(item, delay_s=self._claim_retry_s())
+                return
+            item.output_dir = claim.output_dir
+
+        with self._running_lock:
+            self._running[id(item)] = (item, cancel)
+        try:
+            with self._dir_lock(item.output_dir):
+                finished = self._run_one(item, cancel, claim)
+        finally:
+            with self._running_lock:
+                self._running.pop(id(item), None)
+            if claim is not None and self._cluster is not None:
+                claim.release(self._cluster.manager)
+        if not finished:
+            waiting = claim is not None and claim.segments is not None and claim.segments.waiting
+            scheduler.requeue(item, delay_s=self._claim_retry_s() if waiting else 0.0)
+        else:
+            self._settle(item)
+
+    def _cancel_stopped(self, item: QueueItem) -> None:
+        item.status = "canceled"
+        item.message = "队列已停止"
+        self._callbacks.on_item_update(item)
+        self._settle(item)
+
+    def _settle(self, item: QueueItem) -> None:
+        """队列项本次运行的最终结果已确定（完成/失败/取消/复用）。"""
+        if self._dedupe is not None:
+            self._dedupe.settle(item)
+        self._metrics.item_finished(item, ok=item.status == "completed")
 
-            self._cancel_current.clear()
-            self._run_one(item)
+    def _reuse_duplicate(self, item: QueueItem, scheduler: Scheduler) -> bool:
+        """item 与更早的队列项内容相同时复用其输出；返回 True 表示已处理（完成或放回队列等待原件）。"""
+        assert self._dedupe is not None
+        canonical = self._dedupe.canonical_of(item)
+        if canonical is None:
+            return False
+        if not self._dedupe.is_settled(canonical):
+            item.message = f"等待内容相同的 {canonical.input_path.name} 完成"
+            self._callbacks.on_item_update(item)
+            scheduler.requeue(item, delay_s=2.0)
+            return True
+        if canonical.status != "completed":
+            # 原件本次运行失败/取消：本项自己处理，并接替为该内容的原件
+            self._dedupe.promote(item)
+            return False
+        try:
+            with self._dir_lock(item.output_dir):
+                n = materialize_duplicate(canonical, item, digest=self._dedupe.digest_of(item))
+        except Exception as e:
+            logger.exception("复用重复输入的输出失败：%s", item.input_path)
+            self._callbacks.on_log(f"[{item.input_path.name}] 复用 {canonical.input_path.name} 的输出失败，改为单独处理：{e}")
+            self._dedupe.promote(item)
+            return False
+        item.status = "completed"
+        item.progress = 1.0
+        item.error = None
+        item.duplicate_of = str(canonical.input_path)
+        item.message = f"内容与 {canonical.input_path.name} 相同，已复用其输出（{n} 个文件）"
+        self._callbacks.on_item_update(item)
+        self._settle(item)
+        return True
+
+    def _claim_retry_s(self) -> float:
+        ttl = self._cluster.manager.ttl_s if self._cluster is not None else 0.0
+        return min(30.0, max(2.0, ttl / 4.0))
 
-    def _wait_if_paused(self) -> None:
-        while self._pause.is_set() and not self._stop_all.is_set():
-            time.sleep(0.1)
+    def _on_lease_lost(self, item: QueueItem, cancel: RunControl) -> None:
+        # 心跳发现租约被接管（本节点卡顿超过 TTL 等）：立即停止，避免与接管节点重复处理
+        self._callbacks.on_log(f"[{item.input_path.name}] 租约已失效（可能已被其它节点接管），停止处理")
+        cancel.cancel()
 
-    def _run_one(self, item: QueueItem) -> None:
+    def _run_one(self, item: QueueItem, cancel: RunControl, claim: Optional[ItemClaim] = None) -> bool:
+        """处理一轮；返回 False 表示按分段轮转让出（需放回队列），其它情况返回 True。"""
+        with self._running_lock:
+            resumed = id(item) in self._yielded
+            self._yielded.discard(id(item))
         item.status = "running"
-        item.progress = 0.0
+        if not resumed:
+            item.progress = 0.0
         item.error = None
-        item.message = "开始处理"
+        item.message = "继续处理" if resumed else "开始处理"
         self._callbacks.on_item_update(item)
 
         try:
+            # 队列加载时不逐个检查输入文件，到开始处理时才确认
+            if not item.input_path.exists():
+                raise FileNotFoundError(f"输入文件不存在：{item.input_path}")
             ensure_output_dir(item.output_dir)
             ft = detect_file_type(item.input_path)
             state = init_or_load_state(input_path=item.input_path, output_dir=item.output_dir, file_type=ft)
-            save_state(item.output_dir, state)
+            if claim is not None and is_state_complete(item.output_dir):
+                item.status = "completed"
+                item.progress = 1.0
+                item.message = "已由其它节点完成"
+                self._callbacks.on_item_update(item)
+                return True
+            # 分段认领时经认领上下文持锁写入，合入其它节点刚完成的分段，避免用本节点较早读到的状态覆盖
+            save = claim.segments.save_state if claim is not None and claim.segments is not None else save_state
+            save(item.output_dir, state)
 
             def log(msg: str) -> None:
                 self._callbacks.on_log(f"[{item.input_path.name}] {msg}")
@@ -79,15 +360,28 @@ class Runner:
                 item.message = msg
                 self._callbacks.on_item_update(item)
 
-            process_queue_item(
-                config=self._config,
-                item=item,
-                state=state,
-                is_paused=lambda: self._pause.is_set(),
-                is_canceled=lambda: self._cancel_current.is_set() or self._stop_all.is_set(),
-                log=log,
-                progress=progress,
-            )
+            try:
+                finished = process_queue_item(
+                    config=self._config,
+                    item=item,
+                    state=state,
+                    is_paused=cancel.is_paused,
+                    is_canceled=cancel.is_canceled,
+                    log=log,
+                    progress=progress,
+                    limits=self._limits,
+                    segment_budget=self._segments_per_turn(),
+                    claims=claim.segments if claim is not None else None,
+                    control=cancel,
+                    metrics=self._metrics,
+                )
+            finally:
+                self._estimator.observe_state(state)
+            if not finished:
+                # 保持 running 状态（界面可见进度），回到队列等待下一轮
+                with self._running_lock:
+                    self._yielded.add(id(item))
+                return False
 
             item.status = "completed"
             item.progress = 1.0
@@ -104,3 +398,4 @@ class Runner:
             item.error = err or "失败"
             item.message = err or "失败"
             self._callbacks.on_item_update(item)
+        return True
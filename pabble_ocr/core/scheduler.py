@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import heapq
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from pabble_ocr.config import AppConfig
+from pabble_ocr.core.file_types import detect_file_type
+from pabble_ocr.core.models import FileTaskState, QueueItem
+from pabble_ocr.core.state_store import load_state
+
+
+# 队列调度策略：fifo=按导入顺序；sjf=预计耗时短的优先；priority=按 QueueItem.priority 从高到低（同级按导入顺序）
+QUEUE_POLICIES = ("fifo", "sjf", "priority")
+
+# 没有历史数据时的每页耗时假设（秒）；运行中按已完成分段的实测值滚动修正
+_DEFAULT_SECONDS_PER_PAGE = 3.0
+# 页数未知（PDF 索引读不出来）时按文件大小估算：约 100KB/页
+_FALLBACK_BYTES_PER_PAGE = 100 * 1024
+
+
+def normalize_queue_policy(value: object) -> str:
+    v = str(value or "").strip().lower()
+    return v if v in QUEUE_POLICIES else "fifo"
+
+
+class CostEstimator:
+    """
+    预估队列项剩余耗时（秒）：剩余页数 × 每页耗时。
+    - 页数：PDF 读页索引（只解析 xref/页树，不渲染），按 (路径, 大小, mtime) 缓存；图片记 1 页
+    - 已完成分段从剩余页数中扣除（读取输出目录内 task_state.json）
+    - 每页耗时：由已完成分段的 elapsed_s 做指数滑动平均
+    线程安全。
+    """
+
+    def __init__(self, seconds_per_page: float = _DEFAULT_SECONDS_PER_PAGE) -> None:
+        self._lock = threading.Lock()
+        self._seconds_per_page = float(seconds_per_page)
+        self._pages: dict[tuple[str, int, float], int] = {}
+
+    @property
+    def seconds_per_page(self) -> float:
+        return self._seconds_per_page
+
+    def total_pages(self, path: Path) -> int:
+        try:
+            st = path.stat()
+        except OSError:
+            return 1
+        key = (str(path), int(st.st_size), float(st.st_mtime))
+        with self._lock:
+            cached = self._pages.get(key)
+        if cached is not None:
+            return cached
+        pages = 1
+        if detect_file_type(path) == "pdf":
+            try:
+                from pypdf import PdfReader
+
+                pages = max(1, len(PdfReader(str(path)).pages))
+            except Exception:
+                pages = max(1, int(st.st_size) // _FALLBACK_BYTES_PER_PAGE)
+        with self._lock:
+            self._pages[key] = pages
+        return pages
+
+    def remaining_pages(self, item: QueueItem) -> int:
+        total = self.total_pages(item.input_path)
+        state = load_state(item.output_dir)
+        if state is None or not state.segments:
+            return total
+        done = sum(max(0, s.end_page - s.start_page + 1) for s in state.segments if s.done)
+        return max(0, total - done)
+
+    def estimate(self, item: QueueItem) -> float:
+        return float(self.remaining_pages(item)) * self._seconds_per_page
+
+    def quick_estimate(self, item: QueueItem) -> float:
+        """
+        入队时用的粗估：只 stat 文件，不读 PDF 页索引与 task_state.json。
+        已缓存页数时直接用；否则 PDF 按文件大小折算页数，图片记 1 页。
+        """
+        path = item.input_path
+        try:
+            st = path.stat()
+        except OSError:
+            return self._seconds_per_page
+        with self._lock:
+            pages = self._pages.get((str(path), int(st.st_size), float(st.st_mtime)))
+        if pages is None:
+            pages = max(1, int(st.st_size) // _FALLBACK_BYTES_PER_PAGE) if detect_file_type(path) == "pdf" else 1
+        return float(pages) * self._seconds_per_page
+
+    def observe_state(self, state: Optional[FileTaskState]) -> None:
+        """用一次运行后的分段实测耗时修正每页耗时。"""
+        if state is None:
+            return
+        pages = 0
+        seconds = 0.0
+        for s in state.segments:
+            if s.done and s.elapsed_s:
+                pages += max(1, s.end_page - s.start_page + 1)
+                seconds += float(s.elapsed_s)
+        if pages <= 0 or seconds <= 0:
+            return
+        sample = seconds / pages
+        with self._lock:
+            self._seconds_per_page = 0.7 * self._seconds_per_page + 0.3 * sample
+
+
+@dataclass
+class _Entry:
+    item: QueueItem
+    seq: int
+    enqueued_at: float
+    cost: float
+    # 早于该时刻不出队（time.monotonic()；0=立即可取）
+    not_before: float = 0.0
+    # 在 _heap 中的当前排序键（None=不在 _heap）；sjf 细化估算后重新入堆，旧键的堆元素作废
+    key: Optional[float] = None
+
+
+class Scheduler:
+    """
+    线程安全的待处理队列：按策略挑选下一个队列项。
+    - fifo：按入队顺序（双端队列，出队 O(1)）
+    - sjf：预计剩余耗时最短优先；等待时间按 1:1 抵扣预计耗时（老化），大文件不会被无限推迟。
+      “预计耗时 - 已等待时间”的排序等价于按固定键 cost + enqueued_at 排序，因此可用堆（出队 O(log n)）
+    - priority：priority 大的优先，同级按入队顺序（入队时取 QueueItem.priority）
+    延迟入队（delay_s>0）的项先放在按 not_before 排序的堆里，到期后才参与排序。
+    sjf 入队时先按文件大小粗估（只 stat）立即参与排序；读 PDF 页索引与 task_state.json 的精确估算
+    由后台线程逐个完成后更新排序键，不阻塞 run() 启动与 submit()。
+    大 PDF 按分段轮转时，处理了一轮的队列项通过 requeue() 放回，并按剩余耗时重新参与排序。
+    """
+
+    def __init__(self, policy: str, estimator: CostEstimator) -> None:
+        self._policy = normalize_queue_policy(policy)
+        self._estimator = estimator
+        self._lock = threading.Lock()
+        self._seq = 0
+        # 可立即出队：fifo 用 _fifo；sjf/priority 用 _heap（(排序键, seq, 项)）
+        self._fifo: deque[_Entry] = deque()
+        self._heap: list[tuple[float, int, _Entry]] = []
+        # _heap 中已作废（排序键已更新）的元素数
+        self._stale = 0
+        # 延迟中的项：(not_before, seq, 项)
+        self._delayed: list[tuple[float, int, _Entry]] = []
+        # sjf 仍是粗估成本的项（seq -> 项，按入队顺序）；由 _estimate_loop 逐个细化
+        self._unestimated: dict[int, _Entry] = {}
+        self._estimate_thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_config(cls, config: AppConfig, estimator: Optional[CostEstimator] = None) -> "Scheduler":
+        return cls(config.queue_policy, estimator or CostEstimator())
+
+    @property
+    def policy(self) -> str:
+        return self._policy
+
+    def push(self, item: QueueItem, *, delay_s: float = 0.0) -> None:
+        cost = self._estimator.quick_estimate(item) if self._policy == "sjf" else 0.0
+        now = time.monotonic()
+        with self._lock:
+            self._seq += 1
+            e = _Entry(
+                item=item,
+                seq=self._seq,
+                enqueued_at=now,
+                cost=cost,
+                not_before=now + delay_s if delay_s > 0 else 0.0,
+            )
+            self._place(e, now)
+            if self._policy == "sjf":
+                self._unestimated[e.seq] = e
+                self._start_estimator()
+
+    def extend(self, items: list[QueueItem]) -> None:
+        for it in items:
+            self.push(it)
+
+    def requeue(self, item: QueueItem, *, delay_s: float = 0.0) -> None:
+        # 轮转回队：fifo 下排到队尾，让后面的小任务先跑；delay_s>0 时（如被其它节点占用）过一会儿再取
+        self.push(item, delay_s=delay_s)
+
+    def pop(self) -> Optional[QueueItem]:
+        """取下一个可处理的队列项；队列为空或全部处于延迟等待中时返回 None（用 len() 区分两者）。"""
+        with self._lock:
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                _, _, e = heapq.heappop(self._delayed)
+                self._place_ready(e)
+            if self._fifo:
+                return self._fifo.popleft().item
+            while self._heap:
+                key, _, e = heapq.heappop(self._heap)
+                if key != e.key:
+                    self._stale -= 1
+                    continue
+                e.key = None
+                self._unestimated.pop(e.seq, None)
+                return e.item
+            return None
+
+    def drain(self) -> list[QueueItem]:
+        with self._lock:
+            entries = list(self._fifo) + [x[2] for x in self._heap if x[0] == x[2].key] + [x[2] for x in self._delayed]
+            self._fifo.clear()
+            self._heap.clear()
+            self._stale = 0
+            self._delayed.clear()
+            self._unestimated.clear()
+            return [e.item for e in sorted(entries, key=lambda e: e.seq)]
+
+    def next_ready_in(self) -> Optional[float]:
+        """距最早一项可出队还有多少秒：有可立即取的项时为 0，队列为空时为 None。"""
+        with self._lock:
+            if self._fifo or len(self._heap) > self._stale:
+                return 0.0
+            if not self._delayed:
+                return None
+            return max(0.0, self._delayed[0][0] - time.monotonic())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._fifo) + len(self._heap) - self._stale + len(self._delayed)
+
+    # ---- 内部（调用方持有 _lock） ----
+
+    def _place(self, e: _Entry, now: float) -> None:
+        if e.not_before > now:
+            heapq.heappush(self._delayed, (e.not_before, e.seq, e))
+        else:
+            self._place_ready(e)
+
+    def _place_ready(self, e: _Entry) -> None:
+        if self._policy == "sjf":
+            e.key = e.cost + e.enqueued_at
+        elif self._policy == "priority":
+            e.key = -int(e.item.priority or 0)
+        else:
+            self._fifo.append(e)
+            return
+        heapq.heappush(self._heap, (e.key, e.seq, e))
+
+    def _start_estimator(self) -> None:
+        if self._estimate_thread is None:
+            self._estimate_thread = threading.Thread(
+                target=self._estimate_loop, name="pabble-sched-estimate", daemon=True
+            )
+            self._estimate_thread.start()
+
+    def _estimate_loop(self) -> None:
+        while True:
+            with self._lock:
+                if not self._unestimated:
+                    self._estimate_thread = None
+                    return
+                e = next(iter(self._unestimated.values()))
+            try:
+                cost = self._estimator.estimate(e.item)
+            except Exception:
+                cost = 0.0
+            with self._lock:
+                # 估算期间可能已被 pop()/drain() 取走
+                if self._unestimated.pop(e.seq, None) is None or cost == e.cost:
+                    continue
+                e.cost = cost
+                if e.key is not None:
+                    # 已在 _heap 中：按新键重新入堆，旧元素出堆时跳过；仍在延迟中的项到期后按新成本入堆
+                    self._stale += 1
+                    e.key = e.cost + e.enqueued_at
+                    heapq.heappush(self._heap, (e.key, e.seq, e))
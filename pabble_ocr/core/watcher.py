@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import ctypes
+import os
+import select
+import shutil
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from pabble_ocr.core.file_types import detect_file_type
+
+
+# 处理结束后写在输入文件旁的标记（未配置 done/failed 目录时使用）；存在标记的文件不会再次入队
+DONE_MARKER_SUFFIX = ".pabble-done"
+FAILED_MARKER_SUFFIX = ".pabble-failed"
+
+# 扫描仪/同步盘常见的“写入中”临时文件
+_TEMP_SUFFIXES = (".tmp", ".part", ".partial", ".crdownload", ".download", ".filepart")
+
+# inotify 常量（linux/inotify.h）
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def is_candidate_name(path: Path) -> bool:
+    """按文件名判断是否可能是待处理输入：跳过隐藏/临时/标记文件与不支持的类型。"""
+    name = path.name
+    low = name.lower()
+    if name.startswith(".") or name.startswith("~$"):
+        return False
+    if low.endswith(_TEMP_SUFFIXES) or low.endswith((DONE_MARKER_SUFFIX, FAILED_MARKER_SUFFIX)):
+        return False
+    return detect_file_type(path) != "unknown"
+
+
+def has_marker(path: Path) -> bool:
+    return path.with_name(path.name + DONE_MARKER_SUFFIX).exists() or path.with_name(
+        path.name + FAILED_MARKER_SUFFIX
+    ).exists()
+
+
+class _Inotify:
+    """最小 inotify 封装（ctypes 调 libc，无第三方依赖）；不可用时 open() 返回 None。"""
+
+    def __init__(self, libc: ctypes.CDLL, fd: int) -> None:
+        self._libc = libc
+        self._fd = fd
+        self._dirs: dict[int, Path] = {}
+
+    @classmethod
+    def open(cls) -> Optional["_Inotify"]:
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = int(libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC))
+        except Exception:
+            return None
+        if fd < 0:
+            return None
+        return cls(libc, fd)
+
+    def add(self, directory: Path) -> bool:
+        wd = int(self._libc.inotify_add_watch(self._fd, os.fsencode(str(directory)), _WATCH_MASK))
+        if wd < 0:
+            # 常见原因：超出 fs.inotify.max_user_watches；调用方改用定期全量扫描兜底
+            return False
+        self._dirs[wd] = directory
+        return True
+
+    def read(self, timeout: float) -> Optional[list[tuple[Path, bool]]]:
+        """等待事件；返回 [(路径, 是否目录)]。事件队列溢出时返回 None（调用方需全量扫描）。"""
+        ready, _, _ = select.select([self._fd], [], [], max(0.0, timeout))
+        if not ready:
+            return []
+        out: list[tuple[Path, bool]] = []
+        overflow = False
+        while True:
+            try:
+                buf = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not buf:
+                break
+            pos = 0
+            while pos + _EVENT_HEADER.size <= len(buf):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buf, pos)
+                pos += _EVENT_HEADER.size
+                raw = buf[pos : pos + length].split(b"\0", 1)[0]
+                pos += length
+                if mask & _IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                base = self._dirs.get(wd)
+                if base is None or not raw:
+                    continue
+                out.append((base / os.fsdecode(raw), bool(mask & _IN_ISDIR)))
+        return None if overflow else out
+
+    def close(self) -> None:
+        try:
+            os.close(self._fd)
+        except OSError:
+            pass
+
+
+class FolderWatcher:
+    """
+    监视若干输入目录，返回“已稳定”的新文件（大小与 mtime 在 settle_s 秒内未再变化）。
+    - Linux 优先用 inotify 及时感知新文件；不可用（非 Linux、网络盘不支持、watch 数超限）时退回定期扫描
+    - 即使用 inotify，也每 rescan_s 秒全量扫描一次兜底（网络共享目录上远端写入不一定触发事件）
+    - 同一路径在内容（大小/mtime）不变时只返回一次；skip 返回 True 的路径与目录不处理
+    """
+
+    def __init__(
+        self,
+        roots: list[Path],
+        *,
+        recursive: bool = True,
+        settle_s: float = 2.0,
+        poll_s: float = 2.0,
+        rescan_s: float = 60.0,
+        use_inotify: bool = True,
+        skip: Optional[Callable[[Path], bool]] = None,
+    ) -> None:
+        self._roots = [Path(r) for r in roots]
+        self._recursive = bool(recursive)
+        self._settle_s = max(0.0, float(settle_s))
+        self._poll_s = max(0.1, float(poll_s))
+        self._rescan_s = max(self._poll_s, float(rescan_s))
+        self._skip = skip or (lambda _p: False)
+        # 候选文件 -> (size, mtime_ns, 该签名首次出现的时间)
+        self._pending: dict[Path, tuple[int, int, float]] = {}
+        # 已返回的文件 -> 返回时的 (size, mtime_ns)
+        self._handed: dict[Path, tuple[int, int]] = {}
+        self._inotify = _Inotify.open() if use_inotify else None
+        self._watch_ok = True
+        self._last_scan = 0.0
+        self._started = False
+
+    @property
+    def backend(self) -> str:
+        return "inotify" if self._inotify is not None and self._watch_ok else "polling"
+
+    def root_of(self, path: Path) -> Optional[Path]:
+        for r in self._roots:
+            try:
+                path.relative_to(r)
+                return r
+            except ValueError:
+                continue
+        return None
+
+    def forget(self, path: Path) -> None:
+        """文件已被移走/处理完后调用；之后同名新文件会被当作新输入。"""
+        self._handed.pop(path, None)
+
+    def close(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def poll(self, timeout: Optional[float] = None) -> list[Path]:
+        """等待最多 timeout 秒（默认 poll_s），返回本次判定为稳定的新文件（按路径排序）。"""
+        if not self._started:
+            self._started = True
+            for r in self._roots:
+                self._scan_dir(r, watch=True)
+            self._last_scan = time.monotonic()
+        else:
+            wait = self._poll_s if timeout is None else max(0.0, float(timeout))
+            if self._pending:
+                # 有候选文件时缩短等待，稳定后尽快交出
+                wait = min(wait, max(0.2, self._settle_s / 4))
+            self._wait_for_changes(wait)
+        return self._collect_stable()
+
+    def _wait_for_changes(self, wait: float) -> None:
+        now = time.monotonic()
+        if self.backend == "inotify" and self._inotify is not None:
+            events = self._inotify.read(wait)
+            if events is None:
+                self._full_scan()
+                return
+            for path, is_dir in events:
+                if self._skip(path):
+                    continue
+                if is_dir:
+                    if self._recursive:
+                        self._scan_dir(path, watch=True)
+                else:
+                    self._consider(path)
+            if now - self._last_scan >= self._rescan_s:
+                self._full_scan()
+            return
+        time.sleep(wait)
+        self._full_scan()
+
+    def _full_scan(self) -> None:
+        for r in self._roots:
+            self._scan_dir(r, watch=False)
+        self._last_scan = time.monotonic()
+
+    def _scan_dir(self, directory: Path, *, watch: bool) -> None:
+        stack = [directory]
+        while stack:
+            d = stack.pop()
+            if watch and self._inotify is not None and self._watch_ok:
+                self._watch_ok = self._inotify.add(d)
+            try:
+                entries = list(os.scandir(d))
+            except OSError:
+                continue
+            for e in entries:
+                p = Path(e.path)
+                if self._skip(p):
+                    continue
+                try:
+                    if e.is_dir(follow_symlinks=False):
+                        if self._recursive and not e.name.startswith("."):
+                            stack.append(p)
+                    elif e.is_file():
+                        self._consider(p)
+                except OSError:
+                    continue
+
+    def _consider(self, path: Path) -> None:
+        if path in self._pending or not is_candidate_name(path) or has_marker(path):
+            return
+        try:
+            st = path.stat()
+        except OSError:
+            return
+        sig = (int(st.st_size), int(st.st_mtime_ns))
+        if self._handed.get(path) == sig:
+            return
+        self._pending[path] = (sig[0], sig[1], time.monotonic())
+
+    def _collect_stable(self) -> list[Path]:
+        now = time.monotonic()
+        ready: list[Path] = []
+        for path, (size, mtime_ns, since) in list(self._pending.items()):
+            try:
+                st = path.stat()
+            except OSError:
+                self._pending.pop(path, None)
+                continue
+            sig = (int(st.st_size), int(st.st_mtime_ns))
+            if sig != (size, mtime_ns):
+                self._pending[path] = (sig[0], sig[1], now)
+                continue
+            # 0 字节通常是扫描仪刚创建、尚未写入的文件
+            if sig[0] <= 0 or now - since < self._settle_s:
+                continue
+            self._pending.pop(path, None)
+            self._handed[path] = sig
+            ready.append(path)
+        return sorted(ready, key=lambda p: str(p).lower())
+
+
+def _unique_target(target: Path) -> Path:
+    if not target.exists():
+        return target
+    for i in range(1, 10000):
+        cand = target.with_name(f"{target.stem}_{i:03d}{target.suffix}")
+        if not cand.exists():
+            return cand
+    return target.with_name(f"{target.stem}_{os.getpid()}{target.suffix}")
+
+
+def finalize_input(
+    path: Path,
+    *,
+    succeeded: bool,
+    root: Optional[Path],
+    done_dir: Optional[Path],
+    failed_dir: Optional[Path],
+) -> Path:
+    """
+    处理结束后归档输入文件：配置了 done_dir/failed_dir 时移动过去（保留相对监视根目录的层级，重名自动加序号），
+    否则在原文件旁写标记文件。返回移动后的路径或标记文件路径。
+    """
+    dest_root = done_dir if succeeded else failed_dir
+    if dest_root is not None:
+        rel = Path(path.name)
+        if root is not None:
+            try:
+                rel = path.relative_to(root)
+            except ValueError:
+                pass
+        target = _unique_target(dest_root / rel)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(path), str(target))
+        return target
+    marker = path.with_name(path.name + (DONE_MARKER_SUFFIX if succeeded else FAILED_MARKER_SUFFIX))
+    marker.write_text(time.strftime("%Y-%m-%d %H:%M:%S") + "\n", encoding="utf-8")
+    return marker
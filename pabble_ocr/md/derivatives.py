@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional
+
+
+@dataclass(frozen=True)
+class DerivativeProfile:
+    """
+    目标端图片派生规格：超出 max_width/max_height 的图片按比例缩小并重新编码。
+    派生图保持源文件格式与扩展名（Markdown 引用无需改写）；quality 作用于 jpeg/webp。
+    """
+
+    name: str
+    max_width: int
+    max_height: int
+    quality: int = 82
+
+    def cache_key(self) -> str:
+        return f"{self.name}:{self.max_width}x{self.max_height}:q{self.quality}"
+
+
+PROFILES: dict[str, DerivativeProfile] = {
+    # 手机/电纸书阅读器：屏幕宽度通常 ≤1200 逻辑像素，低端设备解码 3000px 原图很慢且易 OOM
+    "epub-mobile": DerivativeProfile(name="epub-mobile", max_width=1200, max_height=1600, quality=80),
+    "web": DerivativeProfile(name="web", max_width=1920, max_height=1920, quality=85),
+}
+
+# workers=0（自动）时取 CPU 核数，但不超过该上限（与合并阶段 MERGE_WORKERS 的自动上限一致）：
+# 每个子进程都要加载 Qt 并整张解码原图，内存随进程数线性增长；需要更多进程时用 --jobs 显式指定
+_AUTO_WORKERS_CAP = 4
+
+# 只处理常见位图格式；其它（svg/gif/tiff 等）原样输出
+_DERIVABLE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+_QT_FORMAT = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".webp": "WEBP"}
+
+
+def get_profile(name: str) -> Optional[DerivativeProfile]:
+    """按名称取派生规格；"none"/空 返回 None（表示使用原图）。未知名称抛 ValueError。"""
+    key = str(name or "").strip().lower()
+    if key in {"", "none", "original"}:
+        return None
+    if key not in PROFILES:
+        raise ValueError(f"未知的派生规格：{name}（可选：{', '.join(sorted(PROFILES))}, none）")
+    return PROFILES[key]
+
+
+@dataclass
+class DerivativeResult:
+    # 源文件 -> 实际应输出的文件（派生图或原图）
+    chosen: dict[str, str] = field(default_factory=dict)
+    resized: int = 0
+    cached: int = 0
+    original: int = 0
+    failed: int = 0
+    bytes_source: int = 0
+    bytes_output: int = 0
+
+    def summary(self) -> str:
+        s = f"派生 {self.resized} 张（缓存命中 {self.cached}），原图 {self.original} 张，失败 {self.failed} 张"
+        if self.bytes_source > 0:
+            s += f"；{self.bytes_source / 1024:.0f} KB -> {self.bytes_output / 1024:.0f} KB"
+        return s
+
+
+def _hash_file(path: Path) -> str:
+    h = hashlib.sha1()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _fit_size(w: int, h: int, max_w: int, max_h: int) -> tuple[int, int]:
+    scale = min(1.0, float(max_w) / float(w), float(max_h) / float(h))
+    return max(1, int(round(w * scale))), max(1, int(round(h * scale)))
+
+
+def _derive_one(src: str, cache_dir: str, profile: DerivativeProfile) -> tuple[str, str, str]:
+    """
+    生成单张派生图。返回 (src, 实际输出文件, 状态)；状态：resized/cached/original/failed。
+    注意：会被进程池调用，必须保持为模块级函数（参数/返回值需可 pickle）。
+    """
+    src_path = Path(src)
+    suffix = src_path.suffix.lower()
+    if suffix not in _DERIVABLE_SUFFIXES:
+        return src, src, "original"
+    try:
+        digest = _hash_file(src_path)
+    except Exception:
+        return src, src, "failed"
+
+    # 缓存键：源内容 hash + 规格参数；同一张图被多本书/多次导出引用时只处理一次
+    key = hashlib.sha1(f"{digest}|{profile.cache_key()}".encode("utf-8")).hexdigest()
+    out_path = Path(cache_dir) / key[:2] / f"{key}{suffix}"
+    keep_marker = out_path.with_suffix(out_path.suffix + ".orig")
+    if out_path.exists():
+        return src, str(out_path), "cached"
+    if keep_marker.exists():
+        return src, src, "original"
+
+    try:
+        from PySide6.QtCore import QSize
+        from PySide6.QtGui import QImageReader
+    except Exception:
+        return src, src, "failed"
+
+    try:
+        reader = QImageReader(str(src_path))
+        reader.setAutoTransform(True)
+        size = reader.size()
+        w, h = int(size.width()), int(size.height())
+        if w <= 0 or h <= 0:
+            return src, src, "failed"
+        tw, th = _fit_size(w, h, profile.max_width, profile.max_height)
+        if (tw, th) == (w, h):
+            keep_marker.parent.mkdir(parents=True, exist_ok=True)
+            keep_marker.touch()
+            return src, src, "original"
+        # 解码时直接缩放：JPEG 解码器可按 1/2、1/4、1/8 降采样，比先全尺寸解码再缩放省很多
+        reader.setScaledSize(QSize(tw, th))
+        img = reader.read()
+        if img.isNull():
+            return src, src, "failed"
+
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = out_path.with_name(out_path.name + ".tmp" + suffix)
+        quality = profile.quality if suffix in {".jpg", ".jpeg", ".webp"} else -1
+        if not img.save(str(tmp), _QT_FORMAT[suffix], quality):
+            return src, src, "failed"
+        if tmp.stat().st_size >= src_path.stat().st_size:
+            # 缩小后反而更大（源图已高度压缩）：直接用原图
+            tmp.unlink()
+            keep_marker.touch()
+            return src, src, "original"
+        tmp.replace(out_path)
+        return src, str(out_path), "resized"
+    except Exception:
+        return src, src, "failed"
+
+
+def build_derivatives(
+    sources: list[Path],
+    *,
+    cache_dir: Path,
+    profile: DerivativeProfile,
+    workers: int = 0,
+    log: Callable[[str], None] = print,
+) -> DerivativeResult:
+    """
+    为 sources 生成目标规格的派生图（缓存于 cache_dir），返回每个源文件实际应输出的文件。
+    多张图片时分发到进程池并行处理；进程池不可用时自动退回串行。
+    """
+    uniq = sorted({str(p) for p in sources})
+    result = DerivativeResult()
+    if not uniq:
+        return result
+
+    n = int(workers or 0)
+    if n <= 0:
+        n = min(_AUTO_WORKERS_CAP, os.cpu_count() or 1)
+    n = max(1, min(n, len(uniq)))
+    cache = str(cache_dir)
+
+    rows: list[tuple[str, str, str]]
+    if n <= 1:
+        rows = [_derive_one(s, cache, profile) for s in uniq]
+    else:
+        try:
+            with ProcessPoolExecutor(max_workers=n) as pool:
+                rows = list(pool.map(_derive_one, uniq, [cache] * len(uniq), [profile] * len(uniq), chunksize=8))
+        except (BrokenProcessPool, OSError) as e:
+            log(f"进程池不可用，改为串行生成派生图：{e}")
+            rows = [_derive_one(s, cache, profile) for s in uniq]
+
+    for src, chosen, status in rows:
+        result.chosen[src] = chosen
+        if status == "resized":
+            result.resized += 1
+        elif status == "cached":
+            result.resized += 1
+            result.cached += 1
+        elif status == "failed":
+            result.failed += 1
+        else:
+            result.original += 1
+        try:
+            result.bytes_source += int(Path(src).stat().st_size)
+            result.bytes_output += int(Path(chosen).stat().st_size)
+        except Exception:
+            pass
+    return result
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+from pabble_ocr.utils.io import atomic_write_json
+
+
+# 分组阈值/合并图命名规则/清单结构变化时递增：旧清单整体失效，下次合并自动重建
+FRAGMENT_MANIFEST_VERSION = 1
+
+
+def fragment_page_digest(
+    *,
+    pruned_result: Optional[dict[str, Any]],
+    known_srcs: Iterable[str],
+    page_no: int,
+    pdf_page_index: Optional[int],
+    codec: str = "png",
+) -> str:
+    """
+    单页碎片合并的输入摘要：prunedResult（含 bbox 与页面尺寸）+ 页面图片列表 + 页码 + 可裁剪的 PDF 页 + 合并图编码。
+    任一输入变化都会使摘要变化，从而让该页重新分组/生成合并图。
+    """
+    h = hashlib.sha1()
+    h.update(f"v{FRAGMENT_MANIFEST_VERSION}|p{int(page_no)}|pdf{pdf_page_index}|{codec}".encode("utf-8"))
+    for s in sorted(set(known_srcs)):
+        h.update(b"\0")
+        h.update(s.encode("utf-8"))
+    h.update(b"\1")
+    if isinstance(pruned_result, dict) and pruned_result:
+        h.update(json.dumps(pruned_result, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+class FragmentManifest:
+    """
+    分段级碎片合并清单（_parts/{segment_id}_fragments.json）：
+    按页记录输入摘要与产出的替换表（碎片 src -> 合并图 src）。
+    摘要未变的页面直接重放替换表：不再抽取区域/聚类/计算文件名，也不触碰任何图片文件。
+    只有整页所有分组都成功产出时才记录，失败的页面下次仍会重试。
+    scope 标识替换表中相对路径的基准目录（如 "_parts" 或 "."），基准变化时清单失效。
+    """
+
+    def __init__(self, path: Path, *, scope: str = ".") -> None:
+        self.path = path
+        self.scope = scope
+        self._pages: dict[str, dict[str, Any]] = {}
+        self._dirty = False
+        self.replayed = 0
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception:
+            return
+        if not isinstance(data, dict):
+            return
+        if data.get("version") != FRAGMENT_MANIFEST_VERSION or data.get("scope") != self.scope:
+            return
+        pages = data.get("pages")
+        if isinstance(pages, dict):
+            self._pages = {str(k): v for k, v in pages.items() if isinstance(v, dict)}
+
+    def lookup(self, page_key: str, digest: str) -> Optional[dict[str, str]]:
+        entry = self._pages.get(page_key)
+        if not entry or entry.get("digest") != digest:
+            return None
+        repl = entry.get("replacements")
+        if not isinstance(repl, dict):
+            return None
+        self.replayed += 1
+        return {str(k): str(v) for k, v in repl.items()}
+
+    def record(self, page_key: str, digest: str, replacements: dict[str, str]) -> None:
+        entry = {"digest": digest, "replacements": dict(sorted(replacements.items()))}
+        if self._pages.get(page_key) == entry:
+            return
+        self._pages[page_key] = entry
+        self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        atomic_write_json(
+            self.path,
+            {"version": FRAGMENT_MANIFEST_VERSION, "scope": self.scope, "pages": self._pages},
+        )
+        self._dirty = False
@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from pabble_ocr.config import AppConfig
+
+
+# merged_image_format 可选值
+IMAGE_FORMATS = ("png", "png-opt", "jpeg", "webp", "auto")
+
+_SUFFIX_BY_FORMAT = {"png": ".png", "png-opt": ".png", "jpeg": ".jpg", "webp": ".webp"}
+_QT_FORMAT = {"png": "PNG", "png-opt": "PNG", "jpeg": "JPEG", "webp": "WEBP"}
+
+# 裁剪发白等异常产物的体积上限（字节），按扩展名区分：有损格式的正常小图本身就比 PNG 小得多
+# （实测 800×600 空白图：PNG≈7.5KB、JPEG≈8KB、WebP<1KB；200×200 的简单图表 WebP≈6KB）
+_SUSPECT_BYTES = {".png": 8_192, ".jpg": 4_096, ".webp": 1_536}
+
+# auto 模式：采样像素中的颜色数不超过该值视为“线稿/图表/截图”，用无损 PNG；否则按照片处理用有损格式
+_AUTO_PALETTE_MAX_COLORS = 256
+_AUTO_SAMPLE_PIXELS = 4096
+
+# 节省量抽样：非 PNG 输出每 N 张额外按 PNG 编码 1 张（第 1 张必测），按抽样比例估算整体节省量
+_MEASURE_EVERY = 8
+
+
+def normalize_image_format(value: object) -> str:
+    v = str(value or "").strip().lower()
+    if v in {"jpg", "jpeg"}:
+        return "jpeg"
+    if v in {"png_opt", "pngopt", "png-optimized"}:
+        return "png-opt"
+    return v if v in IMAGE_FORMATS else "png"
+
+
+@dataclass
+class ImageCodecStats:
+    """合并图编码统计（可跨进程回传并累加）。"""
+
+    files: int = 0
+    bytes_written: int = 0
+    # 抽样测量的图：按默认 PNG 编码的字节数 / 实际输出字节数 / 张数（用于估算节省量）
+    png_bytes: int = 0
+    measured_bytes: int = 0
+    measured_files: int = 0
+
+    def add(self, other: "ImageCodecStats") -> None:
+        self.files += other.files
+        self.bytes_written += other.bytes_written
+        self.png_bytes += other.png_bytes
+        self.measured_bytes += other.measured_bytes
+        self.measured_files += other.measured_files
+
+    def summary(self) -> str:
+        s = f"{self.files} 张，共 {self.bytes_written / 1024:.0f} KB"
+        if self.png_bytes > 0 and self.measured_bytes > 0:
+            if self.measured_files >= self.files:
+                png_total = float(self.png_bytes)
+                note = ""
+            else:
+                png_total = self.bytes_written * self.png_bytes / float(self.measured_bytes)
+                note = f"，按 {self.measured_files} 张抽样估算"
+            saved = png_total - self.bytes_written
+            pct = saved * 100.0 / png_total
+            s += f"，较 PNG {'约' if note else ''}节省 {saved / 1024:.0f} KB（{pct:.1f}%{note}）"
+        return s
+
+
+@dataclass(frozen=True)
+class ImageCodec:
+    """
+    合并图输出编码：
+    - png：Qt 默认 PNG（与旧版本一致）
+    - png-opt：不透明图去掉 alpha 通道 + 最高压缩级别（无损，更慢更小）
+    - jpeg / webp：有损，quality 取 1~100（透明区域先铺白底）
+    - auto：按内容选择，颜色少（线稿/图表）用 png-opt，否则 webp（Qt 无 WebP 插件时退回 jpeg）
+    非 PNG 输出每 _MEASURE_EVERY 张额外在内存中按 PNG 编码 1 张，用于估算节省量；
+    measure_png=True（DEBUG_DUMP_PAGES）时每张都测（编码耗时约翻倍）
+    """
+
+    format: str = "png"
+    quality: int = 85
+    measure_png: bool = False
+
+    @classmethod
+    def from_config(cls, config: AppConfig) -> "ImageCodec":
+        fmt = normalize_image_format(config.merged_image_format)
+        try:
+            q = int(config.merged_image_quality)
+        except Exception:
+            q = 85
+        return cls(format=fmt, quality=max(1, min(100, q)), measure_png=bool(config.debug_dump_pages))
+
+    def cache_key(self) -> str:
+        return f"{self.format}:{self.quality}" if self.format in {"jpeg", "webp", "auto"} else self.format
+
+    def file_tag(self) -> str:
+        """写入合并图文件名的编码标识：png 为空（与旧版本文件名一致），其余格式/质量各不相同。"""
+        if self.format == "png":
+            return ""
+        if self.format == "png-opt":
+            return "pngopt"
+        return f"{self.format}{self.quality}"
+
+    def output_rel(self, rel: str) -> str:
+        """在文件名中带上编码标识：修改格式/质量后旧文件不再命中，下次合并按新编码重建。"""
+        tag = self.file_tag()
+        p = Path(rel)
+        return p.with_name(f"{p.stem}_{tag}{p.suffix}").as_posix() if tag else p.as_posix()
+
+    def candidate_suffixes(self) -> tuple[str, ...]:
+        if self.format == "auto":
+            return (".png", ".webp", ".jpg")
+        return (_SUFFIX_BY_FORMAT[self.format],)
+
+    def find_existing(self, output_dir: Path, rel: str) -> Optional[str]:
+        """按当前格式可能的扩展名查找已存在的输出（rel 的扩展名会被忽略），返回相对路径。"""
+        base = Path(rel)
+        for suffix in self.candidate_suffixes():
+            cand = base.with_suffix(suffix)
+            if (output_dir / cand).exists():
+                return cand.as_posix()
+        return None
+
+    def save(self, img, output_dir: Path, rel: str, stats: Optional[ImageCodecStats] = None) -> Optional[str]:
+        """
+        按当前编码保存 QImage 到 output_dir/rel（扩展名随实际格式替换）。
+        返回实际写入的相对路径；失败返回 None。
+        """
+        fmt = self.format
+        if fmt == "auto":
+            fmt = "png-opt" if _count_sample_colors(img, _AUTO_PALETTE_MAX_COLORS) <= _AUTO_PALETTE_MAX_COLORS else _lossy_format()
+        out_img = img
+        quality = -1
+        if fmt == "png-opt":
+            out_img = _drop_alpha_if_opaque(img)
+            quality = 0  # Qt 的 PNG writer：quality 越低压缩级别越高（无损）
+        elif fmt in {"jpeg", "webp"}:
+            out_img = _flatten_on_white(img)
+            quality = self.quality
+
+        out_rel = Path(rel).with_suffix(_SUFFIX_BY_FORMAT[fmt]).as_posix()
+        out_path = output_dir / out_rel
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        if not bool(out_img.save(str(out_path), _QT_FORMAT[fmt], quality)):
+            return None
+
+        if stats is not None:
+            try:
+                size = int(out_path.stat().st_size)
+            except Exception:
+                size = 0
+            stats.files += 1
+            stats.bytes_written += size
+            if fmt != "png" and (self.measure_png or (stats.files - 1) % _MEASURE_EVERY == 0):
+                baseline = _encoded_size(img, "PNG")
+                if baseline > 0:
+                    stats.png_bytes += baseline
+                    stats.measured_bytes += size
+                    stats.measured_files += 1
+        return out_rel
+
+
+def remove_other_variants(output_dir: Path, base_rel: str, keep_rel: str) -> None:
+    """删除同一张合并图按其它编码生成的旧文件（base_rel 为不带编码标识的文件名），避免 images/merged/ 堆积孤儿文件。"""
+    base = Path(base_rel)
+    keep = Path(keep_rel).name
+    suffixes = set(_SUFFIX_BY_FORMAT.values())
+    try:
+        for p in (output_dir / base.parent).glob(f"{base.stem}*"):
+            if p.name == keep or p.suffix.lower() not in suffixes:
+                continue
+            if p.stem == base.stem or p.stem.startswith(base.stem + "_"):
+                p.unlink()
+    except OSError:
+        pass
+
+
+def looks_blank(path: Path, *, min_area_px: float) -> bool:
+    """
+    已有合并图是否小得可疑（常见于 render 尺寸与 bbox 坐标系不一致导致 crop 发白）。
+    min_area_px：图片应覆盖的最小面积（bbox 坐标单位），过小的图不做判断。
+    """
+    if min_area_px <= 200 * 200:
+        return False
+    limit = _SUSPECT_BYTES.get(path.suffix.lower(), _SUSPECT_BYTES[".png"])
+    return path.stat().st_size < limit
+
+
+def _lossy_format() -> str:
+    try:
+        from PySide6.QtGui import QImageWriter
+    except Exception:
+        return "jpeg"
+    try:
+        formats = {bytes(f).decode("ascii", "ignore").lower() for f in QImageWriter.supportedImageFormats()}
+    except Exception:
+        return "jpeg"
+    return "webp" if "webp" in formats else "jpeg"
+
+
+def _count_sample_colors(img, limit: int) -> int:
+    """在均匀网格上采样约 _AUTO_SAMPLE_PIXELS 个像素，统计不同颜色数（超过 limit 即提前返回）。"""
+    w = int(img.width())
+    h = int(img.height())
+    if w <= 0 or h <= 0:
+        return 0
+    step = max(1, int(((w * h) / float(_AUTO_SAMPLE_PIXELS)) ** 0.5))
+    colors: set[int] = set()
+    for y in range(0, h, step):
+        for x in range(0, w, step):
+            colors.add(int(img.pixel(x, y)))
+            if len(colors) > limit:
+                return len(colors)
+    return len(colors)
+
+
+def _is_opaque(img) -> bool:
+    try:
+        if not img.hasAlphaChannel():
+            return True
+        # 采样判断：PDF 渲染结果通常带 alpha 通道但实际全不透明
+        w = int(img.width())
+        h = int(img.height())
+        step = max(1, int(((w * h) / float(_AUTO_SAMPLE_PIXELS)) ** 0.5))
+        for y in range(0, h, step):
+            for x in range(0, w, step):
+                if (int(img.pixel(x, y)) >> 24) & 0xFF != 0xFF:
+                    return False
+        return True
+    except Exception:
+        return False
+
+
+def _drop_alpha_if_opaque(img):
+    try:
+        from PySide6.QtGui import QImage
+    except Exception:
+        return img
+    if not _is_opaque(img):
+        return img
+    try:
+        out = img.convertToFormat(QImage.Format.Format_RGB888)
+        return img if out.isNull() else out
+    except Exception:
+        return img
+
+
+def _flatten_on_white(img):
+    """有损格式不支持（或不擅长）透明：铺白底后转为 RGB888。"""
+    try:
+        from PySide6.QtCore import Qt
+        from PySide6.QtGui import QImage, QPainter
+    except Exception:
+        return img
+    try:
+        if not img.hasAlphaChannel():
+            return img.convertToFormat(QImage.Format.Format_RGB888)
+        out = QImage(img.width(), img.height(), QImage.Format.Format_RGB888)
+        out.fill(Qt.GlobalColor.white)
+        painter = QPainter(out)
+        try:
+            painter.drawImage(0, 0, img)
+        finally:
+            painter.end()
+        return out
+    except Exception:
+        return img
+
+
+def _encoded_size(img, qt_format: str) -> int:
+    try:
+        from PySide6.QtCore import QBuffer, QByteArray, QIODevice
+    except Exception:
+        return 0
+    try:
+        data = QByteArray()
+        buf = QBuffer(data)
+        buf.open(QIODevice.OpenModeFlag.WriteOnly)
+        ok = img.save(buf, qt_format)
+        buf.close()
+        return int(data.size()) if ok else 0
+    except Exception:
+        return 0
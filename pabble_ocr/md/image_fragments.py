@@ -1,12 +1,21 @@
 from __future__ import annotations
 
 import hashlib
+import math
 import re
+from collections import OrderedDict
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Iterable, Optional
 
 from pabble_ocr.config import AppConfig
+from pabble_ocr.md.fragment_manifest import FragmentManifest, fragment_page_digest
+from pabble_ocr.md.image_codec import ImageCodec, ImageCodecStats, looks_blank, remove_other_variants
+
+try:  # 可选依赖：存在时用向量化 bbox 计算加速碎片分组；缺失时走纯 Python 路径
+    import numpy as _np
+except Exception:  # pragma: no cover
+    _np = None
 
 
 @dataclass(frozen=True)
@@ -156,20 +165,52 @@ def _bbox_from_any(value: Any) -> Optional[tuple[float, float, float, float]]:
     return None
 
 
+class _SrcSuffixIndex:
+    """
+    已知图片 src 的尾缀索引（按字符反向建的 trie）。
+    查询耗时只与被查字符串长度有关，与已知 src 数量无关；多个 src 同时是尾缀时取最长者（结果确定）。
+    """
+
+    _END = None  # 终点标记（trie 的其它 key 都是单个字符，不会冲突）
+
+    def __init__(self, srcs: Iterable[str]) -> None:
+        self._root: dict[Any, Any] = {}
+        for k in srcs:
+            if not k:
+                continue
+            node = self._root
+            for ch in reversed(k):
+                node = node.setdefault(ch, {})
+            node[self._END] = k
+
+    def match(self, value: str) -> Optional[str]:
+        node = self._root
+        best: Optional[str] = None
+        for ch in reversed(value):
+            node = node.get(ch)
+            if node is None:
+                break
+            k = node.get(self._END)
+            if k is not None:
+                best = k
+        return best
+
+
+def _is_number_list(node: list) -> bool:
+    # bbox/points/多边形/置信度等纯数值数组：不可能含图片引用，遍历时整棵跳过
+    return all(isinstance(v, (int, float)) for v in node)
+
+
 def _extract_regions_from_pruned_result(pruned_result: dict[str, Any], known_srcs: set[str]) -> list[ImageRegion]:
     regions: list[ImageRegion] = []
     if not pruned_result or not known_srcs:
         return regions
 
+    # 有些服务端会在 prunedResult 里给绝对/相对混用，这里做尾缀匹配（精确相等也是尾缀的一种）
+    index = _SrcSuffixIndex(known_srcs)
+
     def _match_src(raw: str) -> Optional[str]:
-        v = _normalize_src(raw)
-        if v in known_srcs:
-            return v
-        # 有些服务端会在 prunedResult 里给绝对/相对混用，这里尽量做尾缀匹配
-        for k in known_srcs:
-            if v.endswith(k):
-                return k
-        return None
+        return index.match(_normalize_src(raw))
 
     def _walk(node: Any) -> None:
         if isinstance(node, dict):
@@ -202,6 +243,8 @@ def _extract_regions_from_pruned_result(pruned_result: dict[str, Any], known_src
                 _walk(v)
             return
         if isinstance(node, list):
+            if _is_number_list(node):
+                return
             for v in node:
                 _walk(v)
 
@@ -275,10 +318,26 @@ def _union_over_sum(a: tuple[float, float, float, float], b: tuple[float, float,
     return float(union / denom) if denom > 0 else 999.0
 
 
-def _group_regions(regions: list[ImageRegion]) -> list[list[ImageRegion]]:
-    if len(regions) < 2:
-        return []
+@dataclass(frozen=True)
+class _GroupingThresholds:
+    gap: float
+    min_overlap: float
+    max_union_over_sum_center: float
+    center_align_x: float
+    center_align_y: float
+
+    @property
+    def neighbor_radius(self) -> float:
+        """
+        任意合并规则成立时，两框的水平/垂直间隙都不超过该值：
+        - 同排/同列规则：一个方向 overlap>0（间隙为 0），另一方向间隙 <= gap
+        - 中心对齐规则：一个方向间隙 <= 1.5*gap，另一方向间隙 <= |中心差| <= center_align_* <= gap
+        因此可据此做空间索引剪枝，而不改变分组结果。
+        """
+        return max(self.gap * 1.5, self.center_align_x, self.center_align_y)
+
 
+def _grouping_thresholds(regions: list[ImageRegion]) -> _GroupingThresholds:
     xs = [r.bbox[0] for r in regions] + [r.bbox[2] for r in regions]
     ys = [r.bbox[1] for r in regions] + [r.bbox[3] for r in regions]
     span_x = max(xs) - min(xs)
@@ -293,13 +352,172 @@ def _group_regions(regions: list[ImageRegion]) -> list[list[ImageRegion]]:
     med_h = _median(heights)
     # 注意：这里宁可“偏激进合并”，也不要把同一图的上下/左右子图拆开（观感会明显变差）。
     # 同时保留 union_over_sum 的兜底约束，避免把相距很远的图片误合并。
-    gap_thresh = max(span * 0.08, med_w * 0.40, med_h * 0.40)
-    min_overlap = 0.22
-    max_union_over_sum = 2.20
-    max_union_over_sum_center = 2.60
-    center_align_x = max(span * 0.03, med_w * 0.35)
-    center_align_y = max(span * 0.03, med_h * 0.35)
+    return _GroupingThresholds(
+        gap=max(span * 0.08, med_w * 0.40, med_h * 0.40),
+        min_overlap=0.22,
+        max_union_over_sum_center=2.60,
+        center_align_x=max(span * 0.03, med_w * 0.35),
+        center_align_y=max(span * 0.03, med_h * 0.35),
+    )
+
+
+def _should_merge(
+    a: tuple[float, float, float, float],
+    b: tuple[float, float, float, float],
+    th: _GroupingThresholds,
+) -> bool:
+    if _iou(a, b) > 0.02:
+        return True
+    ax0, ay0, ax1, ay1 = a
+    bx0, by0, bx1, by1 = b
+    v_overlap = _overlap_ratio_1d(ay0, ay1, by0, by1)
+    h_overlap = _overlap_ratio_1d(ax0, ax1, bx0, bx1)
+    h_gap = max(0.0, max(bx0 - ax1, ax0 - bx1))
+    v_gap = max(0.0, max(by0 - ay1, ay0 - by1))
+
+    # 1) 明确同排/同列：优先合并（不让 union_over_sum 过早剪枝，避免“同图被拆成上下两段”）
+    if v_overlap >= th.min_overlap and h_gap <= th.gap:
+        return True
+    if h_overlap >= th.min_overlap and v_gap <= th.gap:
+        return True
+
+    # 2) 尺寸差异/裁剪偏移时 overlap 可能很低：用“中心对齐 + 距离”兜底
+    cx_a = (ax0 + ax1) / 2.0
+    cy_a = (ay0 + ay1) / 2.0
+    cx_b = (bx0 + bx1) / 2.0
+    cy_b = (by0 + by1) / 2.0
+    if v_gap <= th.gap * 1.5 and abs(cx_a - cx_b) <= th.center_align_x:
+        if _union_over_sum(a, b) <= th.max_union_over_sum_center:
+            return True
+    if h_gap <= th.gap * 1.5 and abs(cy_a - cy_b) <= th.center_align_y:
+        if _union_over_sum(a, b) <= th.max_union_over_sum_center:
+            return True
+
+    # 3) 其余情况（相距过远/对角线偏移）不合并
+    return False
+
+
+def _candidate_pairs(bboxes: list[tuple[float, float, float, float]], radius: float) -> Optional[list[tuple[int, int]]]:
+    """
+    网格分桶（格子边长=radius）找“可能合并”的候选对 (i, j)，i < j。
+    仅返回水平/垂直间隙都 <= radius 的对；radius 非法（0/inf/nan）时返回 None，由调用方退回全量两两比较。
+    """
+    if not (radius > 0 and math.isfinite(radius)):
+        return None
+    min_x = min(b[0] for b in bboxes)
+    min_y = min(b[1] for b in bboxes)
+    if not (math.isfinite(min_x) and math.isfinite(min_y)):
+        return None
+    if any(not math.isfinite(b[2]) or not math.isfinite(b[3]) for b in bboxes):
+        return None
 
+    def _cell(v: float, origin: float) -> int:
+        return int((v - origin) // radius)
+
+    cells: dict[tuple[int, int], list[int]] = {}
+    for idx, (x0, y0, x1, y1) in enumerate(bboxes):
+        for cx in range(_cell(x0, min_x), _cell(x1, min_x) + 1):
+            for cy in range(_cell(y0, min_y), _cell(y1, min_y) + 1):
+                cells.setdefault((cx, cy), []).append(idx)
+
+    pairs: list[tuple[int, int]] = []
+    for i, (ax0, ay0, ax1, ay1) in enumerate(bboxes):
+        seen: set[int] = set()
+        for cx in range(_cell(ax0 - radius, min_x), _cell(ax1 + radius, min_x) + 1):
+            for cy in range(_cell(ay0 - radius, min_y), _cell(ay1 + radius, min_y) + 1):
+                for j in cells.get((cx, cy), ()):
+                    if j <= i or j in seen:
+                        continue
+                    seen.add(j)
+                    bx0, by0, bx1, by1 = bboxes[j]
+                    if bx0 - ax1 > radius or ax0 - bx1 > radius:
+                        continue
+                    if by0 - ay1 > radius or ay0 - by1 > radius:
+                        continue
+                    pairs.append((i, j))
+    pairs.sort()
+    return pairs
+
+
+# 区域数较少时 NumPy 建数组的固定开销反而更大
+_NUMPY_MIN_REGIONS = 24
+# 按行分块计算两两矩阵，限制单块元素数（每个 float64 矩阵约 8 * 该值字节）
+_NUMPY_BLOCK_ELEMENTS = 2_000_000
+
+
+def _merge_pairs_numpy(bboxes: list[tuple[float, float, float, float]], th: _GroupingThresholds) -> Optional[list[tuple[int, int]]]:
+    """
+    NumPy 版本的 `_should_merge`：一次性计算整页区域两两之间的 IoU / 间隙 / 对齐矩阵，
+    返回判定为“应合并”的 (i, j) 列表（i < j），供并查集直接合并。
+    逐元素运算顺序与标量实现一致（同为 float64），判定结果完全相同。
+    NumPy 不可用或坐标非有限值时返回 None。
+    """
+    if _np is None:
+        return None
+    arr = _np.asarray(bboxes, dtype=_np.float64)
+    if arr.ndim != 2 or arr.shape[1] != 4 or not bool(_np.isfinite(arr).all()):
+        return None
+
+    n = int(arr.shape[0])
+    x0, y0, x1, y1 = arr[:, 0], arr[:, 1], arr[:, 2], arr[:, 3]
+    area = _np.maximum(0.0, x1 - x0) * _np.maximum(0.0, y1 - y0)
+    w = x1 - x0
+    h = y1 - y0
+    cx = (x0 + x1) / 2.0
+    cy = (y0 + y1) / 2.0
+    gap_center = th.gap * 1.5
+
+    pairs: list[tuple[int, int]] = []
+    block = max(1, _NUMPY_BLOCK_ELEMENTS // max(1, n))
+    with _np.errstate(divide="ignore", invalid="ignore"):
+        for r0 in range(0, n, block):
+            r1 = min(n, r0 + block)
+            ax0 = x0[r0:r1, None]
+            ay0 = y0[r0:r1, None]
+            ax1 = x1[r0:r1, None]
+            ay1 = y1[r0:r1, None]
+
+            # _iou
+            iw = _np.maximum(0.0, _np.minimum(ax1, x1) - _np.maximum(ax0, x0))
+            ih = _np.maximum(0.0, _np.minimum(ay1, y1) - _np.maximum(ay0, y0))
+            inter = iw * ih
+            denom = area[r0:r1, None] + area - inter
+            iou = _np.where((inter > 0) & (denom > 0), inter / denom, 0.0)
+            mask = iou > 0.02
+
+            # _overlap_ratio_1d（垂直/水平）
+            v_overlap = ih / _np.maximum(1e-9, _np.minimum(h[r0:r1, None], h))
+            h_overlap = iw / _np.maximum(1e-9, _np.minimum(w[r0:r1, None], w))
+            h_gap = _np.maximum(0.0, _np.maximum(x0 - ax1, ax0 - x1))
+            v_gap = _np.maximum(0.0, _np.maximum(y0 - ay1, ay0 - y1))
+            mask |= (v_overlap >= th.min_overlap) & (h_gap <= th.gap)
+            mask |= (h_overlap >= th.min_overlap) & (v_gap <= th.gap)
+
+            # _union_over_sum + 中心对齐
+            union = _np.maximum(0.0, _np.maximum(ax1, x1) - _np.minimum(ax0, x0)) * _np.maximum(
+                0.0, _np.maximum(ay1, y1) - _np.minimum(ay0, y0)
+            )
+            sum_area = area[r0:r1, None] + area
+            uos_ok = _np.where(sum_area > 0, union / sum_area, 999.0) <= th.max_union_over_sum_center
+            mask |= (v_gap <= gap_center) & (_np.abs(cx[r0:r1, None] - cx) <= th.center_align_x) & uos_ok
+            mask |= (h_gap <= gap_center) & (_np.abs(cy[r0:r1, None] - cy) <= th.center_align_y) & uos_ok
+
+            # 仅取上三角（j > i）
+            rows, cols = _np.nonzero(mask)
+            rows = rows + r0
+            keep = cols > rows
+            pairs.extend(zip(rows[keep].tolist(), cols[keep].tolist()))
+    return pairs
+
+
+def _union_groups(
+    regions: list[ImageRegion],
+    pairs: Iterable[tuple[int, int]],
+    th: Optional[_GroupingThresholds] = None,
+) -> list[list[ImageRegion]]:
+    """
+    并查集分组。提供 th 时 pairs 视为候选对、逐对判定；否则 pairs 视为已判定“应合并”的对。
+    """
     parent = list(range(len(regions)))
 
     def _find(i: int) -> int:
@@ -308,51 +526,15 @@ def _group_regions(regions: list[ImageRegion]) -> list[list[ImageRegion]]:
             i = parent[i]
         return i
 
-    def _union(i: int, j: int) -> None:
+    for i, j in pairs:
         ri = _find(i)
         rj = _find(j)
-        if ri != rj:
-            parent[rj] = ri
-
-    for i in range(len(regions)):
-        a = regions[i].bbox
-        for j in range(i + 1, len(regions)):
-            b = regions[j].bbox
-            if _iou(a, b) > 0.02:
-                _union(i, j)
-                continue
-            ax0, ay0, ax1, ay1 = a
-            bx0, by0, bx1, by1 = b
-            v_overlap = _overlap_ratio_1d(ay0, ay1, by0, by1)
-            h_overlap = _overlap_ratio_1d(ax0, ax1, bx0, bx1)
-            h_gap = max(0.0, max(bx0 - ax1, ax0 - bx1))
-            v_gap = max(0.0, max(by0 - ay1, ay0 - by1))
-
-            # 1) 明确同排/同列：优先合并（不让 union_over_sum 过早剪枝，避免“同图被拆成上下两段”）
-            if v_overlap >= min_overlap and h_gap <= gap_thresh:
-                _union(i, j)
-                continue
-            if h_overlap >= min_overlap and v_gap <= gap_thresh:
-                _union(i, j)
-                continue
-
-            # 2) 尺寸差异/裁剪偏移时 overlap 可能很低：用“中心对齐 + 距离”兜底
-            cx_a = (ax0 + ax1) / 2.0
-            cy_a = (ay0 + ay1) / 2.0
-            cx_b = (bx0 + bx1) / 2.0
-            cy_b = (by0 + by1) / 2.0
-            if v_gap <= gap_thresh * 1.5 and abs(cx_a - cx_b) <= center_align_x:
-                if _union_over_sum(a, b) <= max_union_over_sum_center:
-                    _union(i, j)
-                    continue
-            if h_gap <= gap_thresh * 1.5 and abs(cy_a - cy_b) <= center_align_y:
-                if _union_over_sum(a, b) <= max_union_over_sum_center:
-                    _union(i, j)
-                    continue
-
-            # 3) 最后再用 union_over_sum 作为安全阀：相距过远/对角线偏移的直接跳过
-            if _union_over_sum(a, b) > max_union_over_sum:
-                continue
+        # 已在同一组的对无需再判定（并查集结果与判定顺序无关）
+        if ri == rj:
+            continue
+        if th is not None and not _should_merge(regions[i].bbox, regions[j].bbox, th):
+            continue
+        parent[rj] = ri
 
     groups: dict[int, list[ImageRegion]] = {}
     for i, r in enumerate(regions):
@@ -362,6 +544,34 @@ def _group_regions(regions: list[ImageRegion]) -> list[list[ImageRegion]]:
     return [g for g in groups.values() if len(g) >= 2]
 
 
+def _all_pairs(n: int) -> Iterable[tuple[int, int]]:
+    for i in range(n):
+        for j in range(i + 1, n):
+            yield (i, j)
+
+
+def _group_regions_pairwise(regions: list[ImageRegion]) -> list[list[ImageRegion]]:
+    """全量两两比较的参考实现（用于兜底与基准对照）。"""
+    if len(regions) < 2:
+        return []
+    return _union_groups(regions, _all_pairs(len(regions)), _grouping_thresholds(regions))
+
+
+def _group_regions(regions: list[ImageRegion]) -> list[list[ImageRegion]]:
+    if len(regions) < 2:
+        return []
+    th = _grouping_thresholds(regions)
+    if len(regions) >= _NUMPY_MIN_REGIONS:
+        merge_pairs = _merge_pairs_numpy([r.bbox for r in regions], th)
+        if merge_pairs is not None:
+            return _union_groups(regions, merge_pairs)
+    # 地图/图标宫格等页面可能有数百个小图块：用空间索引只比较邻近候选，分组结果与全量比较一致。
+    pairs = _candidate_pairs([r.bbox for r in regions], th.neighbor_radius)
+    if pairs is None:
+        pairs = _all_pairs(len(regions))
+    return _union_groups(regions, pairs, th)
+
+
 def _bbox_union(regions: list[ImageRegion]) -> tuple[float, float, float, float]:
     x0 = min(r.bbox[0] for r in regions)
     y0 = min(r.bbox[1] for r in regions)
@@ -370,6 +580,10 @@ def _bbox_union(regions: list[ImageRegion]) -> tuple[float, float, float, float]
     return (x0, y0, x1, y1)
 
 
+def _bbox_area(b: tuple[float, float, float, float]) -> float:
+    return max(0.0, b[2] - b[0]) * max(0.0, b[3] - b[1])
+
+
 def _median(values: list[float]) -> float:
     if not values:
         return 1.0
@@ -378,16 +592,23 @@ def _median(values: list[float]) -> float:
     return float(s[mid]) if len(s) % 2 == 1 else float((s[mid - 1] + s[mid]) / 2.0)
 
 
-def _compose_merged_image(*, output_dir: Path, merged_rel: str, regions: list[ImageRegion]) -> bool:
+def _compose_merged_image(
+    *,
+    output_dir: Path,
+    merged_rel: str,
+    regions: list[ImageRegion],
+    codec: Optional[ImageCodec] = None,
+    codec_stats: Optional[ImageCodecStats] = None,
+) -> Optional[str]:
     """
     使用 Qt(QImage/QPainter) 将多个碎片图按 bbox 拼回一张。
-    返回 True 表示生成成功。
+    返回实际写入的相对路径（扩展名随 codec 而定）；失败返回 None。
     """
     try:
         from PySide6.QtCore import Qt
         from PySide6.QtGui import QImage, QPainter
     except Exception:
-        return False
+        return None
 
     union = _bbox_union(regions)
     ux0, uy0, ux1, uy1 = union
@@ -413,7 +634,7 @@ def _compose_merged_image(*, output_dir: Path, merged_rel: str, regions: list[Im
         loaded.append((r, img))
 
     if len(loaded) < 2:
-        return False
+        return None
 
     sx = _median(scales_x)
     sy = _median(scales_y)
@@ -424,7 +645,7 @@ def _compose_merged_image(*, output_dir: Path, merged_rel: str, regions: list[Im
     canvas_h = max(1, int(round(uh * s)))
     # 过大的合并图通常意味着 bbox 不在同一坐标系，直接跳过避免 OOM
     if canvas_w * canvas_h > 60_000_000:  # ~60MP
-        return False
+        return None
 
     canvas = QImage(canvas_w, canvas_h, QImage.Format.Format_ARGB32)
     canvas.fill(Qt.GlobalColor.white)
@@ -448,17 +669,15 @@ def _compose_merged_image(*, output_dir: Path, merged_rel: str, regions: list[Im
     finally:
         painter.end()
 
-    out_path = output_dir / _normalize_src(merged_rel)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    return bool(canvas.save(str(out_path)))
+    return (codec or ImageCodec()).save(canvas, output_dir, _normalize_src(merged_rel), codec_stats)
+
 
-def _render_pdf_page_image(*, pdf_path: Path, page_index: int, width: int, height: int):
+def _load_pdf_document(pdf_path: Path):
     """
-    渲染 PDF 单页为 QImage。
-    返回 QImage 或 None。
+    加载 PDF 为 QPdfDocument。
+    返回 QPdfDocument 或 None。
     """
     try:
-        from PySide6.QtCore import QSize
         from PySide6.QtPdf import QPdfDocument
     except Exception:
         return None
@@ -507,8 +726,27 @@ def _render_pdf_page_image(*, pdf_path: Path, page_index: int, width: int, heigh
         st = doc.load(str(pdf_path))
         if not _is_load_ok(st):
             return None
+        return doc
+    except Exception:
+        # QtPdf 在某些环境/版本组合下会出现奇怪的类型错误；这里宁可降级（返回 None），也不要让整条流水线崩溃。
+        return None
+
 
-        page_count = _safe_int(getattr(doc, "pageCount", lambda: 0)()) or 0
+def _render_loaded_page(doc, *, page_index: int, width: int, height: int):
+    """
+    渲染已加载 QPdfDocument 的单页为 QImage。
+    返回 QImage 或 None。
+    """
+    try:
+        from PySide6.QtCore import QSize
+    except Exception:
+        return None
+
+    try:
+        try:
+            page_count = int(getattr(doc, "pageCount", lambda: 0)() or 0)
+        except Exception:
+            page_count = 0
         if page_index < 0 or page_index >= page_count:
             return None
 
@@ -519,10 +757,222 @@ def _render_pdf_page_image(*, pdf_path: Path, page_index: int, width: int, heigh
             return None
         return img
     except Exception:
-        # QtPdf 在某些环境/版本组合下会出现奇怪的类型错误；这里宁可降级（返回 None），也不要让整条流水线崩溃。
         return None
 
 
+def _render_loaded_clip(doc, *, page_index: int, width: int, height: int, clip: tuple[int, int, int, int]):
+    """
+    只光栅化页面中的裁剪区域：页面按 width×height 缩放，输出 clip（缩放后坐标）对应的那一块。
+    依赖 QPdfDocumentRenderOptions.setScaledClipRect（Qt 6.4+）；不支持时返回 None，由调用方退回整页渲染。
+    """
+    try:
+        from PySide6.QtCore import QRect, QSize
+        from PySide6.QtPdf import QPdfDocumentRenderOptions
+    except Exception:
+        return None
+
+    try:
+        try:
+            page_count = int(getattr(doc, "pageCount", lambda: 0)() or 0)
+        except Exception:
+            page_count = 0
+        if page_index < 0 or page_index >= page_count:
+            return None
+
+        x, y, w, h = clip
+        opts = QPdfDocumentRenderOptions()
+        opts.setScaledSize(QSize(max(1, int(width)), max(1, int(height))))
+        opts.setScaledClipRect(QRect(int(x), int(y), int(w), int(h)))
+        img = doc.render(int(page_index), QSize(int(w), int(h)), opts)
+        if img is None or img.isNull():
+            return None
+        return img
+    except Exception:
+        return None
+
+
+def _close_pdf_document(doc) -> None:
+    if doc is None:
+        return
+    try:
+        doc.close()
+    except Exception:
+        pass
+
+
+@dataclass
+class RenderCacheStats:
+    """PdfRenderCache 的命中统计（可跨进程回传并累加）。"""
+
+    documents_loaded: int = 0
+    pages_rendered: int = 0
+    # 整页图直接取自缓存的次数（同页多组碎片/连续多页共用分段 PDF）
+    page_hits: int = 0
+    clips_rendered: int = 0
+
+    def add(self, other: "RenderCacheStats") -> None:
+        self.documents_loaded += other.documents_loaded
+        self.pages_rendered += other.pages_rendered
+        self.page_hits += other.page_hits
+        self.clips_rendered += other.clips_rendered
+
+    def summary(self) -> str:
+        lookups = self.pages_rendered + self.page_hits
+        s = f"加载 PDF {self.documents_loaded} 次，整页渲染 {self.pages_rendered} 次"
+        if lookups:
+            s += f"，缓存命中 {self.page_hits}/{lookups}（{self.page_hits * 100.0 / lookups:.0f}%）"
+        return s + f"，区域裁剪 {self.clips_rendered} 次"
+
+
+class PdfRenderCache:
+    """
+    一次合并流程内复用的 QtPdf 缓存（用于碎片图 PDF 裁剪）：
+    - 每个 PDF 只加载一次 QPdfDocument（LRU，最多 max_documents 个）
+    - 渲染后的整页图片按 (pdf, page, width, height) 做有界 LRU（整页图可达数十 MB，默认只留 3 页）
+    同页多组碎片、或连续多页共用一个分段 PDF 时，每页最多渲染一次。
+    加载/渲染失败的结果也会缓存，避免对坏 PDF 反复重试。
+    非线程安全：每个合并流程（线程/进程）各自持有一个实例，用完调用 close()。
+    """
+
+    def __init__(self, *, max_documents: int = 4, max_pages: int = 3) -> None:
+        self._max_documents = max(1, int(max_documents))
+        self._max_pages = max(1, int(max_pages))
+        self._documents: OrderedDict[str, Any] = OrderedDict()
+        self._pages: OrderedDict[tuple[str, int, int, int], Any] = OrderedDict()
+        self.stats = RenderCacheStats()
+
+    def document(self, pdf_path: Path):
+        key = str(pdf_path)
+        if key in self._documents:
+            self._documents.move_to_end(key)
+            return self._documents[key]
+        doc = _load_pdf_document(pdf_path)
+        if doc is not None:
+            self.stats.documents_loaded += 1
+        self._documents[key] = doc
+        while len(self._documents) > self._max_documents:
+            _key, old = self._documents.popitem(last=False)
+            _close_pdf_document(old)
+        return doc
+
+    def page_image(self, *, pdf_path: Path, page_index: int, width: int, height: int):
+        key = (str(pdf_path), int(page_index), max(1, int(width)), max(1, int(height)))
+        if key in self._pages:
+            self._pages.move_to_end(key)
+            self.stats.page_hits += 1
+            return self._pages[key]
+        doc = self.document(pdf_path)
+        img = None
+        if doc is not None:
+            img = _render_loaded_page(doc, page_index=int(page_index), width=key[2], height=key[3])
+            self.stats.pages_rendered += 1
+        self._pages[key] = img
+        while len(self._pages) > self._max_pages:
+            self._pages.popitem(last=False)
+        return img
+
+    def cached_page_image(self, *, pdf_path: Path, page_index: int, width: int, height: int):
+        """仅查询已渲染的整页（不触发渲染），未命中返回 None。"""
+        key = (str(pdf_path), int(page_index), max(1, int(width)), max(1, int(height)))
+        img = self._pages.get(key)
+        if img is not None:
+            self._pages.move_to_end(key)
+            self.stats.page_hits += 1
+        return img
+
+    def clip_image(self, *, pdf_path: Path, page_index: int, width: int, height: int, clip: tuple[int, int, int, int]):
+        """渲染页面中的裁剪区域（复用已加载文档；结果不进页面 LRU，每块裁剪只用一次）。"""
+        doc = self.document(pdf_path)
+        if doc is None:
+            return None
+        img = _render_loaded_clip(doc, page_index=int(page_index), width=width, height=height, clip=clip)
+        if img is not None:
+            self.stats.clips_rendered += 1
+        return img
+
+    def close(self) -> None:
+        self._pages.clear()
+        while self._documents:
+            _key, doc = self._documents.popitem(last=False)
+            _close_pdf_document(doc)
+
+    def __enter__(self) -> "PdfRenderCache":
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self.close()
+
+
+def _render_pdf_page_image(
+    *,
+    pdf_path: Path,
+    page_index: int,
+    width: int,
+    height: int,
+    render_cache: Optional[PdfRenderCache] = None,
+):
+    """
+    渲染 PDF 单页为 QImage（提供 render_cache 时复用已加载文档/已渲染页）。
+    返回 QImage 或 None。
+    """
+    if render_cache is not None:
+        return render_cache.page_image(pdf_path=pdf_path, page_index=page_index, width=width, height=height)
+    doc = _load_pdf_document(pdf_path)
+    if doc is None:
+        return None
+    return _render_loaded_page(doc, page_index=page_index, width=width, height=height)
+
+
+# 裁剪区域面积低于整页该比例时只光栅化裁剪区域；更大的区域直接渲染整页（整页结果还能被同页其它组复用）
+_CLIP_RENDER_MAX_AREA_RATIO = 0.5
+
+
+def _clamp_crop_rect(
+    crop_bbox: tuple[float, float, float, float], *, page_w: int, page_h: int
+) -> tuple[int, int, int, int]:
+    x0, y0, x1, y1 = crop_bbox
+    x = max(0, int(round(min(x0, x1))))
+    y = max(0, int(round(min(y0, y1))))
+    w = max(1, int(round(abs(x1 - x0))))
+    h = max(1, int(round(abs(y1 - y0))))
+    if x + w > page_w:
+        w = max(1, page_w - x)
+    if y + h > page_h:
+        h = max(1, page_h - y)
+    return x, y, w, h
+
+
+def _render_pdf_clip_image(
+    *,
+    pdf_path: Path,
+    page_index: int,
+    width: int,
+    height: int,
+    clip: tuple[int, int, int, int],
+    render_cache: Optional[PdfRenderCache] = None,
+):
+    """
+    渲染 PDF 单页中的裁剪区域为 QImage（耗时/内存与裁剪面积成正比，而非整页面积）。
+    若缓存中已有该页整页渲染结果，则直接从中拷贝。
+    返回 QImage 或 None。
+    """
+    if render_cache is not None:
+        page_img = render_cache.cached_page_image(pdf_path=pdf_path, page_index=page_index, width=width, height=height)
+        if page_img is not None:
+            try:
+                from PySide6.QtCore import QRect
+            except Exception:
+                return None
+            x, y, w, h = clip
+            img = page_img.copy(QRect(x, y, w, h))
+            return None if img.isNull() else img
+        return render_cache.clip_image(pdf_path=pdf_path, page_index=page_index, width=width, height=height, clip=clip)
+    doc = _load_pdf_document(pdf_path)
+    if doc is None:
+        return None
+    return _render_loaded_clip(doc, page_index=page_index, width=width, height=height, clip=clip)
+
+
 def _crop_from_pdf(
     *,
     output_dir: Path,
@@ -532,37 +982,53 @@ def _crop_from_pdf(
     crop_bbox: tuple[float, float, float, float],
     render_w: int,
     render_h: int,
-) -> bool:
+    render_cache: Optional[PdfRenderCache] = None,
+    codec: Optional[ImageCodec] = None,
+    codec_stats: Optional[ImageCodecStats] = None,
+) -> Optional[str]:
     """
-    从 PDF 渲染整页再按 bbox 裁剪，生成合并图（最接近原 PDF）。
+    从 PDF 按 bbox 裁剪生成合并图（最接近原 PDF）。
     bbox 单位默认为像素坐标（与 render_w/render_h 对齐）。
+    小区域只光栅化裁剪区域；大区域或不支持裁剪渲染时，渲染整页再拷贝。
+    返回实际写入的相对路径（扩展名随 codec 而定）；失败返回 None。
     """
     try:
         from PySide6.QtCore import QRect
     except Exception:
-        return False
-
-    page_img = _render_pdf_page_image(pdf_path=pdf_path, page_index=page_index, width=render_w, height=render_h)
-    if page_img is None:
-        return False
-
-    x0, y0, x1, y1 = crop_bbox
-    x = max(0, int(round(min(x0, x1))))
-    y = max(0, int(round(min(y0, y1))))
-    w = max(1, int(round(abs(x1 - x0))))
-    h = max(1, int(round(abs(y1 - y0))))
-    if x + w > page_img.width():
-        w = max(1, page_img.width() - x)
-    if y + h > page_img.height():
-        h = max(1, page_img.height() - y)
+        return None
 
-    cropped = page_img.copy(QRect(x, y, w, h))
+    page_w = max(1, int(render_w))
+    page_h = max(1, int(render_h))
+    cropped = None
+    clip = _clamp_crop_rect(crop_bbox, page_w=page_w, page_h=page_h)
+    x, y, w, h = clip
+    if x < page_w and y < page_h and w * h < _CLIP_RENDER_MAX_AREA_RATIO * page_w * page_h:
+        cropped = _render_pdf_clip_image(
+            pdf_path=pdf_path,
+            page_index=page_index,
+            width=page_w,
+            height=page_h,
+            clip=clip,
+            render_cache=render_cache,
+        )
+
+    if cropped is None:
+        page_img = _render_pdf_page_image(
+            pdf_path=pdf_path,
+            page_index=page_index,
+            width=render_w,
+            height=render_h,
+            render_cache=render_cache,
+        )
+        if page_img is None:
+            return None
+        x, y, w, h = _clamp_crop_rect(crop_bbox, page_w=page_img.width(), page_h=page_img.height())
+        cropped = page_img.copy(QRect(x, y, w, h))
     if cropped.isNull():
-        return False
+        return None
+
+    return (codec or ImageCodec()).save(cropped, output_dir, _normalize_src(merged_rel), codec_stats)
 
-    out_path = output_dir / _normalize_src(merged_rel)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    return bool(cropped.save(str(out_path)))
 
 def _rewrite_markdown_with_merged_images(
     markdown: str, *, replacements: dict[str, str]
@@ -629,12 +1095,18 @@ def merge_image_fragments_for_page(
     page_no: int,
     pdf_path: Optional[Path] = None,
     pdf_page_index: Optional[int] = None,
+    render_cache: Optional[PdfRenderCache] = None,
+    manifest: Optional[FragmentManifest] = None,
+    codec_stats: Optional[ImageCodecStats] = None,
 ) -> str:
     """
     对单页 Markdown 做“碎片图片合并”：
     - 从 prunedResult 抽取图片区域 + bbox
     - 聚类合并后，生成合并图文件（本地）
     - 替换/删除页面 Markdown 中的碎片图片引用
+    跨页调用时可传入同一个 render_cache，复用已加载的 PDF 与已渲染的页面。
+    传入 manifest 时，输入摘要未变的页面直接重放上次的替换结果（零图片 I/O）；由调用方负责 save()。
+    合并图编码由 config.merged_image_format/merged_image_quality 决定；传入 codec_stats 时累计编码统计。
     """
     if not bool(getattr(config, "merge_image_fragments", True)):
         return page_markdown or ""
@@ -648,6 +1120,24 @@ def merge_image_fragments_for_page(
     if not known:
         return page_markdown or ""
 
+    codec = ImageCodec.from_config(config)
+    can_crop = pdf_path is not None and pdf_page_index is not None and Path(pdf_path).exists()
+    page_key = str(int(page_no))
+    page_digest = ""
+    if manifest is not None:
+        page_digest = fragment_page_digest(
+            pruned_result=pruned_result if isinstance(pruned_result, dict) else None,
+            known_srcs=known,
+            page_no=page_no,
+            pdf_page_index=int(pdf_page_index) if can_crop and pdf_page_index is not None else None,
+            codec=codec.cache_key(),
+        )
+        cached = manifest.lookup(page_key, page_digest)
+        if cached is not None:
+            if not cached:
+                return page_markdown or ""
+            return _rewrite_markdown_with_merged_images(page_markdown, replacements=cached)
+
     regions: list[ImageRegion] = []
     if isinstance(pruned_result, dict) and pruned_result:
         regions = _extract_regions_from_pruned_result(pruned_result, known)
@@ -656,9 +1146,13 @@ def merge_image_fragments_for_page(
         regions = _extract_regions_from_bbox_in_name(known)
 
     if len(regions) < 2:
+        if manifest is not None:
+            manifest.record(page_key, page_digest, {})
         return page_markdown or ""
     groups = _group_regions(regions)
     if not groups:
+        if manifest is not None:
+            manifest.record(page_key, page_digest, {})
         return page_markdown or ""
 
     # PDF 裁剪渲染尺寸：必须尽量对齐 bbox 坐标系，否则 crop 会裁到错误区域（常见表现：合并图发白/缺图）。
@@ -691,7 +1185,10 @@ def merge_image_fragments_for_page(
         render_w = max(256, max_x)
         render_h = max(256, max_y)
 
+    # 同页多组碎片共用一次整页渲染；调用方未提供缓存时仅在本页内复用
+    page_cache = render_cache if render_cache is not None else PdfRenderCache(max_pages=1)
     replacements: dict[str, str] = {}
+    all_built = True
     for g in groups:
         # 合并文件名用稳定 hash，确保幂等
         h = hashlib.sha1()
@@ -700,44 +1197,62 @@ def merge_image_fragments_for_page(
             h.update(_normalize_src(r.src).encode("utf-8"))
             h.update((",%.6f,%.6f,%.6f,%.6f" % r.bbox).encode("utf-8"))
         digest = h.hexdigest()[:12]
-        merged_rel = f"images/merged/page_{page_no:04d}_{digest}.png"
+        base_rel = f"images/merged/page_{page_no:04d}_{digest}.png"
+        default_rel = codec.output_rel(base_rel)
 
-        out_path = output_dir / merged_rel
-        need_build = not out_path.exists()
+        existing = codec.find_existing(output_dir, default_rel)
+        need_build = existing is None
         if not need_build:
             # 经验兜底：若历史产物明显异常（常见于 render 尺寸与 bbox 坐标系不一致导致 crop 发白），尝试重建。
             # 仅在“可以从 PDF 裁剪”的情况下触发，避免无谓重算。
             try:
-                area = _bbox_area(_bbox_union(g))
-                if area > 200 * 200 and out_path.stat().st_size < 8_192:
-                    need_build = pdf_path is not None and pdf_page_index is not None and Path(pdf_path).exists()
+                if looks_blank(output_dir / existing, min_area_px=_bbox_area(_bbox_union(g))):
+                    need_build = can_crop
             except Exception:
                 pass
 
+        merged_rel = existing
         if need_build:
-            ok = False
-            if pdf_path is not None and pdf_page_index is not None and Path(pdf_path).exists():
+            merged_rel = None
+            if can_crop:
                 # QtPdf 在部分环境里可能不可用/不稳定：失败时自动退回“碎片拼接”，不要直接让整个任务崩溃。
                 try:
-                    ok = _crop_from_pdf(
+                    merged_rel = _crop_from_pdf(
                         output_dir=output_dir,
-                        merged_rel=merged_rel,
+                        merged_rel=default_rel,
                         pdf_path=Path(pdf_path),
                         page_index=int(pdf_page_index),
                         crop_bbox=_bbox_union(g),
                         render_w=render_w,
                         render_h=render_h,
+                        render_cache=page_cache,
+                        codec=codec,
+                        codec_stats=codec_stats,
                     )
                 except Exception:
-                    ok = False
-            if not ok:
-                ok = _compose_merged_image(output_dir=output_dir, merged_rel=merged_rel, regions=g)
-            if not ok:
+                    merged_rel = None
+            if merged_rel is None:
+                merged_rel = _compose_merged_image(
+                    output_dir=output_dir,
+                    merged_rel=default_rel,
+                    regions=g,
+                    codec=codec,
+                    codec_stats=codec_stats,
+                )
+            if merged_rel is None:
+                all_built = False
                 continue
+            # 修改编码后重建（或 auto 模式重建时格式变化）：删除同一合并图的其它编码产物，避免残留
+            remove_other_variants(output_dir, base_rel, merged_rel)
 
         for r in g:
             replacements[_normalize_src(r.src)] = merged_rel
 
+    if page_cache is not render_cache:
+        page_cache.close()
+    if manifest is not None and all_built:
+        manifest.record(page_key, page_digest, replacements)
+
     if not replacements:
         return page_markdown or ""
 
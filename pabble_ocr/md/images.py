@@ -7,12 +7,15 @@ import re
 import time
 from pathlib import Path
 from shutil import copy2
-from typing import Optional
+from typing import Callable, Optional
 from urllib.parse import urljoin
 
 import requests
 
+from pabble_ocr.adapters.cancellable_transport import mount_cancellable
 from pabble_ocr.config import AppConfig
+from pabble_ocr.core.control import CanceledError, RunControl
+from pabble_ocr.core.metrics import MetricsBus
 from pabble_ocr.core.models import FileTaskState
 from pabble_ocr.core.state_store import save_state
 
@@ -62,15 +65,21 @@ def download_images(
     state: FileTaskState,
     images: dict[str, str],
     max_retries: int,
-    log: callable,
+    log: Callable[[str], None],
+    save: Callable[[Path, FileTaskState], object] = save_state,
+    control: Optional[RunControl] = None,
+    metrics: Optional[MetricsBus] = None,
 ) -> None:
     downloaded = set(state.images_downloaded or [])
 
     session = requests.Session()
     session.trust_env = bool(getattr(config, "use_system_proxy", True))
+    mount_cancellable(session, control)
     default_headers = {"Authorization": f"token {config.token}"} if config.token else {}
 
     for rel_path, ref in images.items():
+        if control is not None:
+            control.raise_if_canceled()
         rel_path = rel_path.replace("\\", "/")
         dst = output_dir / rel_path
         try:
@@ -108,7 +117,7 @@ def download_images(
             dst.write_bytes(inline)
             downloaded.add(rel_path)
             state.images_downloaded = sorted(downloaded)
-            save_state(output_dir, state)
+            save(output_dir, state)
             continue
 
         resolved_ref = ref
@@ -134,13 +143,21 @@ def download_images(
                 if r.status_code >= 400:
                     raise RuntimeError(f"HTTP {r.status_code}")
                 dst.write_bytes(r.content)
+                if metrics is not None:
+                    metrics.add_received(len(r.content))
                 downloaded.add(rel_path)
                 state.images_downloaded = sorted(downloaded)
-                save_state(output_dir, state)
+                save(output_dir, state)
                 break
+            except CanceledError:
+                raise
             except Exception as e:
                 if attempt <= max_retries:
-                    time.sleep(min(10.0, 2 ** (attempt - 1) + 0.2))
+                    delay = min(10.0, 2 ** (attempt - 1) + 0.2)
+                    if control is not None:
+                        control.sleep(delay)
+                    else:
+                        time.sleep(delay)
                     continue
                 log(f"图片下载失败：{rel_path} -> {resolved_ref} ({e})")
                 break
@@ -1,13 +1,20 @@
 from __future__ import annotations
 
 import json
+import multiprocessing
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
+from typing import Callable
 
 from pabble_ocr.config import AppConfig
 from pabble_ocr.core.models import FileTaskState, SegmentState
 from pabble_ocr.core.state_store import save_state
-from pabble_ocr.md.image_fragments import merge_image_fragments_for_page
+from pabble_ocr.md.fragment_manifest import FragmentManifest
+from pabble_ocr.md.image_codec import ImageCodecStats
+from pabble_ocr.md.image_fragments import PdfRenderCache, RenderCacheStats, merge_image_fragments_for_page
 from pabble_ocr.md.images import download_images
 from pabble_ocr.md.postprocess import apply_markdown_image_width
 from pabble_ocr.utils.paths import resolve_path_maybe_windows
@@ -26,12 +33,39 @@ def _segment_pruned_path(output_dir: Path, seg: SegmentState) -> Path:
     return output_dir / "_parts" / f"{seg.segment_id}_pruned.json"
 
 
+def _segment_fragments_path(output_dir: Path, seg: SegmentState) -> Path:
+    return output_dir / "_parts" / f"{seg.segment_id}_fragments.json"
+
+
+def clear_fragment_manifests(output_dir: Path) -> int:
+    """
+    删除输出目录下所有分段的碎片合并清单（强制下次合并重新分组并重建/校验合并图）。
+    返回删除的文件数。
+    """
+    parts_dir = output_dir / "_parts"
+    if not parts_dir.exists():
+        return 0
+    removed = 0
+    for p in parts_dir.glob("*_fragments.json"):
+        try:
+            p.unlink()
+            removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+
 _PAGE_MARKER_RE = re.compile(r"(?=<!--\s*page\s*:\s*\d+\s*-->)", flags=re.IGNORECASE)
 _ABS_SCHEME_RE = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*:")
 _WIN_ABS_RE = re.compile(r"^[A-Za-z]:[\\\\/]")
 _HTML_IMG_SRC_RE = re.compile(r"(<img\b[^>]*?\bsrc\s*=\s*)([\"'])([^\"']+)(\2)", flags=re.IGNORECASE)
 _MD_IMAGE_RE = re.compile(r"(!\[[^\]]*]\()([^)]+)(\))")
 
+# MERGE_WORKERS=0（自动）时取 CPU 核数，但不超过该上限：每个子进程都要加载 Qt/QtPdf 并持有 PdfRenderCache
+# （最多 3 张整页渲染，单张可达约 35MB），约 100~150MB/进程，内存随进程数线性增长；多核机器需要更多进程时显式设置
+_AUTO_MERGE_WORKERS_CAP = 4
+
+
 def _safe_page_separator(config: AppConfig) -> str:
     sep = getattr(config, "page_separator", "")
     if sep is None:
@@ -200,7 +234,15 @@ def _join_segment_pages(*, pages: list[str], config: AppConfig) -> str:
     return sep.join(pages) if sep else "".join(pages)
 
 
-def _apply_image_fragment_merge_for_segment(*, config: AppConfig, output_dir: Path, seg: SegmentState, text: str) -> str:
+def _apply_image_fragment_merge_for_segment(
+    *,
+    config: AppConfig,
+    output_dir: Path,
+    seg: SegmentState,
+    text: str,
+    codec_stats: ImageCodecStats | None = None,
+    render_stats: RenderCacheStats | None = None,
+) -> str:
     if not bool(getattr(config, "merge_image_fragments", True)):
         return text or ""
     meta_path = _segment_pruned_path(output_dir, seg)
@@ -224,11 +266,55 @@ def _apply_image_fragment_merge_for_segment(*, config: AppConfig, output_dir: Pa
     if len(pages) < len(pages_meta):
         return text or ""
 
-    changed = False
     # 优先使用该分段自身的 PDF（最接近原 PDF 效果）
     pdf_path = resolve_path_maybe_windows(seg.part_path, base_dir=output_dir)
     parts_dir = output_dir / "_parts"
     assets_base_dir = parts_dir if ((parts_dir / "imgs").exists() or (parts_dir / "images").exists()) else output_dir
+    manifest = FragmentManifest(
+        _segment_fragments_path(output_dir, seg),
+        scope="_parts" if assets_base_dir == parts_dir else ".",
+    )
+    with PdfRenderCache() as render_cache:
+        changed = _merge_fragment_pages(
+            config=config,
+            pages=pages,
+            pages_meta=pages_meta,
+            assets_base_dir=assets_base_dir,
+            pdf_path=pdf_path if pdf_path.exists() else None,
+            render_cache=render_cache,
+            manifest=manifest,
+            codec_stats=codec_stats,
+        )
+    if render_stats is not None:
+        render_stats.add(render_cache.stats)
+    try:
+        manifest.save()
+    except Exception:
+        # 清单只是加速手段：写失败不影响合并结果
+        pass
+
+    if not changed:
+        return text or ""
+
+    # 若使用 meta 快照重建页面，则需要按当前配置重新拼接成 segment md（含页码/分隔符规则）。
+    if pages_from_meta is not None:
+        return _render_pages_markdown(pages=pages, start_page=int(seg.start_page), config=config)
+    return _join_segment_pages(pages=pages, config=config)
+
+
+def _merge_fragment_pages(
+    *,
+    config: AppConfig,
+    pages: list[str],
+    pages_meta: list,
+    assets_base_dir: Path,
+    pdf_path: Path | None,
+    render_cache: PdfRenderCache,
+    manifest: FragmentManifest | None = None,
+    codec_stats: ImageCodecStats | None = None,
+) -> bool:
+    """逐页做碎片图片合并（原地更新 pages），返回是否有页面变化。"""
+    changed = False
     for i, meta in enumerate(pages_meta):
         if i >= len(pages):
             break
@@ -252,20 +338,92 @@ def _apply_image_fragment_merge_for_segment(*, config: AppConfig, output_dir: Pa
             pruned_result=pruned,
             markdown_images=[str(x) for x in imgs if isinstance(x, (str, int, float))],
             page_no=page_no if page_no > 0 else (i + 1),
-            pdf_path=pdf_path if pdf_path.exists() else None,
+            pdf_path=pdf_path,
             pdf_page_index=i,
+            render_cache=render_cache,
+            manifest=manifest,
+            codec_stats=codec_stats,
         )
         if after != before:
             pages[i] = after
             changed = True
+    return changed
 
-    if not changed:
-        return text or ""
 
-    # 若使用 meta 快照重建页面，则需要按当前配置重新拼接成 segment md（含页码/分隔符规则）。
-    if pages_from_meta is not None:
-        return _render_pages_markdown(pages=pages, start_page=int(seg.start_page), config=config)
-    return _join_segment_pages(pages=pages, config=config)
+def _resolve_merge_workers(config: AppConfig) -> int:
+    n = int(config.merge_workers or 0)
+    if n <= 0:
+        n = min(_AUTO_MERGE_WORKERS_CAP, os.cpu_count() or 1)
+    return max(1, n)
+
+
+def _postprocess_segment(
+    config: AppConfig, output_dir: Path, seg: SegmentState
+) -> tuple[str | None, ImageCodecStats, RenderCacheStats]:
+    """
+    单个分段的合并后处理：碎片图片合并 + Markdown 图片样式，结果回写分段 md。
+    返回 (处理后的分段 Markdown, 合并图编码统计, PDF 渲染缓存统计)；分段 md 不存在时 Markdown 为 None。
+    注意：会被进程池调用，必须保持为模块级函数（参数/返回值需可 pickle）。
+    """
+    stats = ImageCodecStats()
+    render_stats = RenderCacheStats()
+    md_path = _segment_md_path(output_dir, seg)
+    if not md_path.exists():
+        return None, stats, render_stats
+    raw = md_path.read_text(encoding="utf-8")
+    merged = _apply_image_fragment_merge_for_segment(
+        config=config, output_dir=output_dir, seg=seg, text=raw, codec_stats=stats, render_stats=render_stats
+    )
+    styled = apply_markdown_image_width(merged, config)
+    if styled != raw:
+        atomic_write_text(md_path, styled, encoding="utf-8")
+    return styled, stats, render_stats
+
+
+def _postprocess_segments(
+    *,
+    config: AppConfig,
+    output_dir: Path,
+    segments: list[SegmentState],
+    log: Callable[[str], None],
+) -> list[str | None]:
+    """
+    按分段顺序返回后处理结果（与 segments 一一对应）。
+    碎片合并（区域抽取/聚类/Qt 裁剪或拼接/PNG 编码）是 CPU 密集且分段间互不依赖的，
+    多分段时分发到进程池并行处理；结果按原顺序拼回。进程池不可用时自动退回串行。
+    """
+    segs = list(segments or [])
+    workers = min(_resolve_merge_workers(config), len(segs))
+    results: list[tuple[str | None, ImageCodecStats, RenderCacheStats]]
+    # 未开启碎片合并时单分段只剩正则替换，进程启动开销反而更大
+    if workers <= 1 or not bool(getattr(config, "merge_image_fragments", True)):
+        results = [_postprocess_segment(config, output_dir, seg) for seg in segs]
+    else:
+        log(f"并行合并后处理：{len(segs)} 个分段，{workers} 个进程")
+        n = len(segs)
+        try:
+            # 用 spawn 而非 Linux 默认的 fork：父进程里有 Runner 工作线程、Qt 与 requests 连接池，
+            # fork 时若其它线程正持有锁（logging/ssl/Qt），子进程会死锁；打包环境下 freeze_support() 也按 spawn 处理子进程入口
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+                results = list(pool.map(_postprocess_segment, [config] * n, [output_dir] * n, segs))
+        except (BrokenProcessPool, OSError) as e:
+            # 分段后处理是幂等的（基于 pruned.json 的 pageMarkdown 快照），部分分段已写回也可安全重跑
+            log(f"进程池不可用，改为串行合并后处理：{e}")
+            results = [_postprocess_segment(config, output_dir, seg) for seg in segs]
+
+    total = ImageCodecStats()
+    render_total = RenderCacheStats()
+    for _text, stats, render_stats in results:
+        total.add(stats)
+        render_total.add(render_stats)
+    if render_total.documents_loaded:
+        log(f"PDF 裁剪渲染：{render_total.summary()}")
+    if total.files:
+        fmt = config.merged_image_format
+        log(f"合并图编码（{fmt}）：{total.summary()}")
+    return [text for text, _stats, _render_stats in results]
+
 
 def _failed_segment_placeholder(*, seg: SegmentState, config: AppConfig) -> str:
     start = int(seg.start_page)
@@ -294,12 +452,14 @@ def merge_best_effort(
     config: AppConfig,
     output_dir: Path,
     state: FileTaskState,
-    log: callable,
+    log: Callable[[str], None],
+    save: Callable[[Path, FileTaskState], object] = save_state,
 ) -> Path:
     """
     生成 best-effort 的 merged_result.md：
     - 分段成功：拼接真实 Markdown
     - 分段失败/缺失：拼接占位块，保证用户仍能拿到可读输出并定位缺页
+    save：写 task_state.json 的方式；多节点按分段认领时传入 SegmentClaims.save_state（持锁并合入其它节点进度）。
     """
     if not state.segments:
         raise RuntimeError("未发现分段结果")
@@ -324,17 +484,13 @@ def merge_best_effort(
             images=_prefix_images_to_parts(combined_images),
             max_retries=config.max_retries,
             log=log,
+            save=save,
         )
 
     parts: list[str] = []
-    for seg in state.segments:
-        md_path = _segment_md_path(output_dir, seg)
-        if md_path.exists():
-            raw = md_path.read_text(encoding="utf-8")
-            merged = _apply_image_fragment_merge_for_segment(config=config, output_dir=output_dir, seg=seg, text=raw)
-            styled = apply_markdown_image_width(merged, config)
-            if styled != raw:
-                atomic_write_text(md_path, styled, encoding="utf-8")
+    processed = _postprocess_segments(config=config, output_dir=output_dir, segments=state.segments, log=log)
+    for seg, styled in zip(state.segments, processed):
+        if styled is not None:
             parts.append(styled)
         else:
             parts.append(_failed_segment_placeholder(seg=seg, config=config))
@@ -346,7 +502,7 @@ def merge_best_effort(
     atomic_write_text(out_path, merged, encoding="utf-8")
 
     state.merged_md_done = all(s.done for s in state.segments)
-    save_state(output_dir, state)
+    save(output_dir, state)
     return out_path
 
 
@@ -355,7 +511,8 @@ def merge_and_materialize(
     config: AppConfig,
     output_dir: Path,
     state: FileTaskState,
-    log: callable,
+    log: Callable[[str], None],
+    save: Callable[[Path, FileTaskState], object] = save_state,
 ) -> Path:
     if not state.segments:
         raise RuntimeError("未发现分段结果")
@@ -383,20 +540,11 @@ def merge_and_materialize(
             images=_prefix_images_to_parts(combined_images),
             max_retries=config.max_retries,
             log=log,
+            save=save,
         )
 
-    parts: list[str] = []
-    for seg in state.segments:
-        md_path = _segment_md_path(output_dir, seg)
-        if not md_path.exists():
-            parts.append("")
-            continue
-        raw = md_path.read_text(encoding="utf-8")
-        merged = _apply_image_fragment_merge_for_segment(config=config, output_dir=output_dir, seg=seg, text=raw)
-        styled = apply_markdown_image_width(merged, config)
-        if styled != raw:
-            atomic_write_text(md_path, styled, encoding="utf-8")
-        parts.append(styled)
+    processed = _postprocess_segments(config=config, output_dir=output_dir, segments=state.segments, log=log)
+    parts: list[str] = [styled if styled is not None else "" for styled in processed]
 
     sep = _safe_page_separator(config)
     merged = sep.join([p for p in parts if p is not None])
@@ -405,5 +553,5 @@ def merge_and_materialize(
     atomic_write_text(out_path, merged, encoding="utf-8")
 
     state.merged_md_done = True
-    save_state(output_dir, state)
+    save(output_dir, state)
     return out_path
@@ -5,13 +5,18 @@ import json
 import re
 import threading
 import time
+from contextlib import nullcontext
 from pathlib import Path
 from typing import Callable
 
 from pabble_ocr.adapters.layout_parsing_client import LayoutParsingClient, build_layout_parsing_options
 from pabble_ocr.config import AppConfig
+from pabble_ocr.core.concurrency import RunLimits
+from pabble_ocr.core.control import CanceledError, RunControl
 from pabble_ocr.core.file_types import detect_file_type
 from pabble_ocr.core.models import FileTaskState, QueueItem, SegmentState
+from pabble_ocr.core.leases import SegmentClaims
+from pabble_ocr.core.metrics import MetricsBus, stage
 from pabble_ocr.core.state_store import save_state
 from pabble_ocr.md.postprocess import apply_markdown_image_width
 from pabble_ocr.pdf.splitter import ensure_pdf_segments
@@ -24,10 +29,6 @@ LogFn = Callable[[str], None]
 ProgressFn = Callable[[float, str], None]
 
 
-class CanceledError(RuntimeError):
-    pass
-
-
 def _ocr_options_hash(config: AppConfig, *, include_pdf_image_rerun_options: bool = False) -> str:
     meta = {
         "apiUrl": (config.api_url or "").strip() or None,
@@ -481,7 +482,22 @@ def process_queue_item(
     is_canceled: Callable[[], bool],
     log: LogFn,
     progress: ProgressFn,
-) -> None:
+    limits: RunLimits | None = None,
+    segment_budget: int = 0,
+    claims: SegmentClaims | None = None,
+    control: RunControl | None = None,
+    metrics: MetricsBus | None = None,
+) -> bool:
+    """
+    处理单个队列项（图片或 PDF 全部分段），完成后合并输出 merged_result.md。
+    limits：多文件并发时由 Runner 传入的共享上限（在途 API 请求数 / 同时合并数）；None 表示不限制。
+    segment_budget：本轮最多调用 API 的 PDF 分段数（0=不限）。用完且仍有未完成分段时保存状态并返回 False，
+    由调度器把该项放回队列、让其它任务先跑（下次调用从断点续跑）。全部完成返回 True。
+    claims：多节点按分段认领（CLUSTER_CLAIM=segment）时的认领上下文；其它节点处理中的分段跳过，
+    等待其它节点或合并被占用时同样返回 False（claims.waiting=True）。
+    control：Runner 传入的暂停/取消信号；提供时暂停不再轮询，取消会中断在途的 API 请求与图片下载。
+    metrics：Runner 传入的指标汇总；上报请求/下载/合并耗时与完成页数（None=不统计）。
+    """
     if is_canceled():
         raise CanceledError()
 
@@ -492,7 +508,16 @@ def process_queue_item(
     if ft == "unknown":
         raise RuntimeError("不支持的文件类型")
 
-    client = LayoutParsingClient(config)
+    client = LayoutParsingClient(config, limits=limits, control=control, metrics=metrics)
+
+    def wait_if_paused() -> None:
+        if control is not None:
+            control.wait_if_paused()
+        else:
+            _wait_if_paused(is_paused, is_canceled)
+    # 分段认领时写状态需合入其它节点的进度
+    _save = claims.save_state if claims is not None else save_state
+    merge_slot = limits.merge_slot if limits is not None else nullcontext
     ocr_hash = _ocr_options_hash(config)
     ocr_hash_legacy = _ocr_options_hash(config, include_pdf_image_rerun_options=True)
     opts = build_layout_parsing_options(config)
@@ -508,7 +533,7 @@ def process_queue_item(
                     part_path=str(item.input_path),
                 )
             ]
-            save_state(item.output_dir, state)
+            _save(item.output_dir, state)
 
         seg = state.segments[0]
         if seg.done:
@@ -518,22 +543,23 @@ def process_queue_item(
                 seg.last_error = None
                 seg.elapsed_s = None
                 state.merged_md_done = False
-                save_state(item.output_dir, state)
+                _save(item.output_dir, state)
             else:
                 # 允许“仅调整本地渲染/合并逻辑（例如 Markdown 图片宽度）”后重新生成 merged_result.md，
                 # 避免再次调用 OCR 接口。
                 progress(0.9, "已完成（跳过识别），重新合并输出（如需应用新的 OCR 参数，请删除输出目录内 task_state.json 后重跑）")
-                merge_and_materialize(config=config, output_dir=item.output_dir, state=state, log=log)
+                with stage(metrics, "merge"), merge_slot():
+                    merge_and_materialize(config=config, output_dir=item.output_dir, state=state, log=log, save=_save)
                 progress(1.0, "输出完成")
-                return
+                return True
 
-        _wait_if_paused(is_paused, is_canceled)
+        wait_if_paused()
         if is_canceled():
             raise CanceledError()
 
         seg.attempts += 1
         seg.ocr_options_hash = ocr_hash
-        save_state(item.output_dir, state)
+        _save(item.output_dir, state)
         _debug_dump_request_options(
             config=config,
             output_dir=item.output_dir,
@@ -553,7 +579,7 @@ def process_queue_item(
                 title="等待服务端响应（图片）",
             )
             seg.elapsed_s = time.time() - t0
-            save_state(item.output_dir, state)
+            _save(item.output_dir, state)
 
             pages: list[str] = []
             images: dict[str, str] = {}
@@ -591,31 +617,44 @@ def process_queue_item(
 
             if images:
                 log(f"下载图片：{len(images)} 个")
-                download_images(
-                    config=config,
-                    output_dir=item.output_dir,
-                    state=state,
-                    images=_prefix_images_to_parts(images),
-                    max_retries=config.max_retries,
-                    log=log,
-                )
+                with stage(metrics, "download"):
+                    download_images(
+                        config=config,
+                        output_dir=item.output_dir,
+                        state=state,
+                        images=_prefix_images_to_parts(images),
+                        max_retries=config.max_retries,
+                        log=log,
+                        save=_save,
+                        control=control,
+                        metrics=metrics,
+                    )
 
             seg.done = True
             seg.last_error = None
-            save_state(item.output_dir, state)
+            _save(item.output_dir, state)
+            if metrics is not None:
+                metrics.pages_done(item, 1)
             progress(0.9, "识别完成，开始合并与落盘图片")
 
-            merge_and_materialize(config=config, output_dir=item.output_dir, state=state, log=log)
+            with stage(metrics, "merge"), merge_slot():
+                merge_and_materialize(config=config, output_dir=item.output_dir, state=state, log=log, save=_save)
             progress(1.0, "输出完成")
-            return
+            return True
+        except CanceledError:
+            raise
         except Exception as e:
             seg.last_error = str(e)
-            save_state(item.output_dir, state)
+            _save(item.output_dir, state)
             raise
 
     if ft == "pdf":
         segments = ensure_pdf_segments(state=state, pdf_path=item.input_path, output_dir=item.output_dir, chunk_pages=config.pdf_chunk_pages)
-        save_state(item.output_dir, state)
+        _save(item.output_dir, state)
+        if claims is not None:
+            # 切分完成：释放文件租约，其它节点可以加入处理其余分段
+            claims.setup_done()
+        peer_held: set[str] = set()
         rerun_pages = _parse_page_spec(getattr(config, "pdf_image_ocr_pages", "") or "")
         rerun_segment_spec_raw = (getattr(config, "pdf_rerun_segments", "") or "").strip()
         rerun_segments: set[str] = set()
@@ -649,8 +688,12 @@ def process_queue_item(
             log(f"指定分段重打模式：命中分段={', '.join(matched_segment_ids)}")
 
         total = len(segments)
+        processed = 0
         for i, seg in enumerate(segments, start=1):
-            _wait_if_paused(is_paused, is_canceled)
+            if segment_budget > 0 and processed >= segment_budget and not seg.done:
+                progress((i - 1) / total, f"分段轮转：本轮已处理 {processed} 个分段，先让其它任务执行（{i - 1}/{total}）")
+                return False
+            wait_if_paused()
             if is_canceled():
                 raise CanceledError()
 
@@ -660,7 +703,7 @@ def process_queue_item(
                     if not seg.done and not (seg.last_error or "").strip():
                         if _segment_has_reusable_outputs(output_dir=item.output_dir, seg=seg):
                             seg.done = True
-                            save_state(item.output_dir, state)
+                            _save(item.output_dir, state)
                             progress(
                                 i / total,
                                 f"分段重打模式：沿用历史产物并跳过非目标分段 {i}/{total}（{seg.start_page}-{seg.end_page}）",
@@ -674,7 +717,7 @@ def process_queue_item(
                     seg.last_error = None
                     seg.elapsed_s = None
                     state.merged_md_done = False
-                    save_state(item.output_dir, state)
+                    _save(item.output_dir, state)
 
             matched_rerun = False
             if rerun_pages:
@@ -688,7 +731,7 @@ def process_queue_item(
                     if not seg.done and not (seg.last_error or "").strip():
                         if _segment_has_reusable_outputs(output_dir=item.output_dir, seg=seg):
                             seg.done = True
-                            save_state(item.output_dir, state)
+                            _save(item.output_dir, state)
                             progress(
                                 i / total,
                                 f"补漏模式：沿用历史产物并跳过未命中分段 {i}/{total}（{seg.start_page}-{seg.end_page}）",
@@ -704,14 +747,14 @@ def process_queue_item(
                     seg.last_error = None
                     seg.elapsed_s = None
                     state.merged_md_done = False
-                    save_state(item.output_dir, state)
+                    _save(item.output_dir, state)
                 elif not _is_ocr_hash_compatible(seg.ocr_options_hash, current_hash=ocr_hash, legacy_hash=ocr_hash_legacy):
                     log(f"检测到 OCR 参数变化：将重跑分段 {i}/{total}（{seg.start_page}-{seg.end_page}）。")
                     seg.done = False
                     seg.last_error = None
                     seg.elapsed_s = None
                     state.merged_md_done = False
-                    save_state(item.output_dir, state)
+                    _save(item.output_dir, state)
                 else:
                     # 允许“仅调整本地渲染/合并逻辑（例如 Markdown 图片尺寸）”后续跑：
                     # 不再调用 OCR，只对已落盘的分段 Markdown 做一次后处理（幂等），提升 Pandoc/EPUB 观感。
@@ -727,9 +770,20 @@ def process_queue_item(
                     progress(i / total, f"跳过已完成分段 {i}/{total}（如需应用新的 OCR 参数，请删除输出目录内 task_state.json 后重跑）")
                     continue
 
+            if claims is not None:
+                claimed = claims.claim_segment(seg, state)
+                if claimed == "held":
+                    peer_held.add(seg.segment_id)
+                    progress(i / total, f"分段由其它节点处理中，跳过 {i}/{total}（{seg.start_page}-{seg.end_page}）")
+                    continue
+                if claimed == "done":
+                    progress(i / total, f"分段已由其它节点完成 {i}/{total}（{seg.start_page}-{seg.end_page}）")
+                    continue
+
             seg.attempts += 1
             seg.ocr_options_hash = ocr_hash
-            save_state(item.output_dir, state)
+            processed += 1
+            _save(item.output_dir, state)
             _debug_dump_request_options(
                 config=config,
                 output_dir=item.output_dir,
@@ -753,7 +807,7 @@ def process_queue_item(
                     title=f"等待服务端响应（PDF 分段 {i}/{total}：{seg.start_page}-{seg.end_page}）",
                 )
                 seg.elapsed_s = time.time() - t0
-                save_state(item.output_dir, state)
+                _save(item.output_dir, state)
                 # PDF 偶发漏字补救：对指定页本地渲染为图片后重跑（仅对命中的页增加额外请求）。
                 if rerun_pages:
                     pages_list = list(result.pages or [])
@@ -787,7 +841,7 @@ def process_queue_item(
                             else:
                                 log(f"补漏失败：无法渲染 PDF 第 {matched_page_no} 页为图片（可能缺少 QtPdf 组件）")
                             continue
-                        _wait_if_paused(is_paused, is_canceled)
+                        wait_if_paused()
                         if is_canceled():
                             raise CanceledError()
                         if absolute_page_no is not None and matched_page_no == absolute_page_no and local_page_no != matched_page_no:
@@ -847,34 +901,64 @@ def process_queue_item(
 
                 if images:
                     log(f"下载图片：{len(images)} 个")
-                    download_images(
-                        config=config,
-                        output_dir=item.output_dir,
-                        state=state,
-                        images=_prefix_images_to_parts(images),
-                        max_retries=config.max_retries,
-                        log=log,
-                    )
+                    with stage(metrics, "download"):
+                        download_images(
+                            config=config,
+                            output_dir=item.output_dir,
+                            state=state,
+                            images=_prefix_images_to_parts(images),
+                            max_retries=config.max_retries,
+                            log=log,
+                            save=_save,
+                            control=control,
+                            metrics=metrics,
+                        )
 
                 seg.done = True
                 seg.last_error = None
-                save_state(item.output_dir, state)
+                _save(item.output_dir, state)
+                if metrics is not None:
+                    metrics.pages_done(item, seg.end_page - seg.start_page + 1)
+                if claims is not None:
+                    claims.release_segment(seg)
                 progress(i / total, f"分段完成 {i}/{total}（待合并/落盘图片）")
+            except CanceledError:
+                # 取消不算分段失败：保持未完成、不写失败占位，下次从该分段续跑
+                if claims is not None:
+                    claims.release_segment(seg)
+                raise
             except Exception as e:
                 seg.done = False
                 seg.last_error = str(e)
-                save_state(item.output_dir, state)
+                _save(item.output_dir, state)
                 try:
                     _write_failed_segment_placeholder(output_dir=item.output_dir, seg=seg, config=config)
                 except Exception:
                     pass
+                if claims is not None:
+                    claims.release_segment(seg)
                 progress(i / total, f"分段失败 {i}/{total}：{seg.last_error}")
                 continue
 
+        if claims is not None:
+            claims.sync(state)
+            if any(not s.done for s in segments if s.segment_id in peer_held):
+                claims.waiting = True
+                progress(processed / total if total else 0.0, "等待其它节点完成其余分段")
+                return False
+            if state.merged_md_done and all(s.done for s in segments):
+                progress(1.0, "已由其它节点合并输出")
+                return True
+            if not claims.claim_merge():
+                claims.waiting = True
+                progress(0.9, "其它节点正在合并输出，稍后确认结果")
+                return False
+
         any_failed = any(not s.done for s in segments)
         if any_failed:
             # 产出 best-effort 的 merged_result.md（失败分段会有占位块），方便立刻拿到可读输出并定位缺页
-            merge_best_effort(config=config, output_dir=item.output_dir, state=state, log=log)
+            with stage(metrics, "merge"), merge_slot():
+                merge_best_effort(config=config, output_dir=item.output_dir, state=state, log=log, save=_save)
             failed = [s for s in segments if not s.done]
             parts: list[str] = []
             for s in failed:
@@ -886,9 +970,10 @@ def process_queue_item(
             raise RuntimeError(f"存在失败分段（可稍后重试，已生成 merged_result.md 供定位）：{detail}")
 
         progress(0.9, "分段全部完成，开始合并与落盘图片")
-        merge_and_materialize(config=config, output_dir=item.output_dir, state=state, log=log)
+        with stage(metrics, "merge"), merge_slot():
+            merge_and_materialize(config=config, output_dir=item.output_dir, state=state, log=log, save=_save)
         progress(1.0, "输出完成")
-        return
+        return True
 
     raise RuntimeError("未知文件类型")
 
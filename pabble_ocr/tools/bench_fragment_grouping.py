@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from pabble_ocr.md import image_fragments
+from pabble_ocr.md.image_fragments import ImageRegion, _group_regions, _group_regions_pairwise
+
+
+def _grid_layout(n: int, rnd: random.Random) -> list[ImageRegion]:
+    """图标宫格：多个小图块排成若干独立的宫格图（块间留大间距）。"""
+    regions: list[ImageRegion] = []
+    per_block = 16
+    blocks = max(1, (n + per_block - 1) // per_block)
+    cols = max(1, int(blocks**0.5))
+    for k in range(n):
+        b = k // per_block
+        bx = (b % cols) * 2000.0
+        by = (b // cols) * 2000.0
+        i = k % per_block
+        x = bx + (i % 4) * 110.0 + rnd.uniform(-3, 3)
+        y = by + (i // 4) * 110.0 + rnd.uniform(-3, 3)
+        regions.append(ImageRegion(src=f"imgs/grid_{k}.png", bbox=(x, y, x + 100.0, y + 100.0)))
+    return regions
+
+
+def _scatter_layout(n: int, rnd: random.Random) -> list[ImageRegion]:
+    """地图类：小图块随机散布（少量相邻会被合并）。"""
+    side = 400.0 * max(1.0, n**0.5)
+    regions: list[ImageRegion] = []
+    for k in range(n):
+        x = rnd.uniform(0, side)
+        y = rnd.uniform(0, side)
+        w = rnd.uniform(20, 80)
+        h = rnd.uniform(20, 80)
+        regions.append(ImageRegion(src=f"imgs/scatter_{k}.png", bbox=(x, y, x + w, y + h)))
+    return regions
+
+
+_LAYOUTS = {"grid": _grid_layout, "scatter": _scatter_layout}
+
+
+def _time_ms(fn, regions: list[ImageRegion], repeat: int) -> tuple[float, list[list[ImageRegion]]]:
+    best = float("inf")
+    out: list[list[ImageRegion]] = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        out = fn(regions)
+        best = min(best, (time.perf_counter() - t0) * 1000.0)
+    return best, out
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="碎片图片分组（_group_regions）性能基准：空间索引/NumPy 内核 vs 全量两两比较")
+    parser.add_argument("--sizes", type=str, default="50,100,200,400,800,1600", help="区域数量列表（逗号分隔）")
+    parser.add_argument("--layout", choices=sorted(_LAYOUTS.keys()), default="grid", help="合成版面类型")
+    parser.add_argument("--repeat", type=int, default=3, help="每组重复次数（取最快）")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--skip-pairwise", action="store_true", help="不跑全量两两比较（大规模时很慢）")
+    args = parser.parse_args(argv)
+
+    rnd = random.Random(int(args.seed))
+    sizes = [int(x) for x in str(args.sizes).split(",") if x.strip()]
+    kernel = "numpy" if image_fragments._np is not None else "python"
+    print(f"layout={args.layout}, kernel={kernel}（区域数 >= {image_fragments._NUMPY_MIN_REGIONS} 时生效）")
+    print(f"{'regions':>8} {'indexed_ms':>11} {'ms/region':>10} {'pairwise_ms':>12} {'speedup':>8} {'groups':>7} same")
+    mismatches = 0
+    for n in sizes:
+        regions = _LAYOUTS[args.layout](n, rnd)
+        t_idx, g_idx = _time_ms(_group_regions, regions, int(args.repeat))
+        if args.skip_pairwise:
+            print(f"{n:>8} {t_idx:>11.2f} {t_idx / n:>10.4f} {'-':>12} {'-':>8} {len(g_idx):>7} -")
+            continue
+        t_all, g_all = _time_ms(_group_regions_pairwise, regions, 1)
+        same = [[r.src for r in g] for g in g_idx] == [[r.src for r in g] for g in g_all]
+        if not same:
+            mismatches += 1
+        speedup = t_all / t_idx if t_idx > 0 else float("inf")
+        print(f"{n:>8} {t_idx:>11.2f} {t_idx / n:>10.4f} {t_all:>12.2f} {speedup:>7.1f}x {len(g_idx):>7} {'yes' if same else 'NO'}")
+    return 0 if mismatches == 0 else 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
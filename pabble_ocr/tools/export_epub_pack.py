@@ -7,6 +7,7 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+from pabble_ocr.md.derivatives import DerivativeProfile, PROFILES, build_derivatives, get_profile
 from pabble_ocr.tools.check_markdown_assets import check_markdown_assets
 from pabble_ocr.utils.io import atomic_write_json, atomic_write_text
 from pabble_ocr.utils.paths import resolve_path_maybe_windows
@@ -74,7 +75,13 @@ def _prepare_out_dir(out_dir: Path, *, force: bool) -> None:
     out_dir.mkdir(parents=True, exist_ok=True)
 
 
-def _copy_assets(out_dir: Path, resolved_items: list[dict[str, str]]) -> tuple[int, list[str]]:
+def _copy_assets(
+    out_dir: Path,
+    resolved_items: list[dict[str, str]],
+    *,
+    substitutes: dict[str, str] | None = None,
+) -> tuple[int, list[str]]:
+    """substitutes: 源文件 -> 实际复制的文件（如派生图），路径保持原相对位置。"""
     copied = 0
     warnings: list[str] = []
     seen: set[str] = set()
@@ -96,7 +103,7 @@ def _copy_assets(out_dir: Path, resolved_items: list[dict[str, str]]) -> tuple[i
             continue
         dst = out_dir / rel
         dst.parent.mkdir(parents=True, exist_ok=True)
-        shutil.copy2(src, dst)
+        shutil.copy2((substitutes or {}).get(str(src)) or src, dst)
         copied += 1
 
     return copied, warnings
@@ -155,7 +162,51 @@ def _build_rewrite_map(post_result: dict[str, Any]) -> dict[str, str]:
     return out
 
 
-def _export_one(task_dir: Path, *, out_dir: Path, force: bool, rewrite_fallback: bool) -> int:
+def _build_substitutes(
+    task_dir: Path,
+    resolved_items: list[dict[str, str]],
+    *,
+    profile: DerivativeProfile | None,
+    jobs: int,
+) -> tuple[dict[str, str], dict[str, Any]]:
+    if profile is None:
+        return {}, {"profile": "none"}
+    sources = []
+    for item in resolved_items:
+        src = Path(item.get("hit_path") or "")
+        if str(src) and src.is_file():
+            sources.append(src)
+    result = build_derivatives(
+        sources,
+        cache_dir=task_dir / "_derivatives" / profile.name,
+        profile=profile,
+        workers=jobs,
+    )
+    print(f"derivatives[{profile.name}]: {result.summary()}")
+    info = {
+        "profile": profile.name,
+        "max_width": profile.max_width,
+        "max_height": profile.max_height,
+        "quality": profile.quality,
+        "resized": result.resized,
+        "cached": result.cached,
+        "original": result.original,
+        "failed": result.failed,
+        "bytes_source": result.bytes_source,
+        "bytes_output": result.bytes_output,
+    }
+    return result.chosen, info
+
+
+def _export_one(
+    task_dir: Path,
+    *,
+    out_dir: Path,
+    force: bool,
+    rewrite_fallback: bool,
+    profile: DerivativeProfile | None = None,
+    jobs: int = 0,
+) -> int:
     src_md = task_dir / "merged_result.md"
     if not src_md.exists() or not src_md.is_file():
         raise RuntimeError(f"缺少 merged_result.md：{src_md}")
@@ -168,7 +219,8 @@ def _export_one(task_dir: Path, *, out_dir: Path, force: bool, rewrite_fallback:
     shutil.copy2(src_md, dst_md)
 
     pre_result, pre_resolved_items = check_markdown_assets(src_md)
-    copied_assets, warnings = _copy_assets(out_dir, pre_resolved_items)
+    substitutes, derivatives_info = _build_substitutes(task_dir, pre_resolved_items, profile=profile, jobs=jobs)
+    copied_assets, warnings = _copy_assets(out_dir, pre_resolved_items, substitutes=substitutes)
 
     post_result, _ = check_markdown_assets(dst_md)
     rewrites: list[dict[str, Any]] = []
@@ -196,6 +248,7 @@ def _export_one(task_dir: Path, *, out_dir: Path, force: bool, rewrite_fallback:
         "rewrite_fallback_triggered": bool(fallback_triggered),
         "rewrites": rewrites,
         "copied_asset_files": copied_assets,
+        "derivatives": derivatives_info,
         "warnings": warnings,
         "pre_check": pre_result,
         "post_check": post_result,
@@ -228,6 +281,13 @@ def main(argv: list[str] | None = None) -> int:
         action="store_true",
         help="关闭导出后缺图时的最小路径改写兜底",
     )
+    parser.add_argument(
+        "--profile",
+        choices=sorted(PROFILES.keys()) + ["none"],
+        default="none",
+        help="图片派生规格：按目标端最大尺寸缩小并重新编码（缓存于 <task_dir>/_derivatives/）；默认 none=复制原图",
+    )
+    parser.add_argument("--jobs", type=int, default=0, help="生成派生图的并行进程数（0=自动=CPU 核数，最多 4）")
     args = parser.parse_args(argv)
 
     try:
@@ -238,6 +298,8 @@ def main(argv: list[str] | None = None) -> int:
             out_dir=out_dir,
             force=bool(args.force),
             rewrite_fallback=not bool(args.no_rewrite_fallback),
+            profile=get_profile(args.profile),
+            jobs=int(args.jobs),
         )
     except RuntimeError as e:
         print(f"[fail] {e}")
@@ -6,7 +6,7 @@ import re
 from pathlib import Path
 
 from pabble_ocr.config import AppConfig
-from pabble_ocr.md.image_fragments import merge_image_fragments_for_page
+from pabble_ocr.md.image_fragments import PdfRenderCache, merge_image_fragments_for_page
 from pabble_ocr.md.postprocess import apply_markdown_image_width
 from pabble_ocr.utils.paths import resolve_path_maybe_windows
 
@@ -117,30 +117,32 @@ def main(argv: list[str] | None = None) -> int:
     pages = _split_pages(original)
 
     changed = False
-    for i in range(len(pages)):
-        page_no = _page_no_of(pages[i], i + 1)
-        imgs = _extract_images_from_page(pages[i])
-        before = pages[i]
-        pdf_page_index = None
-        if pdf_path is not None:
-            if seg_start is not None:
-                pdf_page_index = page_no - seg_start
-            else:
-                pdf_page_index = i
-        after = merge_image_fragments_for_page(
-            config=cfg,
-            output_dir=base_dir,
-            page_markdown=before,
-            pruned_result=None,
-            markdown_images=imgs,
-            page_no=page_no,
-            pdf_path=pdf_path,
-            pdf_page_index=pdf_page_index,
-        )
-        after = apply_markdown_image_width(after, cfg)
-        if after != before:
-            pages[i] = after
-            changed = True
+    with PdfRenderCache() as render_cache:
+        for i in range(len(pages)):
+            page_no = _page_no_of(pages[i], i + 1)
+            imgs = _extract_images_from_page(pages[i])
+            before = pages[i]
+            pdf_page_index = None
+            if pdf_path is not None:
+                if seg_start is not None:
+                    pdf_page_index = page_no - seg_start
+                else:
+                    pdf_page_index = i
+            after = merge_image_fragments_for_page(
+                config=cfg,
+                output_dir=base_dir,
+                page_markdown=before,
+                pruned_result=None,
+                markdown_images=imgs,
+                page_no=page_no,
+                pdf_path=pdf_path,
+                pdf_page_index=pdf_page_index,
+                render_cache=render_cache,
+            )
+            after = apply_markdown_image_width(after, cfg)
+            if after != before:
+                pages[i] = after
+                changed = True
 
     out_text = "".join(pages)
     out_path = md_path if bool(args.inplace) else md_path.with_suffix(md_path.suffix + ".merged.md")
@@ -151,6 +153,8 @@ def main(argv: list[str] | None = None) -> int:
     else:
         print(f"已输出：{out_path}")
         print(f"合并图目录：{(base_dir / 'images' / 'merged')}")
+    if render_cache.stats.documents_loaded:
+        print(f"PDF 裁剪渲染：{render_cache.stats.summary()}")
     return 0
 
 
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
 import argparse
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import replace
 from pathlib import Path
+from typing import Callable, Iterator, Optional
 
 from pabble_ocr.config import AppConfig, load_config
 from pabble_ocr.core.state_store import load_state
-from pabble_ocr.md.merge import merge_and_materialize, merge_best_effort
+from pabble_ocr.md.merge import clear_fragment_manifests, merge_and_materialize, merge_best_effort
 from pabble_ocr.utils.io import atomic_write_text
 from pabble_ocr.utils.paths import resolve_path_maybe_windows
 
@@ -113,16 +118,95 @@ def _manual_merge_from_parts(*, config: AppConfig, task_dir: Path) -> Path:
     return out_path
 
 
-def _rebuild_one(*, config: AppConfig, task_dir: Path, strict: bool) -> Path:
+def _rebuild_one(*, config: AppConfig, task_dir: Path, strict: bool, log: Callable[[str], None] = print) -> Path:
     state = load_state(task_dir)
     if state and state.segments:
         done_all = all(bool(s.done) for s in state.segments)
         if strict or done_all:
-            return merge_and_materialize(config=config, output_dir=task_dir, state=state, log=print)
-        return merge_best_effort(config=config, output_dir=task_dir, state=state, log=print)
+            return merge_and_materialize(config=config, output_dir=task_dir, state=state, log=log)
+        return merge_best_effort(config=config, output_dir=task_dir, state=state, log=log)
     return _manual_merge_from_parts(config=config, task_dir=task_dir)
 
 
+def _rebuild_task(
+    config: AppConfig,
+    task_dir: Path,
+    strict: bool,
+    refresh_fragments: bool,
+    log: Optional[Callable[[str], None]] = None,
+) -> tuple[str, Optional[str], list[str]]:
+    """
+    重建单个输出目录，返回 (merged_result.md 路径, 失败原因或 None, 日志行)。
+    未给出 log 时日志先收集再返回，由主进程按目录顺序输出（进程池中多个目录的日志不会交错）。
+    注意：会被进程池调用，必须保持为模块级函数（参数/返回值需可 pickle）。
+    """
+    lines: list[str] = []
+    emit = log if log is not None else lines.append
+    try:
+        if refresh_fragments:
+            n = clear_fragment_manifests(task_dir)
+            if n:
+                emit(f"[refresh] {task_dir}: 已清除 {n} 个碎片合并清单")
+        out = _rebuild_one(config=config, task_dir=task_dir, strict=strict, log=emit)
+        return str(out), None, lines
+    except Exception as e:
+        return "", str(e), lines
+
+
+def _rebuild_all(
+    task_dirs: list[Path],
+    *,
+    config: AppConfig,
+    jobs: int,
+    strict: bool,
+    refresh_fragments: bool,
+) -> Iterator[tuple[str, Optional[str], list[str]]]:
+    """
+    按 task_dirs 顺序逐个产出重建结果。jobs>1 时各目录分发到进程池并行重建，
+    但仍按原顺序输出（前面的目录未完成时，后面已完成的结果先缓存）。进程池不可用时退回串行。
+    """
+    if jobs <= 1 or len(task_dirs) <= 1:
+        for d in task_dirs:
+            yield _rebuild_task(config, d, strict, refresh_fragments, log=print)
+        return
+
+    # 目录级并行时目录内的合并后处理改为串行（MERGE_WORKERS=1），避免进程池嵌套使进程数成倍增长
+    worker_config = replace(config, merge_workers=1)
+    print(f"并行重建：{len(task_dirs)} 个目录，{jobs} 个进程")
+    done = 0
+    try:
+        pool = ProcessPoolExecutor(max_workers=min(jobs, len(task_dirs)))
+    except OSError as e:
+        print(f"进程池不可用，改为串行重建：{e}")
+    else:
+        try:
+            futures = [pool.submit(_rebuild_task, worker_config, d, strict, refresh_fragments) for d in task_dirs]
+            for fut in futures:
+                yield fut.result()
+                done += 1
+        except BrokenProcessPool as e:
+            # 重建是幂等的（已写回的分段可安全重跑），剩余目录在本进程内串行完成
+            print(f"进程池异常退出，剩余 {len(task_dirs) - done} 个目录改为串行重建：{e}")
+        finally:
+            # 正常结束时已全部完成；中断（Ctrl+C）时不再等待排队中的目录
+            pool.shutdown(wait=True, cancel_futures=True)
+    for d in task_dirs[done:]:
+        yield _rebuild_task(config, d, strict, refresh_fragments, log=print)
+
+
+def _parse_jobs(value: str) -> int:
+    v = (value or "").strip().lower()
+    if v == "auto":
+        return max(1, os.cpu_count() or 1)
+    try:
+        n = int(v)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"应为正整数或 auto：{value!r}") from None
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"应为正整数或 auto：{value!r}")
+    return n
+
+
 def main(argv: list[str] | None = None) -> int:
     parser = argparse.ArgumentParser(description="离线重建 merged_result.md（不重跑 OCR）")
     parser.add_argument(
@@ -134,7 +218,18 @@ def main(argv: list[str] | None = None) -> int:
     parser.add_argument("--force", action="store_true", help="即使 merged_result.md 已存在也强制重建")
     parser.add_argument("--stale", action="store_true", help="当 merged_result.md 早于任一 _parts/*.md 时重建")
     parser.add_argument("--strict", action="store_true", help="严格模式：仅当全部分段完成时合并（否则报错）")
+    parser.add_argument(
+        "--refresh-fragments",
+        action="store_true",
+        help="丢弃碎片图片合并清单（_parts/*_fragments.json），重新分组并校验/重建合并图（隐含 --force）",
+    )
     parser.add_argument("--dry-run", action="store_true", help="只打印将要处理的目录，不实际写文件")
+    parser.add_argument(
+        "--jobs",
+        type=_parse_jobs,
+        default="1",
+        help="并行重建的进程数（配合 --recursive；auto=CPU 核数，默认 1=串行）；并行时目录内合并改为串行，输出仍按目录顺序",
+    )
     args = parser.parse_args(argv)
 
     root = resolve_path_maybe_windows(args.path)
@@ -151,11 +246,24 @@ def main(argv: list[str] | None = None) -> int:
     total = 0
     rebuilt = 0
     skipped = 0
-    failed = 0
+    failures: list[tuple[Path, str]] = []
+
+    todo: list[Path] = []
+    for d in task_dirs:
+        if _should_rebuild(d, force=bool(args.force or args.refresh_fragments), stale=bool(args.stale)):
+            todo.append(d)
+    results = _rebuild_all(
+        [] if args.dry_run else todo,
+        config=config,
+        jobs=int(args.jobs),
+        strict=bool(args.strict),
+        refresh_fragments=bool(args.refresh_fragments),
+    )
+    pending = set(todo)
 
     for d in task_dirs:
         total += 1
-        if not _should_rebuild(d, force=bool(args.force), stale=bool(args.stale)):
+        if d not in pending:
             skipped += 1
             print(f"[skip] {d}")
             continue
@@ -163,16 +271,22 @@ def main(argv: list[str] | None = None) -> int:
             rebuilt += 1
             print(f"[plan] {d}")
             continue
-        try:
-            out = _rebuild_one(config=config, task_dir=d, strict=bool(args.strict))
+        out, err, lines = next(results)
+        for line in lines:
+            print(line)
+        if err is None:
             rebuilt += 1
             print(f"[ok] {out}")
-        except Exception as e:
-            failed += 1
-            print(f"[fail] {d}: {e}")
-
-    print(f"done. total={total}, rebuilt={rebuilt}, skipped={skipped}, failed={failed}")
-    return 0 if failed == 0 else 2
+        else:
+            failures.append((d, err))
+            print(f"[fail] {d}: {err}")
+
+    print(f"done. total={total}, rebuilt={rebuilt}, skipped={skipped}, failed={len(failures)}")
+    if failures:
+        print("失败的目录：")
+        for d, err in failures:
+            print(f"  {d}: {err}")
+    return 0 if not failures else 2
 
 
 if __name__ == "__main__":
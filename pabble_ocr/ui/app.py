@@ -1,15 +1,28 @@
 from __future__ import annotations
 
 import sys
+from typing import TYPE_CHECKING, Optional
 
+from PySide6.QtCore import QTimer
 from PySide6.QtWidgets import QApplication
 
-from pabble_ocr.ui.main_window import MainWindow
+if TYPE_CHECKING:
+    from pabble_ocr.utils.startup_profile import StartupProfile
 
 
-def run_app() -> int:
+def run_app(*, profile: Optional[StartupProfile] = None) -> int:
+    if profile is not None:
+        profile.mark("Qt 已导入")
     app = QApplication(sys.argv)
+    from pabble_ocr.ui.main_window import MainWindow
+
+    if profile is not None:
+        profile.mark("主窗口模块已导入")
     w = MainWindow()
+    if profile is not None:
+        profile.mark("主窗口已创建")
     w.show()
+    if profile is not None:
+        # 事件循环处理完首批事件（首帧绘制）后再出报告
+        QTimer.singleShot(0, profile.finish)
     return app.exec()
-
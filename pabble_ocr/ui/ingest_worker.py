@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Event
+
+from PySide6.QtCore import QObject, QThread, Signal
+
+from pabble_ocr.core.ingest import iter_queue_batches
+
+
+logger = logging.getLogger(__name__)
+
+
+class IngestWorker(QObject):
+    """后台导入：遍历拖入的文件/文件夹并分批建队列项，界面线程只负责接收批次。"""
+
+    batch = Signal(object)  # QueueBuildResult
+    counted = Signal(int, int)  # 已入队数, 已跳过数
+    finished = Signal()
+
+    def __init__(self, paths: list[Path], output_root: Path, *, use_index: bool = True) -> None:
+        super().__init__()
+        self._paths = list(paths)
+        self._output_root = output_root
+        self._use_index = use_index
+        self._cancel = Event()
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    @property
+    def canceled(self) -> bool:
+        return self._cancel.is_set()
+
+    def start(self) -> None:
+        found = 0
+        skipped = 0
+        try:
+            for result in iter_queue_batches(
+                self._paths,
+                self._output_root,
+                use_index=self._use_index,
+                is_canceled=self._cancel.is_set,
+            ):
+                found += len(result.items)
+                skipped += len(result.skipped)
+                self.batch.emit(result)
+                self.counted.emit(found, skipped)
+                if self._cancel.is_set():
+                    break
+        except Exception:
+            logger.exception("导入失败：%s", self._paths)
+        finally:
+            self.finished.emit()
+
+
+@dataclass
+class IngestHandle:
+    thread: QThread
+    worker: IngestWorker
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from collections import deque
+from threading import Lock
+
+from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import QPlainTextEdit
+
+
+# 界面日志的刷新间隔：这段时间内到达的日志合并为一次追加
+LOG_FLUSH_MS = 200
+
+
+class LogBuffer:
+    """
+    线程安全的日志环形缓冲：worker 线程直接 push，界面线程定时 drain。
+    两次 drain 之间到达的行数超过容量时丢弃最旧的行，并记下丢弃数（完整内容在日志文件里）。
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self._lock = Lock()
+        self._lines: deque[str] = deque(maxlen=max(1, int(capacity)))
+        self._dropped = 0
+
+    def push(self, line: str) -> None:
+        with self._lock:
+            if len(self._lines) == self._lines.maxlen:
+                self._dropped += 1
+            self._lines.append(line)
+
+    def resize(self, capacity: int) -> None:
+        with self._lock:
+            self._lines = deque(self._lines, maxlen=max(1, int(capacity)))
+
+    def drain(self) -> tuple[list[str], int]:
+        with self._lock:
+            lines = list(self._lines)
+            dropped = self._dropped
+            self._lines.clear()
+            self._dropped = 0
+        return lines, dropped
+
+
+class LogView(QPlainTextEdit):
+    """
+    主窗口日志区：纯文本、只追加，最多保留 max_lines 行（超出时 Qt 从头部整块删除，不重排整篇文档）。
+    - append_line() 可在任意线程调用，只写入缓冲；每 LOG_FLUSH_MS 毫秒在界面线程合并追加一次
+    - 滚动条在底部时跟随最新日志；用户向上翻看时不打断
+    """
+
+    def __init__(self, *, max_lines: int = 5000, parent=None) -> None:
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setUndoRedoEnabled(False)
+        # 不自动换行：长行不触发逐行重新排版
+        self.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        self.setMaximumBlockCount(max(1, int(max_lines)))
+        self._buffer = LogBuffer(self.maximumBlockCount())
+        self._timer = QTimer(self)
+        self._timer.setInterval(LOG_FLUSH_MS)
+        self._timer.timeout.connect(self.flush)
+        self._timer.start()
+
+    def set_max_lines(self, max_lines: int) -> None:
+        self.setMaximumBlockCount(max(1, int(max_lines)))
+        self._buffer.resize(self.maximumBlockCount())
+
+    def append_line(self, msg: str) -> None:
+        self._buffer.push(msg)
+
+    def flush(self) -> None:
+        lines, dropped = self._buffer.drain()
+        if not lines:
+            return
+        if dropped:
+            lines.insert(0, f"……省略 {dropped} 行（完整日志见日志文件）")
+        bar = self.verticalScrollBar()
+        follow = bar.value() >= bar.maximum() - 2
+        self.appendPlainText("\n".join(lines))
+        if follow:
+            bar.setValue(bar.maximum())
@@ -1,20 +1,22 @@
 from __future__ import annotations
 
 import shutil
+import time
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from PySide6.QtCore import Qt, QUrl
+from PySide6.QtCore import Qt, QTimer, QUrl
 from PySide6.QtGui import QAction
 from PySide6.QtWidgets import (
+    QAbstractItemView,
+    QComboBox,
     QFileDialog,
     QHBoxLayout,
     QLabel,
     QMainWindow,
     QMessageBox,
     QPushButton,
-    QTableWidget,
-    QTableWidgetItem,
-    QTextEdit,
+    QTableView,
     QVBoxLayout,
     QWidget,
 )
@@ -23,12 +25,25 @@ from PySide6.QtCore import QThread
 
 from pabble_ocr.config import AppConfig, load_config, save_config
 from pabble_ocr.core.models import QueueItem
-from pabble_ocr.core.queue_manager import build_queue_items
-from pabble_ocr.core.queue_store import load_queue, save_queue
+from pabble_ocr.core.queue_store import QueueStore
 from pabble_ocr.utils.logging_utils import setup_logging
-from pabble_ocr.ui.settings_dialog import SettingsDialog
+from pabble_ocr.ui.log_view import LogView
+from pabble_ocr.ui.metrics_panel import MetricsPanel
+from pabble_ocr.ui.queue_model import QueueTableModel
+from pabble_ocr.ui.update_buffer import ItemUpdateBuffer
 from pabble_ocr.ui.worker import Worker, WorkerHandle
 
+if TYPE_CHECKING:
+    # 导入目录/设置对话框用到时才加载（见 _add_paths / _open_settings）
+    from pabble_ocr.ui.ingest_worker import IngestHandle
+
+
+# 进度刷新间隔（界面按此频率合并刷新有变化的行）与队列持久化间隔（毫秒）
+ITEM_REFRESH_MS = 100
+QUEUE_PERSIST_MS = 1000
+# 单次刷新最多占用界面线程的时间（秒）
+ITEM_REFRESH_BUDGET_S = 0.03
+
 
 class DropLabel(QLabel):
     def __init__(self, text: str, on_drop, parent=None) -> None:
@@ -56,14 +71,32 @@ class MainWindow(QMainWindow):
 
         self._config: AppConfig = load_config()
         self._config.ensure_dirs()
-        setup_logging(Path(self._config.output_dir) / "_logs")
+        self._log_path = setup_logging(Path(self._config.output_dir) / "_logs")
 
-        self._items: list[QueueItem] = load_queue()
+        self._store = QueueStore()
+        # 队列以 queue.db 原始行填充表格模型，用到某一项时才构造 QueueItem（大队列秒开）
+        self._model = QueueTableModel(self)
+        self._model.set_records(self._store.load_records())
         self._worker_handle: WorkerHandle | None = None
+        self._ingest_handle: IngestHandle | None = None
+        self._ingest_counts = (0, 0)
+        # 导入中产生、但运行中的队列尚未接收（worker 线程刚启动）的队列项，稍后重试提交
+        self._unsubmitted: list[QueueItem] = []
+        self._updates = ItemUpdateBuffer()
+        # 已刷新到界面、尚未写入 queue.db 的队列项
+        self._dirty: dict[int, QueueItem] = {}
 
         self._build_ui()
         self._build_menu()
-        self._refresh_table()
+
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setInterval(ITEM_REFRESH_MS)
+        self._refresh_timer.timeout.connect(lambda: self._flush_item_updates(ITEM_REFRESH_BUDGET_S))
+        self._refresh_timer.start()
+        self._persist_timer = QTimer(self)
+        self._persist_timer.setInterval(QUEUE_PERSIST_MS)
+        self._persist_timer.timeout.connect(self._persist_dirty)
+        self._persist_timer.start()
 
     def _build_menu(self) -> None:
         settings_action = QAction("设置", self)
@@ -73,15 +106,27 @@ class MainWindow(QMainWindow):
     def _build_ui(self) -> None:
         self.drop = DropLabel("拖拽 PDF/图片/文件夹到这里导入", self._add_paths)
 
-        self.table = QTableWidget(0, 4)
-        self.table.setHorizontalHeaderLabels(["文件", "状态", "进度", "信息"])
+        self.table = QTableView()
+        self.table.setModel(self._model)
         self.table.horizontalHeader().setStretchLastSection(True)
-        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
-
-        self.log = QTextEdit()
-        self.log.setReadOnly(True)
+        self.table.verticalHeader().setDefaultSectionSize(self.table.fontMetrics().height() + 8)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        # 初始不排序（按队列顺序显示）；点击表头排序
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        self.table.setSortingEnabled(True)
+
+        self.status_filter = QComboBox()
+        self.status_filter.addItem("全部状态", "")
+        for status in ("queued", "running", "paused", "completed", "failed", "canceled"):
+            self.status_filter.addItem(status, status)
+        self.status_filter.currentIndexChanged.connect(
+            lambda _: self._model.set_status_filter(str(self.status_filter.currentData() or ""))
+        )
+
+        self.log = LogView(max_lines=int(self._config.log_view_lines or 5000))
         self.log.setMaximumHeight(220)
+        self.metrics_panel = MetricsPanel()
 
         btn_add_files = QPushButton("添加文件")
         btn_add_files.clicked.connect(self._pick_files)
@@ -91,6 +136,10 @@ class MainWindow(QMainWindow):
         btn_remove.clicked.connect(self._remove_selected)
         btn_clear = QPushButton("清空")
         btn_clear.clicked.connect(self._clear)
+        self.ingest_label = QLabel("")
+        self.btn_cancel_ingest = QPushButton("停止导入")
+        self.btn_cancel_ingest.clicked.connect(self._cancel_ingest)
+        self.btn_cancel_ingest.setVisible(False)
 
         btn_start = QPushButton("开始")
         btn_start.clicked.connect(self._start)
@@ -109,10 +158,14 @@ class MainWindow(QMainWindow):
         btn_open_out.clicked.connect(self._open_output_root)
         btn_open_md = QPushButton("打开 merged_result.md")
         btn_open_md.clicked.connect(self._open_selected_md)
+        btn_open_log = QPushButton("完整日志")
+        btn_open_log.clicked.connect(self._open_log_file)
 
         row1 = QHBoxLayout()
         for b in (btn_add_files, btn_add_folder, btn_remove, btn_clear):
             row1.addWidget(b)
+        row1.addWidget(self.ingest_label)
+        row1.addWidget(self.btn_cancel_ingest)
         row1.addStretch(1)
         for b in (btn_open_out, btn_open_md):
             row1.addWidget(b)
@@ -121,13 +174,20 @@ class MainWindow(QMainWindow):
         for b in (btn_start, btn_pause, btn_resume, btn_cancel, btn_retry, btn_restart):
             row2.addWidget(b)
         row2.addStretch(1)
+        row2.addWidget(QLabel("筛选"))
+        row2.addWidget(self.status_filter)
 
         root = QVBoxLayout()
         root.addWidget(self.drop)
         root.addLayout(row1)
         root.addLayout(row2)
         root.addWidget(self.table, 1)
-        root.addWidget(QLabel("日志"))
+        root.addWidget(self.metrics_panel)
+        log_header = QHBoxLayout()
+        log_header.addWidget(QLabel("日志"))
+        log_header.addStretch(1)
+        log_header.addWidget(btn_open_log)
+        root.addLayout(log_header)
         root.addWidget(self.log)
 
         w = QWidget()
@@ -135,11 +195,22 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(w)
 
     def _append_log(self, msg: str) -> None:
-        self.log.append(msg)
+        self.log.append_line(msg)
+
+    def _open_log_file(self) -> None:
+        # 界面只保留最近的日志；完整内容（含各任务的逐行日志）在当天的日志文件里
+        self.log.flush()
+        if not self._log_path.exists():
+            QMessageBox.information(self, "提示", f"日志文件不存在：{self._log_path}")
+            return
+        QDesktopServices.openUrl(QUrl.fromLocalFile(str(self._log_path)))
 
     def _is_running(self) -> bool:
         return self._worker_handle is not None
 
+    def _is_ingesting(self) -> bool:
+        return self._ingest_handle is not None
+
     def _pick_files(self) -> None:
         files, _ = QFileDialog.getOpenFileNames(self, "选择文件", "", "Files (*.pdf *.png *.jpg *.jpeg *.bmp *.webp *.tif *.tiff)")
         self._add_paths([Path(f) for f in files])
@@ -149,66 +220,112 @@ class MainWindow(QMainWindow):
         if folder:
             self._add_paths([Path(folder)])
 
-    def _collect_files(self, paths: list[Path]) -> list[Path]:
-        out: list[Path] = []
-        for p in paths:
-            if p.is_dir():
-                for child in sorted(p.rglob("*"), key=lambda x: str(x).lower()):
-                    if child.is_file():
-                        out.append(child)
-            elif p.is_file():
-                out.append(p)
-        return out
-
     def _add_paths(self, paths: list[Path]) -> None:
-        if self._is_running():
-            QMessageBox.warning(self, "提示", "任务运行中，无法修改队列")
+        if not paths:
+            return
+        if self._is_ingesting():
+            QMessageBox.information(self, "提示", "正在导入，请等待完成或先停止导入")
+            return
+
+        from pabble_ocr.core.leases import normalize_claim_mode
+        from pabble_ocr.ui.ingest_worker import IngestHandle, IngestWorker
+
+        # 遍历目录与分配输出目录在后台线程进行；运行中导入的文件直接追加到正在处理的队列
+        # 多节点共享输出根目录时不在（可能是网络盘的）输出目录里维护 SQLite 索引
+        cluster = normalize_claim_mode(self._config.cluster_claim) != "off"
+        thread = QThread(self)
+        worker = IngestWorker(paths, Path(self._config.output_dir), use_index=not cluster)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.start)
+        worker.batch.connect(self._on_ingest_batch)
+        worker.counted.connect(self._on_ingest_counted)
+        worker.finished.connect(self._on_ingest_finished)
+        worker.finished.connect(thread.quit)
+        worker.finished.connect(worker.deleteLater)
+        thread.finished.connect(thread.deleteLater)
+
+        self._ingest_handle = IngestHandle(thread=thread, worker=worker)
+        self._ingest_counts = (0, 0)
+        self.ingest_label.setText("正在导入…")
+        self.btn_cancel_ingest.setVisible(True)
+        thread.start()
+
+    def _cancel_ingest(self) -> None:
+        if self._ingest_handle:
+            self._ingest_handle.worker.cancel()
+
+    def _on_ingest_batch(self, result) -> None:
+        if not result.items:
             return
+        self._store.add(result.items)
+        self._model.append_items(result.items)
+        if self._worker_handle:
+            self._unsubmitted.extend(result.items)
+            self._submit_pending()
 
-        files = self._collect_files(paths)
-        result = build_queue_items(files, Path(self._config.output_dir))
-        if result.skipped:
-            self._append_log(f"跳过不支持/不可读文件：{len(result.skipped)} 个")
-        self._items.extend(result.items)
-        save_queue(self._items)
-        self._refresh_table()
+    def _submit_pending(self) -> None:
+        if not self._worker_handle:
+            # 运行已结束：留给 _on_finished 接着处理，不在这里丢弃
+            return
+        worker = self._worker_handle.worker
+        self._unsubmitted = [it for it in self._unsubmitted if not worker.submit(it)]
+        if self._unsubmitted:
+            QTimer.singleShot(200, self._submit_pending)
+
+    def _on_ingest_counted(self, found: int, skipped: int) -> None:
+        self._ingest_counts = (found, skipped)
+        self.ingest_label.setText(f"正在导入：已入队 {found} 个，跳过 {skipped} 个")
+
+    def _on_ingest_finished(self) -> None:
+        found, skipped = self._ingest_counts
+        canceled = bool(self._ingest_handle and self._ingest_handle.worker.canceled)
+        self._ingest_handle = None
+        self.ingest_label.setText("")
+        self.btn_cancel_ingest.setVisible(False)
+        self._append_log(f"{'导入已停止' if canceled else '导入完成'}：入队 {found} 个")
+        if skipped:
+            self._append_log(f"跳过不支持/不可读文件：{skipped} 个")
 
     def _remove_selected(self) -> None:
         if self._is_running():
             QMessageBox.warning(self, "提示", "任务运行中，无法修改队列")
             return
-        rows = sorted({r.row() for r in self.table.selectedIndexes()}, reverse=True)
-        for r in rows:
-            if 0 <= r < len(self._items):
-                self._items.pop(r)
-        save_queue(self._items)
-        self._refresh_table()
+        removed = self._model.remove_rows(self._selected_rows())
+        self._store.remove(removed)
+        self._forget_outputs([it.output_dir for it in removed])
 
     def _clear(self) -> None:
         if self._is_running():
             QMessageBox.warning(self, "提示", "任务运行中，无法修改队列")
             return
-        self._items = []
-        save_queue(self._items)
-        self._refresh_table()
+        dirs = self._model.output_dirs()
+        self._model.clear()
+        self._store.clear()
+        self._forget_outputs(dirs)
+
+    def _forget_outputs(self, output_dirs: list[Path]) -> None:
+        # 从未开始处理的队列项不再占用输出目录名（输出目录索引中删除其登记）
+        from pabble_ocr.core.queue_manager import forget_unused_outputs
+
+        forget_unused_outputs(output_dirs)
 
     def _retry_failed(self) -> None:
         if self._is_running():
             QMessageBox.warning(self, "提示", "任务运行中，无法重置状态")
             return
-        for it in self._items:
-            if it.status == "failed":
-                it.status = "queued"
-                it.progress = 0.0
-                it.error = None
-                it.message = ""
-        save_queue(self._items)
-        self._refresh_table()
+        changed = self._model.items_with_status(["failed"])
+        for it in changed:
+            it.status = "queued"
+            it.progress = 0.0
+            it.error = None
+            it.message = ""
+            self._model.item_changed(it)
+        self._store.update_many(changed)
 
     def _start(self) -> None:
         if self._is_running():
             return
-        if not self._items:
+        if self._model.rowCount() == 0:
             QMessageBox.information(self, "提示", "请先导入文件")
             return
         if not self._config.api_url or not self._config.token:
@@ -216,17 +333,23 @@ class MainWindow(QMainWindow):
             return
 
         thread = QThread(self)
-        worker = Worker(self._config, self._items)
+        # 传入副本：导入中新增的队列项经 submit() 追加，避免与调度器初始快照重复
+        worker = Worker(
+            self._config,
+            self._model.items(),
+            keep_alive=self._is_ingesting,
+            log_sink=self.log.append_line,
+            item_sink=self._updates.push,
+        )
         worker.moveToThread(thread)
         thread.started.connect(worker.start)
-        worker.log.connect(self._append_log)
-        worker.item_updated.connect(self._on_item_updated)
         worker.finished.connect(self._on_finished)
         worker.finished.connect(thread.quit)
         worker.finished.connect(worker.deleteLater)
         thread.finished.connect(thread.deleteLater)
 
         self._worker_handle = WorkerHandle(thread=thread, worker=worker)
+        self.metrics_panel.attach(worker.metrics_snapshot)
         thread.start()
 
     def _pause(self) -> None:
@@ -241,30 +364,38 @@ class MainWindow(QMainWindow):
         if self._worker_handle:
             self._worker_handle.worker.cancel_current()
 
-    def _on_item_updated(self, item: QueueItem) -> None:
-        for idx, it in enumerate(self._items):
-            if str(it.input_path) == str(item.input_path) and str(it.output_dir) == str(item.output_dir):
-                self._items[idx] = item
-                self._update_row(idx, item)
-                save_queue(self._items)
-                break
+    def _flush_item_updates(self, budget_s: float | None = None) -> None:
+        # 每 ITEM_REFRESH_MS 毫秒刷新一次有变化的行；持久化另由 _persist_dirty 批量进行
+        # 给出 budget_s 时超时即停，剩余的行放回缓冲留到下一轮，单次刷新不会卡住界面
+        items = self._updates.drain()
+        deadline = time.monotonic() + budget_s if budget_s is not None else None
+        for n, item in enumerate(items):
+            if deadline is not None and n % 64 == 0 and time.monotonic() > deadline:
+                for rest in items[n:]:
+                    self._updates.push(rest)
+                return
+            if self._model.item_changed(item):
+                self._dirty[id(item)] = item
+
+    def _persist_dirty(self) -> None:
+        if not self._dirty:
+            return
+        items = list(self._dirty.values())
+        self._dirty.clear()
+        self._store.update_many(items)
 
     def _on_finished(self) -> None:
+        self._flush_item_updates()
+        self._persist_dirty()
+        self.metrics_panel.detach()
         self._append_log("队列处理结束")
         self._worker_handle = None
-        save_queue(self._items)
-
-    def _refresh_table(self) -> None:
-        self.table.setRowCount(len(self._items))
-        for i, it in enumerate(self._items):
-            self._update_row(i, it)
-
-    def _update_row(self, row: int, it: QueueItem) -> None:
-        self.table.setItem(row, 0, QTableWidgetItem(it.input_path.name))
-        self.table.setItem(row, 1, QTableWidgetItem(it.status))
-        self.table.setItem(row, 2, QTableWidgetItem(f"{int(it.progress * 100)}%"))
-        msg = it.message or (it.error or "")
-        self.table.setItem(row, 3, QTableWidgetItem(msg))
+        # 运行收尾时才到达的导入批次没能追加进调度器：仍在排队的接着开一轮，不留在“排队中”
+        left = [it for it in self._unsubmitted if it.status == "queued"]
+        self._unsubmitted = []
+        if left:
+            self._append_log(f"运行结束时仍有 {len(left)} 个新导入的文件未处理，自动开始下一轮")
+            QTimer.singleShot(0, self._start)
 
     def _open_output_root(self) -> None:
         it = self._selected_item()
@@ -273,14 +404,14 @@ class MainWindow(QMainWindow):
             return
         QDesktopServices.openUrl(QUrl.fromLocalFile(self._config.output_dir))
 
+    def _selected_rows(self) -> list[int]:
+        return sorted({i.row() for i in self.table.selectionModel().selectedRows()})
+
     def _selected_item(self) -> QueueItem | None:
-        rows = sorted({r.row() for r in self.table.selectedIndexes()})
+        rows = self._selected_rows()
         if not rows:
             return None
-        r = rows[0]
-        if 0 <= r < len(self._items):
-            return self._items[r]
-        return None
+        return self._model.item(rows[0])
 
     def _open_selected_md(self) -> None:
         it = self._selected_item()
@@ -310,18 +441,21 @@ class MainWindow(QMainWindow):
             it.progress = 0.0
             it.error = None
             it.message = ""
-            save_queue(self._items)
-            self._refresh_table()
+            self._store.update(it)
+            self._model.item_changed(it)
         except Exception as e:
             QMessageBox.warning(self, "失败", f"重置失败：{e}")
 
     def _open_settings(self) -> None:
+        from pabble_ocr.ui.settings_dialog import SettingsDialog
+
         dlg = SettingsDialog(self._config, self)
         if dlg.exec() == dlg.DialogCode.Accepted:
             self._config = dlg.get_config()
             self._config.ensure_dirs()
             save_config(self._config)
-            setup_logging(Path(self._config.output_dir) / "_logs")
+            self._log_path = setup_logging(Path(self._config.output_dir) / "_logs")
+            self.log.set_max_lines(int(self._config.log_view_lines or 5000))
             QMessageBox.information(self, "提示", "设置已保存")
 
     def closeEvent(self, event) -> None:  # type: ignore[override]
@@ -329,4 +463,11 @@ class MainWindow(QMainWindow):
             if QMessageBox.question(self, "退出确认", "队列仍在运行，确定退出？") != QMessageBox.StandardButton.Yes:
                 event.ignore()
                 return
+        self._cancel_ingest()
+        if self._ingest_handle:
+            # 导入线程以窗口为父对象：等它处理完当前批次并退出，避免窗口销毁时线程仍在运行导致 Qt 中止进程
+            self._ingest_handle.thread.quit()
+            self._ingest_handle.thread.wait()
+        self._flush_item_updates()
+        self._persist_dirty()
         event.accept()
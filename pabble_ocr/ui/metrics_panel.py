@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from typing import Callable, Optional
+
+from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import QGridLayout, QLabel, QWidget
+
+from pabble_ocr.core.metrics import STAGE_LABELS, MetricsSnapshot
+
+
+# 面板刷新间隔（毫秒）：只读一次快照，不随请求/进度回调刷新
+METRICS_REFRESH_MS = 1000
+
+
+def _fmt_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024.0
+    return f"{n:.1f} GB"
+
+
+def _fmt_duration(s: Optional[float]) -> str:
+    if s is None:
+        return "—"
+    s = int(max(0.0, s))
+    h, rem = divmod(s, 3600)
+    m, sec = divmod(rem, 60)
+    return f"{h}:{m:02d}:{sec:02d}" if h else f"{m}:{sec:02d}"
+
+
+def _fmt_latency(s: Optional[float]) -> str:
+    return "—" if s is None else f"{s:.1f}s"
+
+
+class MetricsPanel(QWidget):
+    """
+    运行指标面板：吞吐、在途请求与延迟分位数、上传量、各阶段耗时占比、队列 ETA 与瓶颈提示。
+    attach() 后按 METRICS_REFRESH_MS 定时从 source() 取快照；detach() 停止刷新并保留最后一次的数值。
+    """
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self._source: Optional[Callable[[], MetricsSnapshot]] = None
+        self._throughput = QLabel("尚未开始处理")
+        self._requests = QLabel("")
+        self._traffic = QLabel("")
+        self._stages = QLabel("")
+        self._eta = QLabel("")
+        self._hint = QLabel("")
+        grid = QGridLayout()
+        grid.setContentsMargins(0, 0, 0, 0)
+        grid.addWidget(self._throughput, 0, 0)
+        grid.addWidget(self._requests, 0, 1)
+        grid.addWidget(self._traffic, 0, 2)
+        grid.addWidget(self._eta, 1, 0)
+        grid.addWidget(self._stages, 1, 1, 1, 2)
+        grid.addWidget(self._hint, 2, 0, 1, 3)
+        self.setLayout(grid)
+        self._timer = QTimer(self)
+        self._timer.setInterval(METRICS_REFRESH_MS)
+        self._timer.timeout.connect(self.refresh)
+
+    def attach(self, source: Callable[[], MetricsSnapshot]) -> None:
+        self._source = source
+        self.refresh()
+        self._timer.start()
+
+    def detach(self) -> None:
+        self.refresh()
+        self._timer.stop()
+        self._source = None
+
+    def refresh(self) -> None:
+        if self._source is None:
+            return
+        self.show_snapshot(self._source())
+
+    def show_snapshot(self, snap: MetricsSnapshot) -> None:
+        self._throughput.setText(
+            f"吞吐：{snap.pages_per_min:.1f} 页/分钟（已完成 {snap.pages_done} 页，用时 {_fmt_duration(snap.elapsed_s)}）"
+        )
+        self._requests.setText(
+            f"在途请求：{snap.inflight}　延迟 p50/p90/p99："
+            f"{_fmt_latency(snap.latency_p50)}/{_fmt_latency(snap.latency_p90)}/{_fmt_latency(snap.latency_p99)}"
+            + (f"　失败 {snap.requests_failed}/{snap.requests}" if snap.requests_failed else "")
+        )
+        self._traffic.setText(
+            f"上传：{_fmt_bytes(snap.bytes_sent)}（{_fmt_bytes(snap.upload_bps)}/s）　下载：{_fmt_bytes(snap.bytes_received)}"
+        )
+        remaining = f"剩余约 {snap.remaining_pages} 页" + ("（统计中）" if snap.counting else "")
+        if snap.eta_s is not None and snap.seconds_per_page is not None:
+            self._eta.setText(f"{remaining}，每页 {snap.seconds_per_page:.1f}s，预计 {_fmt_duration(snap.eta_s)}")
+        else:
+            self._eta.setText(f"{remaining}，预计时间待首批页面完成后估算")
+        shares = snap.stage_shares()
+        self._stages.setText(
+            "耗时占比：" + "　".join(f"{STAGE_LABELS.get(k, k)} {v * 100:.0f}%" for k, v in shares.items() if v >= 0.005)
+            if shares
+            else ""
+        )
+        hint = snap.bottleneck()
+        self._hint.setText(f"瓶颈：{hint}" if hint else "")
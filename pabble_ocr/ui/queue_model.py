@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import bisect
+import os
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+from pabble_ocr.core.models import QueueItem
+from pabble_ocr.core.queue_store import QueueStore
+
+
+COLUMNS = ("文件", "状态", "进度", "信息")
+_COL_NAME, _COL_STATUS, _COL_PROGRESS, _COL_MESSAGE = range(4)
+
+# 队列项，或尚未用到、仍是 queue.db 原始行的记录（见 QueueStore.load_records）
+_Entry = Union[QueueItem, tuple]
+
+
+def _status_of(e: _Entry) -> str:
+    return (e[3] or "queued") if type(e) is tuple else e.status
+
+
+def _fields(e: _Entry) -> tuple[str, str, str, float, str]:
+    """(输入路径, 文件名, 状态, 进度, 信息)；原始行直接取列，不构造 Path。"""
+    if type(e) is tuple:
+        path = str(e[1])
+        return path, os.path.basename(path), e[3] or "queued", float(e[5] or 0.0), e[6] or (e[7] or "")
+    path = str(e.input_path)
+    return path, e.input_path.name, e.status, float(e.progress or 0.0), e.message or (e.error or "")
+
+
+def _display(col: int, name: str, status: str, progress: float, msg: str) -> str:
+    if col == _COL_NAME:
+        return name
+    if col == _COL_STATUS:
+        return status
+    if col == _COL_PROGRESS:
+        return f"{int(progress * 100)}%"
+    return msg
+
+
+def _sort_key(col: int, e: _Entry):
+    _, name, status, progress, msg = _fields(e)
+    if col == _COL_NAME:
+        return name.lower()
+    if col == _COL_STATUS:
+        return status
+    if col == _COL_PROGRESS:
+        return progress
+    return msg
+
+
+class QueueTableModel(QAbstractTableModel):
+    """
+    队列表格模型：单元格内容在 data() 中按需计算，不为每个单元格创建对象。
+    - 启动时直接用 queue.db 的原始行填充；某一行第一次被取用（item()）时才构造 QueueItem
+    - 排序/按状态筛选在模型内完成（显示行 -> 队列位置的映射），不经 QSortFilterProxyModel 逐行回调；
+      排序只改变显示顺序，队列本身的处理顺序不变，进度变化也不触发重排
+    - item_changed() 只对内容变化的单元格发 dataChanged；筛选中状态变化时单独插入/移除该行
+    """
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self._entries: list[_Entry] = []
+        # 显示行 -> _entries 下标；None 表示未排序也未筛选（显示行即队列位置）
+        self._view: Optional[list[int]] = None
+        # _entries 下标 -> 显示行（-1 表示被筛选掉）；_view 为 None 时不使用
+        self._row_of_entry: list[int] = []
+        # id(队列项) -> _entries 下标（只含已构造的队列项）
+        self._index_of: dict[int, int] = {}
+        # id(队列项) -> 上次通知界面时的 (状态, 进度, 信息)，用于判断哪些单元格变化
+        self._shown: dict[int, tuple[str, str, str]] = {}
+        self._sort_column = -1
+        self._sort_order = Qt.SortOrder.AscendingOrder
+        self._status = ""
+
+    # ---- Qt 接口 ----
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:  # type: ignore[override]
+        if parent.isValid():
+            return 0
+        return len(self._view) if self._view is not None else len(self._entries)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:  # type: ignore[override]
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section: int, orientation, role: int = Qt.ItemDataRole.DisplayRole):  # type: ignore[override]
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return COLUMNS[section] if 0 <= section < len(COLUMNS) else None
+        return None
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):  # type: ignore[override]
+        if not index.isValid():
+            return None
+        col = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            _, name, status, progress, msg = _fields(self._entries[self._entry_index(index.row())])
+            return _display(col, name, status, progress, msg)
+        if role == Qt.ItemDataRole.ToolTipRole and col in (_COL_NAME, _COL_MESSAGE):
+            path, _, _, _, msg = _fields(self._entries[self._entry_index(index.row())])
+            return path if col == _COL_NAME else (msg or None)
+        if role == Qt.ItemDataRole.TextAlignmentRole and col == _COL_PROGRESS:
+            return int(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        return None
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.SortOrder.AscendingOrder) -> None:  # type: ignore[override]
+        self.layoutAboutToBeChanged.emit()
+        old = [(idx, self._entry_index(idx.row())) for idx in self.persistentIndexList() if idx.isValid()]
+        self._sort_column = column
+        self._sort_order = order
+        self._rebuild_view()
+        # 排序前后保持选中/当前行指向同一个队列项
+        for idx, i in old:
+            row = self._row_of(i)
+            self.changePersistentIndex(idx, self.index(row, idx.column()) if row >= 0 else QModelIndex())
+        self.layoutChanged.emit()
+
+    # ---- 队列操作 ----
+
+    def set_records(self, records: list[tuple]) -> None:
+        """用 queue.db 的原始行整体替换（启动时）。"""
+        self.set_entries(records)
+
+    def set_entries(self, entries: Iterable[_Entry]) -> None:
+        self.beginResetModel()
+        self._entries = list(entries)
+        self._index_of = {id(e): i for i, e in enumerate(self._entries) if type(e) is not tuple}
+        self._shown = {}
+        self._rebuild_view()
+        self.endResetModel()
+
+    def set_status_filter(self, status: str) -> None:
+        """只显示该状态的队列项；空字符串显示全部。"""
+        if status == self._status:
+            return
+        self.beginResetModel()
+        self._status = status
+        self._rebuild_view()
+        self.endResetModel()
+
+    def append_items(self, items: list[QueueItem]) -> None:
+        if not items:
+            return
+        start = len(self._entries)
+        if self._view is None:
+            self.beginInsertRows(QModelIndex(), start, start + len(items) - 1)
+            for i, it in enumerate(items, start):
+                self._entries.append(it)
+                self._index_of[id(it)] = i
+            self.endInsertRows()
+            return
+        # 排序/筛选中：符合筛选的新项排在末尾，再次点击表头时参与排序
+        for i, it in enumerate(items, start):
+            self._entries.append(it)
+            self._index_of[id(it)] = i
+            self._row_of_entry.append(-1)
+        shown = [i for i in range(start, len(self._entries)) if self._visible(self._entries[i])]
+        if shown:
+            row = len(self._view)
+            self.beginInsertRows(QModelIndex(), row, row + len(shown) - 1)
+            for i in shown:
+                self._row_of_entry[i] = len(self._view)
+                self._view.append(i)
+            self.endInsertRows()
+
+    def remove_rows(self, rows: Iterable[int]) -> list[QueueItem]:
+        """按显示行号移除，返回被移除的队列项。"""
+        n = self.rowCount()
+        drop = {self._entry_index(r) for r in rows if 0 <= r < n}
+        if not drop:
+            return []
+        removed = [self.item_at_entry(i) for i in sorted(drop)]
+        self.set_entries(e for i, e in enumerate(self._entries) if i not in drop)
+        return removed
+
+    def clear(self) -> None:
+        self.set_entries([])
+
+    def item(self, row: int) -> QueueItem:
+        """显示行 row 对应的队列项（必要时由原始行构造）。"""
+        return self.item_at_entry(self._entry_index(row))
+
+    def item_at_entry(self, i: int) -> QueueItem:
+        e = self._entries[i]
+        if type(e) is tuple:
+            e = QueueStore.item_from_record(e)
+            self._entries[i] = e
+            self._index_of[id(e)] = i
+        return e
+
+    def items(self) -> list[QueueItem]:
+        """按队列顺序返回全部队列项（开始处理时调用；会构造所有尚未构造的项）。"""
+        return [self.item_at_entry(i) for i in range(len(self._entries))]
+
+    def output_dirs(self) -> list[Path]:
+        """全部队列项的输出目录（不构造 QueueItem）。"""
+        return [Path(e[2]) if type(e) is tuple else e.output_dir for e in self._entries]
+
+    def items_with_status(self, statuses: Iterable[str]) -> list[QueueItem]:
+        """只构造状态命中的项（如“重试失败”），不触碰其余原始行。"""
+        wanted = set(statuses)
+        return [self.item_at_entry(i) for i, e in enumerate(self._entries) if _status_of(e) in wanted]
+
+    def row_of(self, item: QueueItem) -> Optional[int]:
+        """item 当前的显示行；不在队列中或被筛选掉时返回 None。"""
+        i = self._index_of.get(id(item))
+        if i is None:
+            return None
+        row = self._row_of(i)
+        return row if row >= 0 else None
+
+    def item_changed(self, item: QueueItem) -> bool:
+        """队列项状态/进度变化后调用；只对变化的单元格发 dataChanged。不在队列中时返回 False。"""
+        i = self._index_of.get(id(item))
+        if i is None:
+            return False
+        _, _, status, progress, msg = _fields(item)
+        now = (status, _display(_COL_PROGRESS, "", status, progress, msg), msg)
+        before = self._shown.get(id(item))
+        self._shown[id(item)] = now
+        if self._status and (before is None or before[0] != status):
+            self._refilter_entry(i)
+        row = self._row_of(i)
+        if row < 0:
+            return True
+        for col, (a, b) in zip((_COL_STATUS, _COL_PROGRESS, _COL_MESSAGE), zip(before or (None,) * 3, now)):
+            if a != b:
+                idx = self.index(row, col)
+                self.dataChanged.emit(idx, idx, [Qt.ItemDataRole.DisplayRole])
+        return True
+
+    # ---- 内部 ----
+
+    def _visible(self, e: _Entry) -> bool:
+        return not self._status or _status_of(e) == self._status
+
+    def _entry_index(self, row: int) -> int:
+        return self._view[row] if self._view is not None else row
+
+    def _row_of(self, i: int) -> int:
+        return self._row_of_entry[i] if self._view is not None else i
+
+    def _rebuild_view(self) -> None:
+        if not self._status and self._sort_column < 0:
+            self._view = None
+            self._row_of_entry = []
+            return
+        if self._status:
+            view = [i for i, e in enumerate(self._entries) if _status_of(e) == self._status]
+        else:
+            view = list(range(len(self._entries)))
+        if self._sort_column >= 0:
+            col = self._sort_column
+            keys = {i: _sort_key(col, self._entries[i]) for i in view}
+            view.sort(key=keys.__getitem__, reverse=self._sort_order == Qt.SortOrder.DescendingOrder)
+        self._view = view
+        self._reindex()
+
+    def _reindex(self) -> None:
+        assert self._view is not None
+        inv = [-1] * len(self._entries)
+        for row, i in enumerate(self._view):
+            inv[i] = row
+        self._row_of_entry = inv
+
+    def _refilter_entry(self, i: int) -> None:
+        # 筛选中某项状态变化：不再符合则移除该行，新符合则插入（未排序时按队列位置，已排序时排在末尾）
+        assert self._view is not None
+        row = self._row_of_entry[i]
+        visible = self._visible(self._entries[i])
+        if row >= 0 and not visible:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._view[row]
+            self._reindex()
+            self.endRemoveRows()
+        elif row < 0 and visible:
+            row = bisect.bisect_left(self._view, i) if self._sort_column < 0 else len(self._view)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._view.insert(row, i)
+            self._reindex()
+            self.endInsertRows()
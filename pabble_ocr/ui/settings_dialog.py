@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from dataclasses import replace
+
 from PySide6.QtWidgets import (
     QDialog,
     QDialogButtonBox,
@@ -17,6 +19,9 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt
 
 from pabble_ocr.config import AppConfig
+from pabble_ocr.core.leases import normalize_claim_mode
+from pabble_ocr.core.scheduler import normalize_queue_policy
+from pabble_ocr.md.image_codec import normalize_image_format
 
 
 def _encode_escapes(value: str) -> str:
@@ -101,6 +106,71 @@ class SettingsDialog(QDialog):
         self.merge_image_fragments = QCheckBox("合并碎片图片（观感优先，尽量还原原PDF大图）")
         self.merge_image_fragments.setChecked(bool(getattr(config, "merge_image_fragments", True)))
 
+        self.merge_workers = QSpinBox()
+        self.merge_workers.setRange(0, 64)
+        self.merge_workers.setValue(int(config.merge_workers or 0))
+
+        self.merged_image_format = QComboBox()
+        self.merged_image_format.addItem("png（默认）", "png")
+        self.merged_image_format.addItem("png-opt（无损，更高压缩）", "png-opt")
+        self.merged_image_format.addItem("jpeg", "jpeg")
+        self.merged_image_format.addItem("webp", "webp")
+        self.merged_image_format.addItem("auto（线稿/图表用 PNG，照片用有损格式）", "auto")
+        cur_fmt = normalize_image_format(config.merged_image_format)
+        idx_fmt = self.merged_image_format.findData(cur_fmt)
+        self.merged_image_format.setCurrentIndex(idx_fmt if idx_fmt >= 0 else 0)
+
+        self.merged_image_quality = QSpinBox()
+        self.merged_image_quality.setRange(1, 100)
+        self.merged_image_quality.setValue(int(config.merged_image_quality or 85))
+
+        self.max_concurrent_files = QSpinBox()
+        self.max_concurrent_files.setRange(1, 64)
+        self.max_concurrent_files.setValue(int(config.max_concurrent_files or 1))
+
+        self.max_inflight_requests = QSpinBox()
+        self.max_inflight_requests.setRange(0, 256)
+        self.max_inflight_requests.setValue(int(config.max_inflight_requests or 0))
+
+        self.max_concurrent_merges = QSpinBox()
+        self.max_concurrent_merges.setRange(0, 64)
+        self.max_concurrent_merges.setValue(int(config.max_concurrent_merges or 0))
+
+        self.queue_policy = QComboBox()
+        self.queue_policy.addItem("fifo（按导入顺序，默认）", "fifo")
+        self.queue_policy.addItem("sjf（预计耗时短的优先）", "sjf")
+        self.queue_policy.addItem("priority（按队列项优先级）", "priority")
+        cur_policy = normalize_queue_policy(config.queue_policy)
+        idx_policy = self.queue_policy.findData(cur_policy)
+        self.queue_policy.setCurrentIndex(idx_policy if idx_policy >= 0 else 0)
+
+        self.segments_per_turn = QSpinBox()
+        self.segments_per_turn.setRange(0, 1000)
+        self.segments_per_turn.setValue(int(config.segments_per_turn or 0))
+
+        self.dedupe_inputs = QCheckBox("内容相同的文件只识别一次，其余复用输出")
+        self.dedupe_inputs.setChecked(bool(config.dedupe_inputs))
+
+        self.log_view_lines = QSpinBox()
+        self.log_view_lines.setRange(500, 200000)
+        self.log_view_lines.setSingleStep(1000)
+        self.log_view_lines.setValue(int(config.log_view_lines or 5000))
+
+        self.cluster_claim = QComboBox()
+        self.cluster_claim.addItem("off（单机，默认）", "off")
+        self.cluster_claim.addItem("file（多节点按文件认领）", "file")
+        self.cluster_claim.addItem("segment（多节点按分段认领）", "segment")
+        cur_claim = normalize_claim_mode(config.cluster_claim)
+        idx_claim = self.cluster_claim.findData(cur_claim)
+        self.cluster_claim.setCurrentIndex(idx_claim if idx_claim >= 0 else 0)
+
+        self.cluster_node_id = QLineEdit(str(config.cluster_node_id or ""))
+        self.cluster_node_id.setPlaceholderText("留空=主机名-进程号")
+
+        self.lease_ttl_s = QSpinBox()
+        self.lease_ttl_s.setRange(10, 3600)
+        self.lease_ttl_s.setValue(int(config.lease_ttl_s or 120))
+
         self.use_system_proxy = QCheckBox("使用系统/环境代理（HTTP(S)_PROXY 等）")
         self.use_system_proxy.setChecked(bool(config.use_system_proxy))
 
@@ -203,6 +273,19 @@ class SettingsDialog(QDialog):
         form.addRow("MD_IMAGE_WIDTH_PERCENT（0=不处理，建议 50~80）", self.markdown_image_width_percent)
         form.addRow("MD_IMAGE_MAX_HEIGHT_PX（0=不限制，EPUB 建议 600~900）", self.markdown_image_max_height_px)
         form.addRow("MERGE_IMAGE_FRAGMENTS", self.merge_image_fragments)
+        form.addRow("MERGE_WORKERS（0=自动=CPU 核数且最多 4，1=串行；每进程约 100~150MB 内存）", self.merge_workers)
+        form.addRow("MERGED_IMAGE_FORMAT", self.merged_image_format)
+        form.addRow("MERGED_IMAGE_QUALITY（jpeg/webp，1~100）", self.merged_image_quality)
+        form.addRow("MAX_CONCURRENT_FILES（同时处理的文件数，1=逐个）", self.max_concurrent_files)
+        form.addRow("MAX_INFLIGHT_REQUESTS（全局在途请求上限，0=不限）", self.max_inflight_requests)
+        form.addRow("MAX_CONCURRENT_MERGES（同时合并的文件数，0=不限）", self.max_concurrent_merges)
+        form.addRow("QUEUE_POLICY", self.queue_policy)
+        form.addRow("SEGMENTS_PER_TURN（大 PDF 每轮处理的分段数，0=不轮转）", self.segments_per_turn)
+        form.addRow("DEDUPE_INPUTS（内容去重）", self.dedupe_inputs)
+        form.addRow("LOG_VIEW_LINES（界面日志保留行数）", self.log_view_lines)
+        form.addRow("CLUSTER_CLAIM", self.cluster_claim)
+        form.addRow("CLUSTER_NODE_ID", self.cluster_node_id)
+        form.addRow("LEASE_TTL_S（租约有效期，秒）", self.lease_ttl_s)
         form.addRow("USE_SYSTEM_PROXY", self.use_system_proxy)
         form.addRow("useDocOrientationClassify", self.use_doc_orientation_classify)
         form.addRow("useDocUnwarping", self.use_doc_unwarping)
@@ -237,7 +320,9 @@ class SettingsDialog(QDialog):
             self.output_dir.setText(path)
 
     def get_config(self) -> AppConfig:
-        return AppConfig(
+        # 基于当前配置做覆盖：未在对话框中展示的字段（仅配置文件可改）保持原值，避免保存设置时被重置为默认值。
+        return replace(
+            self._config,
             api_url=self.api_url.text().strip(),
             token=self.token.text().strip(),
             output_dir=self.output_dir.text().strip(),
@@ -255,6 +340,19 @@ class SettingsDialog(QDialog):
             markdown_image_width_percent=int(self.markdown_image_width_percent.value()),
             markdown_image_max_height_px=int(self.markdown_image_max_height_px.value()),
             merge_image_fragments=bool(self.merge_image_fragments.isChecked()),
+            merge_workers=int(self.merge_workers.value()),
+            merged_image_format=str(self.merged_image_format.currentData() or "png"),
+            merged_image_quality=int(self.merged_image_quality.value()),
+            max_concurrent_files=int(self.max_concurrent_files.value()),
+            max_inflight_requests=int(self.max_inflight_requests.value()),
+            max_concurrent_merges=int(self.max_concurrent_merges.value()),
+            queue_policy=str(self.queue_policy.currentData() or "fifo"),
+            segments_per_turn=int(self.segments_per_turn.value()),
+            dedupe_inputs=bool(self.dedupe_inputs.isChecked()),
+            log_view_lines=int(self.log_view_lines.value()),
+            cluster_claim=str(self.cluster_claim.currentData() or "off"),
+            cluster_node_id=self.cluster_node_id.text().strip(),
+            lease_ttl_s=int(self.lease_ttl_s.value()),
             use_system_proxy=bool(self.use_system_proxy.isChecked()),
             use_doc_orientation_classify=self._get_tristate(self.use_doc_orientation_classify),
             use_doc_unwarping=self._get_tristate(self.use_doc_unwarping),
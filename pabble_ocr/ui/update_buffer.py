@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from threading import Lock
+
+from pabble_ocr.core.models import QueueItem
+
+
+class ItemUpdateBuffer:
+    """
+    队列项更新的合并缓冲：worker 线程每次进度回调只登记“该项有变化”，界面线程按固定频率取走。
+    同一项在两次取走之间无论更新多少次都只刷新一次（队列项是共享对象，取走时读到的就是最新状态）。
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._pending: dict[int, QueueItem] = {}
+
+    def push(self, item: QueueItem) -> None:
+        with self._lock:
+            self._pending[id(item)] = item
+
+    def drain(self) -> list[QueueItem]:
+        with self._lock:
+            items = list(self._pending.values())
+            self._pending.clear()
+        return items
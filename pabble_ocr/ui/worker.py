@@ -1,13 +1,19 @@
 from __future__ import annotations
 
+import logging
 from dataclasses import dataclass
-from typing import List
+from typing import TYPE_CHECKING, Callable, List, Optional
 
 from PySide6.QtCore import QObject, QThread, Signal
 
 from pabble_ocr.config import AppConfig
 from pabble_ocr.core.models import QueueItem
-from pabble_ocr.core.runner import Runner, RunnerCallbacks
+
+if TYPE_CHECKING:
+    from pabble_ocr.core.metrics import MetricsSnapshot
+
+
+logger = logging.getLogger(__name__)
 
 
 class Worker(QObject):
@@ -15,20 +21,45 @@ class Worker(QObject):
     item_updated = Signal(object)
     finished = Signal()
 
-    def __init__(self, config: AppConfig, items: List[QueueItem]) -> None:
+    def __init__(
+        self,
+        config: AppConfig,
+        items: List[QueueItem],
+        *,
+        keep_alive: Optional[Callable[[], bool]] = None,
+        log_sink: Optional[Callable[[str], None]] = None,
+        item_sink: Optional[Callable[[QueueItem], None]] = None,
+    ) -> None:
         super().__init__()
-        self._runner = Runner(config, RunnerCallbacks(on_log=self._emit_log, on_item_update=self._emit_item))
+        # 处理流水线（requests/pypdf/md 合并等）在第一次点“开始”时才导入，不拖慢窗口启动
+        from pabble_ocr.core.runner import Runner, RunnerCallbacks
+
+        self._runner: Runner = Runner(config, RunnerCallbacks(on_log=self._emit_log, on_item_update=self._emit_item))
         self._items = items
+        # 后台导入仍在进行时保持运行，等待 submit() 追加的新队列项
+        self._keep_alive = keep_alive
+        # 线程安全的日志接收端（界面的环形缓冲）；给出时不再逐行发 log 信号
+        self._log_sink = log_sink
+        # 同理：给出时进度更新交给界面的合并缓冲，不再每次回调都发 item_updated 信号
+        self._item_sink = item_sink
 
     def _emit_log(self, msg: str) -> None:
-        self.log.emit(msg)
+        # 完整日志写入日志文件；界面只保留最近的若干行
+        logger.info("%s", msg)
+        if self._log_sink is not None:
+            self._log_sink(msg)
+        else:
+            self.log.emit(msg)
 
     def _emit_item(self, item: QueueItem) -> None:
-        self.item_updated.emit(item)
+        if self._item_sink is not None:
+            self._item_sink(item)
+        else:
+            self.item_updated.emit(item)
 
     def start(self) -> None:
         try:
-            self._runner.run(self._items)
+            self._runner.run(self._items, keep_alive=self._keep_alive)
         finally:
             self.finished.emit()
 
@@ -44,6 +75,13 @@ class Worker(QObject):
     def stop_all(self) -> None:
         self._runner.stop_all()
 
+    def submit(self, item: QueueItem) -> bool:
+        return self._runner.submit(item)
+
+    def metrics_snapshot(self) -> "MetricsSnapshot":
+        # 指标汇总本身线程安全，界面线程可直接读取
+        return self._runner.metrics.snapshot()
+
 
 @dataclass
 class WorkerHandle:
@@ -5,22 +5,29 @@ from datetime import datetime
 from pathlib import Path
 
 
-def setup_logging(log_dir: Path) -> Path:
+def setup_logging(log_dir: Path, *, console: bool = True) -> Path:
     log_dir.mkdir(parents=True, exist_ok=True)
     log_path = log_dir / f"pabble_ocr_{datetime.now().strftime('%Y%m%d')}.log"
 
     root = logging.getLogger()
     root.setLevel(logging.INFO)
+    # 重复调用（修改设置后切换输出目录）时替换先前添加的 handler，避免同一行写多次
+    for h in [h for h in root.handlers if getattr(h, "_pabble_ocr", False)]:
+        root.removeHandler(h)
+        h.close()
 
     fmt = logging.Formatter("%(asctime)s %(levelname)s %(name)s - %(message)s")
 
     fh = logging.FileHandler(log_path, encoding="utf-8")
     fh.setFormatter(fmt)
+    fh._pabble_ocr = True  # type: ignore[attr-defined]
     root.addHandler(fh)
 
-    sh = logging.StreamHandler()
-    sh.setFormatter(fmt)
-    root.addHandler(sh)
+    if console:
+        sh = logging.StreamHandler()
+        sh.setFormatter(fmt)
+        sh._pabble_ocr = True  # type: ignore[attr-defined]
+        root.addHandler(sh)
 
     return log_path
 
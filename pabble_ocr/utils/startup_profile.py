@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import logging
+import os
+import sys
+import time
+from typing import Any, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# 命令行参数 / 环境变量：开启启动耗时分析（打包后的窗口程序没有 -X importtime 可用）
+PROFILE_FLAG = "--profile-startup"
+PROFILE_ENV = "PABBLE_OCR_PROFILE_STARTUP"
+
+
+def startup_profile_requested(argv: Optional[list[str]] = None) -> bool:
+    argv = sys.argv if argv is None else argv
+    return PROFILE_FLAG in argv or os.environ.get(PROFILE_ENV, "").strip() not in ("", "0")
+
+
+class StartupProfile:
+    """
+    启动耗时分析：记录每个模块的导入耗时（含/不含其子模块）、模块查找耗时，以及启动各阶段的时间点。
+    install() 之后的导入才会被统计；finish() 卸载钩子并把报告写入日志。
+    """
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.marks: list[tuple[str, float]] = []
+        # 模块名 -> [含子模块耗时, 自身耗时]
+        self.imports: dict[str, list[float]] = {}
+        self.find_s = 0.0
+        self._stack: list[list[Any]] = []
+        self._finder: Optional[_TimingFinder] = None
+
+    def install(self) -> "StartupProfile":
+        if self._finder is None:
+            self._finder = _TimingFinder(self)
+            sys.meta_path.insert(0, self._finder)
+        return self
+
+    def uninstall(self) -> None:
+        if self._finder is not None:
+            try:
+                sys.meta_path.remove(self._finder)
+            except ValueError:
+                pass
+            self._finder.active = False
+            self._finder = None
+
+    def mark(self, label: str) -> None:
+        self.marks.append((label, time.perf_counter() - self.started))
+
+    def finish(self, label: str = "窗口已显示") -> str:
+        self.mark(label)
+        self.uninstall()
+        text = self.report()
+        # 界面启动时已配置日志（文件 + 控制台），报告随日志输出
+        logger.info("%s", text)
+        return text
+
+    def report(self, top: int = 25) -> str:
+        lines = ["启动耗时分析："]
+        for label, t in self.marks:
+            lines.append(f"  {t * 1000:8.1f} ms  {label}")
+        total = sum(v[1] for v in self.imports.values())
+        lines.append(f"模块导入：{len(self.imports)} 个，共 {total * 1000:.1f} ms（其中查找 {self.find_s * 1000:.1f} ms）")
+        lines.append(f"耗时最多的 {top} 个（含子模块 / 自身，毫秒）：")
+        ranked = sorted(self.imports.items(), key=lambda kv: kv[1][0], reverse=True)[:top]
+        for name, (cum, own) in ranked:
+            lines.append(f"  {cum * 1000:8.1f} {own * 1000:8.1f}  {name}")
+        return "\n".join(lines)
+
+    # ---- 由 _TimingFinder 调用 ----
+
+    def _enter(self, name: str) -> None:
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def _exit(self) -> None:
+        name, start, children = self._stack.pop()
+        cum = time.perf_counter() - start
+        # 扩展模块的耗时分两段（create_module 加载动态库 + exec_module），累加到同一模块
+        entry = self.imports.setdefault(name, [0.0, 0.0])
+        entry[0] += cum
+        entry[1] += max(0.0, cum - children)
+        if self._stack:
+            self._stack[-1][2] += cum
+
+
+class _TimingFinder:
+    """
+    插在 sys.meta_path 最前的查找器：自己不找模块，只把查找委托给其后的查找器并计时，
+    再包装找到的 loader.create_module / exec_module 统计加载与执行耗时
+    （同一个 loader 只包装一次，兼容打包环境共享的 loader）。
+    """
+
+    def __init__(self, profile: StartupProfile) -> None:
+        self.profile = profile
+        self.active = True
+
+    def find_spec(self, fullname: str, path=None, target=None):
+        if not self.active:
+            return None
+        start = time.perf_counter()
+        spec = None
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+        finally:
+            self.profile.find_s += time.perf_counter() - start
+        if spec is not None and spec.loader is not None:
+            self._wrap(spec.loader)
+        return spec
+
+    def _wrap(self, loader: Any) -> None:
+        self._wrap_method(loader, "create_module", lambda spec: getattr(spec, "name", "?"))
+        self._wrap_method(loader, "exec_module", lambda module: getattr(module, "__name__", "?"))
+
+    def _wrap_method(self, loader: Any, attr: str, name_of) -> None:
+        original = getattr(loader, attr, None)
+        if original is None or getattr(original, "_pabble_timed", False):
+            return
+        profile = self.profile
+
+        def timed(arg):
+            if not self.active:
+                return original(arg)
+            profile._enter(name_of(arg))
+            try:
+                return original(arg)
+            finally:
+                profile._exit()
+
+        timed._pabble_timed = True  # type: ignore[attr-defined]
+        try:
+            setattr(loader, attr, timed)
+        except (AttributeError, TypeError):
+            pass
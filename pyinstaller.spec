@@ -4,6 +4,7 @@ from PyInstaller.utils.hooks import collect_submodules
 
 block_cipher = None
 
+# QtPdf 只在 PDF 页重跑/碎片图裁剪时才在函数内导入，静态分析发现不了，需显式打包
 hiddenimports = collect_submodules("pypdf") + ["PySide6.QtPdf"]
 
 a = Analysis(